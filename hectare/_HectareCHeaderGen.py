@@ -8,11 +8,11 @@ import datetime
 import getpass
 import os
 import socket
-from typing import Iterator, List, Optional
+from typing import Iterable, Iterator, List, Optional
 
 from systemrdl.rdltypes import AccessType
 
-from hectare._hectare_types import AddressMap, Field, Register
+from hectare._hectare_types import AddressMap, Field, Memory, Register
 
 
 def indent_lines(ls: List[str], ident_level: int) -> Iterator[str]:
@@ -20,35 +20,66 @@ def indent_lines(ls: List[str], ident_level: int) -> Iterator[str]:
         yield " " * ident_level + l
 
 
+def join_lines(ls: Iterable[str]) -> Iterator[str]:
+    """ same as "\\n".join(ls), but piece by piece """
+
+    for i, l in enumerate(ls):
+        yield "\n" + l if i else l
+
+
 class HectareCHeaderGen:
     def __init__(self, addrmap, input_filename=""):
         self.addrmap = addrmap
         self.cur_indent = 0
-        self.data_w_bytes = 4  # 32 / 8  # TODO check regwidth
+        self.data_w_bytes = addrmap.data_w // 8
         self.input_filename = input_filename
 
-    def generate_string(self) -> str:
-        s = ""
+    def generate_string(self, header: bool = True, base_addr: bool = False) -> str:
+        """ `header` can be disabled and `base_addr` enabled when several
+        address maps are placed in the same file
+        """
 
-        s += self._gen_header(self.input_filename)
-        s += "\n"
+        return "".join(self.generate_chunks(header=header, base_addr=base_addr))
 
-        s += "#pragma once\n"
+    def generate_chunks(
+        self, header: bool = True, base_addr: bool = False
+    ) -> Iterator[str]:
+        """ same as generate_string, but piece by piece """
 
-        s += "\n\n// address constants\n"
-        s += "\n".join(self._gen_reg_addr())
-        s += "\n"
+        if header:
+            yield self._gen_header(self.input_filename)
+            yield "\n"
 
-        s += "\n\n// reset values\n"
-        s += "\n".join(self._gen_reg_reset_vals())
+            yield "#pragma once\n"
+            yield "\n"
+            yield "#include <stdint.h>\n"
 
-        s += "\n\n// individual field shift\n"
-        s += "\n".join(self._gen_field_shift())
+        if base_addr:
+            yield "\n\n// base address\n"
+            yield self._gen_base_addr(self.addrmap)
+            yield "\n"
 
-        s += "\n\n// individual field mask\n"
-        s += "\n".join(self._gen_field_mask())
+        yield "\n\n// data width and register type\n"
+        yield from join_lines(self._gen_data_w())
+        yield "\n"
 
-        return s
+        yield "\n\n// address constants\n"
+        yield from join_lines(self._gen_reg_addr())
+        yield "\n"
+
+        yield "\n\n// reset values\n"
+        yield from join_lines(self._gen_reg_reset_vals())
+
+        yield "\n\n// individual field shift\n"
+        yield from join_lines(self._gen_field_shift())
+
+        yield "\n\n// individual field mask\n"
+        yield from join_lines(self._gen_field_mask())
+
+        intrs = self._gen_intr()
+        if intrs:
+            yield "\n\n// interrupts\n"
+            yield from join_lines(intrs)
 
     @staticmethod
     def _gen_header(input_filename: str, verbose: bool = False) -> str:
@@ -64,9 +95,27 @@ class HectareCHeaderGen:
         s += " */\n"
         return s
 
+    def _gen_data_w(self) -> List[str]:
+        """ registers are accessed with a single transaction of this width """
+
+        return [
+            "#define {comp_name}_DATA_W ({data_w})".format(
+                comp_name=self.addrmap.name.upper(), data_w=self.data_w_bytes * 8
+            ),
+            "typedef uint{data_w}_t {comp_name}_reg_t;".format(
+                comp_name=self.addrmap.name.lower(), data_w=self.data_w_bytes * 8
+            ),
+        ]
+
     def _gen_reg_addr(self) -> List[str]:
         comp_name = self.addrmap.name.upper()
-        return [self._gen_single_addr(comp_name, reg) for reg in self.addrmap.regs]
+        addrs = []
+        for reg in self.addrmap.regs:
+            addrs.append(self._gen_single_addr(comp_name, reg))
+            addrs.extend(self._gen_single_array_addr(comp_name, reg))
+        for mem in self.addrmap.mems:
+            addrs.extend(self._gen_single_mem_addr(comp_name, mem))
+        return addrs
 
     def _gen_reg_reset_vals(self) -> List[str]:
         # we only generate those for the values with hw=na, sw=r
@@ -110,11 +159,73 @@ class HectareCHeaderGen:
 
         return field_mask
 
+    def _gen_intr(self) -> List[str]:
+        """ interrupt bits of each register, and location of the enable/mask
+        bits of each interrupt field
+        """
+
+        comp_name = self.addrmap.name.upper()
+        intrs = []
+        for reg in self.addrmap.regs:
+            intr_mask = 0
+            for field in reg.fields:
+                if field.intr is not None:
+                    intr_mask |= ((1 << (field.msb - field.lsb + 1)) - 1) << field.lsb
+            if not intr_mask:
+                continue
+
+            intrs.append(
+                "#define {comp_name}_{reg_name}_INTR_MASK ({mask})".format(
+                    comp_name=comp_name, reg_name=reg.name, mask=self._c_hex(intr_mask)
+                )
+            )
+            for field in reg.fields:
+                for prop_name in ["enable", "mask", "haltenable", "haltmask"]:
+                    ref = getattr(field, prop_name)
+                    if ref is not None:
+                        intrs.extend(
+                            self._gen_single_intr_ref(comp_name, reg.name, field, prop_name, ref)
+                        )
+            intrs.append("")
+
+        return intrs
+
+    @staticmethod
+    def _gen_single_intr_ref(
+        comp_name: str, reg_name: str, field: Field, prop_name: str, ref: str
+    ) -> List[str]:
+        """ E.g. #define MOD_STS_ERR_ENABLE_ADDR (MOD_ADDR_IRQ_EN) """
+
+        ref_reg, ref_field = ref.split(".")
+        fmt_args = dict(
+            comp_name=comp_name,
+            reg_name=reg_name,
+            field_name=field.name.upper(),
+            prop_name=prop_name.upper(),
+            ref_reg=ref_reg,
+            ref_reg_upper=ref_reg.upper(),
+            ref_field=ref_field.upper(),
+        )
+        return [
+            "#define {comp_name}_{reg_name}_{field_name}_{prop_name}_ADDR ({comp_name}_ADDR_{ref_reg_upper})".format(
+                **fmt_args
+            ),
+            "#define {comp_name}_{reg_name}_{field_name}_{prop_name}_SHIFT ({comp_name}_{ref_reg}_{ref_field}_SHIFT)".format(
+                **fmt_args
+            ),
+        ]
+
     @staticmethod
     def _gen_single_enum_type(field: Field) -> str:
         # TODO
         pass
 
+    @staticmethod
+    def _gen_base_addr(addrmap: AddressMap) -> str:
+        return "#define {comp_name}_BASE_ADDR (0x{base_addr:x})".format(
+            comp_name=addrmap.name.upper(), base_addr=addrmap.base_addr
+        )
+
     @staticmethod
     def _gen_single_addr(comp_name: str, reg: Register) -> str:
         """ Generate an address constant for a single register
@@ -126,6 +237,49 @@ class HectareCHeaderGen:
             comp_name=comp_name, name=reg.name.upper(), byte_addr=reg.addr
         )
 
+    @staticmethod
+    def _gen_single_array_addr(comp_name: str, reg: Register) -> List[str]:
+        """ Generate stride, number of elements and address macro for arrays
+
+        Multi-dimensional arrays are flattened (last dimension iterates the
+        most frequently).
+
+        E.g. #define MOD_ADDR_CH_CFG_IDX(i) (MOD_ADDR_CH_CFG + (i) * MOD_CH_CFG_STRIDE)
+        """
+
+        if not reg.is_array:
+            return []
+
+        fmt_args = dict(comp_name=comp_name, name=reg.name.upper())
+        return [
+            "#define {comp_name}_{name}_STRIDE ({stride})".format(
+                stride=reg.stride, **fmt_args
+            ),
+            "#define {comp_name}_{name}_COUNT ({count})".format(
+                count=reg.count, **fmt_args
+            ),
+            "#define {comp_name}_ADDR_{name}_IDX(i) ({comp_name}_ADDR_{name} + (i) * {comp_name}_{name}_STRIDE)".format(
+                **fmt_args
+            ),
+        ]
+
+    @staticmethod
+    def _gen_single_mem_addr(comp_name: str, mem: Memory) -> List[str]:
+        """ Generate the address of the first entry and the number of entries
+
+        E.g. #define MOD_ADDR_MEM_BUF (0x400)
+        """
+
+        fmt_args = dict(comp_name=comp_name, name=mem.name.upper())
+        return [
+            "#define {comp_name}_ADDR_MEM_{name} ({byte_addr})".format(
+                byte_addr=mem.addr, **fmt_args
+            ),
+            "#define {comp_name}_{name}_ENTRIES ({entries})".format(
+                entries=mem.entries, **fmt_args
+            ),
+        ]
+
     @staticmethod
     def _gen_single_reg_reset_vals(comp_name: str, reg_name: str, field: Field) -> str:
         """ Generate a reset values (can be used to check if matches in SW)
@@ -135,11 +289,11 @@ class HectareCHeaderGen:
 
         assert field.reset is not None
 
-        return "#define {comp_name}_{reg_name}_{field_name}_RST_VAL (0x{rst_val:x})".format(
+        return "#define {comp_name}_{reg_name}_{field_name}_RST_VAL ({rst_val})".format(
             comp_name=comp_name,
             reg_name=reg_name,
             field_name=field.name.upper(),
-            rst_val=field.reset,
+            rst_val=HectareCHeaderGen._c_hex(field.reset),
         )
 
     @staticmethod
@@ -154,9 +308,16 @@ class HectareCHeaderGen:
     @staticmethod
     def _gen_single_field_mask(comp_name: str, reg_name: str, field: Field) -> str:
         mask = (1 << (field.msb - field.lsb + 1)) - 1
-        return "#define {comp_name}_{reg_name}_{field_name}_MASK (0x{mask:x})".format(
+        return "#define {comp_name}_{reg_name}_{field_name}_MASK ({mask})".format(
             comp_name=comp_name,
             reg_name=reg_name,
             field_name=field.name.upper(),
-            mask=mask,
+            mask=HectareCHeaderGen._c_hex(mask),
         )
+
+    @staticmethod
+    def _c_hex(val: int) -> str:
+        """ hex literal, with ULL suffix if it does not fit into 32 bits """
+
+        suffix = "ULL" if val > 0xFFFFFFFF else ""
+        return "0x{val:x}{suffix}".format(val=val, suffix=suffix)
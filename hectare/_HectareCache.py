@@ -0,0 +1,227 @@
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from hectare.__init__ import __version__ as hectare_version
+
+if TYPE_CHECKING:
+    from hectare._hectare_types import AddressMap
+
+# increment when the layout of the cache entries changes
+CACHE_FORMAT_VERSION = 12
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# size of the pieces in which the cached outputs are read
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_home, "hectare")
+
+
+def _sha256_str(s: str) -> str:
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+
+class HectareCache:
+    """ On-disk cache of the extracted model and of the generated outputs
+
+    Three kinds of entries are stored, each as a JSON file in `cache_dir`:
+
+    - deps: files included by an input file, recorded after compilation
+    - model: list of address maps, keyed on the content of the input file,
+      its included files and the HECTARE version
+    - outputs: generated outputs, keyed on the model key, the requested
+      backends, output filenames and options; the content of each output is
+      kept in a separate file next to it, so that it can be written and read
+      piece by piece
+
+    When the total size exceeds `max_size` (in bytes), the least recently
+    used entries are removed.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def source_key(self, in_filename: str) -> Optional[str]:
+        """ returns the model key for the input file, None if the included
+        files are not known yet (or have disappeared)
+        """
+
+        deps = self._load("deps-" + _sha256_str(os.path.abspath(in_filename)))
+        if deps is None:
+            return None
+
+        h = hashlib.sha256()
+        h.update("{0}:{1}\n".format(hectare_version, CACHE_FORMAT_VERSION).encode())
+        for filename in [in_filename] + deps["deps"]:
+            try:
+                with open(filename, "rb") as f:
+                    content = f.read()
+            except OSError:
+                return None
+            h.update(filename.encode("utf-8") + b"\n")
+            h.update(hashlib.sha256(content).digest())
+
+        return h.hexdigest()
+
+    @staticmethod
+    def outputs_key(source_key: str, in_filename: str, params: Any) -> str:
+        """ `params` has to be JSON-serializable """
+
+        return _sha256_str(
+            json.dumps([source_key, in_filename, params], sort_keys=True)
+        )
+
+    def store_deps(self, in_filename: str, deps: Iterable[str]):
+        deps_abs = sorted(os.path.abspath(dep) for dep in deps)
+        self._store(
+            "deps-" + _sha256_str(os.path.abspath(in_filename)), {"deps": deps_abs}
+        )
+
+    def load_model(self, source_key: str) -> Optional[List["AddressMap"]]:
+        d = self._load("model-" + source_key)
+        if d is None:
+            return None
+
+        # the model depends on systemrdl, only needed if there is a model
+        from hectare._hectare_types import AddressMap
+
+        try:
+            return [AddressMap.from_dict(addrmap_d) for addrmap_d in d["addrmaps"]]
+        except (KeyError, TypeError, ValueError) as err:
+            self.logger.debug("invalid cache entry model-%s: %s", source_key, err)
+            return None
+
+    def store_model(self, source_key: str, addrmaps: List["AddressMap"]):
+        self._store(
+            "model-" + source_key,
+            {"addrmaps": [addrmap.to_dict() for addrmap in addrmaps]},
+        )
+
+    def load_outputs(self, outputs_key: str) -> Optional[Dict[str, Iterable[str]]]:
+        """ returns output filename -> content, the content is read from the
+        cache while it is iterated over
+        """
+
+        d = self._load("outputs-" + outputs_key)
+        if d is None:
+            return None
+        try:
+            outputs = dict(d["outputs"])
+            for content_name in outputs.values():
+                if not isinstance(content_name, str) or os.path.basename(content_name) != content_name:
+                    raise TypeError("invalid output content file: {0!r}".format(content_name))
+                # mark as recently used
+                os.utime(os.path.join(self.cache_dir, content_name))
+        except (KeyError, TypeError, ValueError, OSError) as err:
+            self.logger.debug("invalid cache entry outputs-%s: %s", outputs_key, err)
+            return None
+        return {
+            filename: self._read_chunks(os.path.join(self.cache_dir, content_name))
+            for filename, content_name in outputs.items()
+        }
+
+    def store_outputs(
+        self, outputs_key: str, outputs: Dict[str, Union[str, Iterable[str]]]
+    ) -> bool:
+        """ the outputs are strings or iterables of chunks, which are consumed
+        while they are written; returns False if the entry could not be stored
+        """
+
+        contents = []
+        for i, (filename, s) in enumerate(outputs.items()):
+            content_name = "outputs-{0}-{1}.out".format(outputs_key, i)
+            if not self._store_chunks(content_name, [s] if isinstance(s, str) else s):
+                return False
+            contents.append([filename, content_name])
+
+        stored = self._store("outputs-" + outputs_key, {"outputs": contents})
+        self.evict()
+        return stored
+
+    @staticmethod
+    def _read_chunks(path: str) -> Iterator[str]:
+        with open(path, "r") as f:
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def evict(self):
+        """ removes least recently used entries until the size is below limit """
+
+        try:
+            entries = []
+            for filename in os.listdir(self.cache_dir):
+                if not filename.endswith((".json", ".out")):
+                    continue
+                st = os.stat(os.path.join(self.cache_dir, filename))
+                entries.append((st.st_mtime, st.st_size, filename))
+        except OSError:
+            return
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self.logger.debug("evicting %s", filename)
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
+            total_size -= size
+
+    def _load(self, name: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.cache_dir, name + ".json")
+        try:
+            with open(path, "r") as f:
+                d = json.load(f)
+            # mark as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            self.logger.debug("cache miss: %s", name)
+            return None
+
+        self.logger.debug("cache hit: %s", name)
+        return d
+
+    def _store(self, name: str, d: Dict[str, Any]) -> bool:
+        return self._store_chunks(name + ".json", [json.dumps(d)])
+
+    def _store_chunks(self, filename: str, chunks: Iterable[str]) -> bool:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        except OSError as err:
+            # the cache is only an optimization, generation continues without it
+            self.logger.warning("could not write to cache: %s", err)
+            return False
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, os.path.join(self.cache_dir, filename))
+        except OSError as err:
+            self.logger.warning("could not write to cache: %s", err)
+            os.remove(tmp_path)
+            return False
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return True
@@ -0,0 +1,471 @@
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+"""
+
+import collections
+import contextlib
+import functools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from hectare._HectareCache import HectareCache
+from hectare._profile import peak_rss_mb
+
+# systemrdl, the listener and the generators are only imported when they are
+# needed, a run which takes everything from the cache does not load them
+if TYPE_CHECKING:
+    from hectare._hectare_types import AddressMap
+
+
+def _gen_vhdl(
+    addrmaps: List["AddressMap"],
+    in_filename: str,
+    out_filename: str,
+    options: Dict[str, Any],
+    bus: str = "axi4lite",
+) -> Dict[str, Iterable[str]]:
+    """ one entity per address map, all in the same file """
+
+    from hectare._HectareVhdlGen import HectareVhdlGen
+
+    vhdl_gens = [
+        HectareVhdlGen(
+            addrmap,
+            input_filename=in_filename,
+            read_channel=options.get("read_channel", "fsm"),
+            write_channel=options.get("write_channel", "fsm"),
+            use_wstrb=options.get("use_wstrb", False),
+            read_decoder=options.get("read_decoder", "flat"),
+            hw_clk=options.get("hw_clk", False),
+            hw_pipeline=options.get("hw_pipeline", 0),
+            max_fanout=options.get("max_fanout"),
+            bus=bus,
+        )
+        for addrmap in addrmaps
+    ]
+
+    pkg_gens = [vhdl_gen for vhdl_gen in vhdl_gens if vhdl_gen.has_package]
+
+    def gen_entities() -> Iterator[str]:
+        for i, vhdl_gen in enumerate(vhdl_gens):
+            if i:
+                yield "\n"
+            yield from vhdl_gen.generate_chunks(header=i == 0)
+
+    def gen_packages() -> Iterator[str]:
+        for i, vhdl_gen in enumerate(pkg_gens):
+            if i:
+                yield "\n"
+            yield from vhdl_gen.generate_package_chunks(header=i == 0)
+
+    outputs: Dict[str, Iterable[str]] = collections.OrderedDict()
+    outputs[out_filename] = gen_entities()
+    if pkg_gens:
+        outputs[out_filename.replace(".vhd", "_pkg.vhd")] = gen_packages()
+    return outputs
+
+
+def _gen_c_header(
+    addrmaps: List["AddressMap"],
+    in_filename: str,
+    out_filename: str,
+    options: Dict[str, Any],
+) -> Dict[str, Iterable[str]]:
+    """ one section per address map, with its base address if there are several """
+
+    from hectare._HectareCHeaderGen import HectareCHeaderGen
+
+    def gen_sections() -> Iterator[str]:
+        for i, addrmap in enumerate(addrmaps):
+            if i:
+                yield "\n"
+            c_header_gen = HectareCHeaderGen(addrmap, input_filename=in_filename)
+            yield from c_header_gen.generate_chunks(
+                header=i == 0, base_addr=len(addrmaps) > 1
+            )
+
+    return {out_filename: gen_sections()}
+
+
+class Backend(NamedTuple):
+    """ output generator, `gen` returns a dict with output filename -> content
+
+    The content is an iterable of chunks of the file, which might only be
+    generated while it is iterated over (i.e. while the file is written).
+
+    Arguments of `gen` are address maps, input filename, output filename and
+    the generator options (see HectareDriver).
+    """
+
+    ext: str
+    gen: Callable[[List["AddressMap"], str, str, Dict[str, Any]], Dict[str, Iterable[str]]]
+
+
+BACKENDS = collections.OrderedDict(
+    [
+        ("vhdl", Backend(".vhd", _gen_vhdl)),
+        ("vhdl_axi4", Backend(".vhd", functools.partial(_gen_vhdl, bus="axi4"))),
+        ("vhdl_avalon", Backend(".vhd", functools.partial(_gen_vhdl, bus="avalon"))),
+        ("vhdl_wishbone", Backend(".vhd", functools.partial(_gen_vhdl, bus="wishbone"))),
+        ("c_header", Backend(".h", _gen_c_header)),
+    ]
+)
+
+
+def _read_equal(f, chunk: str) -> bool:
+    """ True if the next characters in `f` are equal to `chunk` (end of file
+    for an empty chunk)
+    """
+
+    try:
+        return f.read(len(chunk) or 1) == chunk
+    except UnicodeDecodeError:
+        return False
+
+
+def write_if_changed(filename: str, s: Union[str, Iterable[str]]) -> bool:
+    """ atomically replaces the file if the content differs, returns True if
+    the file was written
+
+    Keeping the file (and its mtime) untouched prevents make and the FPGA
+    tools from re-running the downstream steps. The content can also be given
+    as an iterable of chunks, they are written to a temporary file while they
+    are compared with the current content.
+    """
+
+    chunks = [s] if isinstance(s, str) else s
+
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(filename) or ".", prefix=".hectare_", suffix=".tmp"
+    )
+    try:
+        try:
+            old_file = open(filename, "r")
+        except OSError:
+            old_file = None
+
+        changed = old_file is None
+        try:
+            with os.fdopen(fd, "w") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    if not changed and chunk and not _read_equal(old_file, chunk):
+                        changed = True
+            if not changed and not _read_equal(old_file, ""):
+                # old file is longer than the new content
+                changed = True
+        finally:
+            if old_file is not None:
+                old_file.close()
+
+        if not changed:
+            os.remove(tmp_filename)
+            return False
+
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_filename, 0o666 & ~umask)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
+
+    return True
+
+
+def write_outputs(
+    outputs: Dict[str, Union[str, Iterable[str]]], force: bool = False
+) -> List[str]:
+    """ writes the outputs (strings or iterables of chunks, see
+    write_if_changed), files with unchanged content are skipped unless
+    `force` is set; returns the list of files which were written
+    """
+
+    changed = []
+    for filename, s in outputs.items():
+        if force:
+            with open(filename, "w") as out_file:
+                out_file.writelines([s] if isinstance(s, str) else s)
+        elif not write_if_changed(filename, s):
+            print("Unchanged  {0}".format(filename))
+            continue
+        print("Generating {0} ...".format(filename))
+        changed.append(filename)
+    return changed
+
+
+def format_write_summary(outputs: List[str], changed: List[str]) -> str:
+    return "{0} of {1} output file(s) changed{2}".format(
+        len(changed), len(outputs), ": " + ", ".join(changed) if changed else ""
+    )
+
+
+class HectareDriver:
+    """ Compiles and elaborates the input file once and runs all requested
+    backends on the extracted model
+
+    Time spent in each phase is accumulated in `timings` (wall clock, in
+    seconds) and `cpu_timings` (CPU time of the process), `peak_rss` holds the
+    peak memory of the process (in MiB) at the end of each phase. If
+    `cache` is provided, the model and the outputs are taken from the cache
+    when the input (and its included files) did not change.
+
+    `options` are passed to the backends (e.g. "read_channel" for VHDL), they
+    have to be JSON-serializable as they are part of the cache key.
+    """
+
+    def __init__(
+        self,
+        in_filename: str,
+        cache: Optional[HectareCache] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.in_filename = in_filename
+        self.cache = cache
+        self.options: Dict[str, Any] = dict(options or {})
+        self.addrmaps: Optional[List["AddressMap"]] = None
+        self.timings: Dict[str, float] = collections.OrderedDict()
+        self.cpu_timings: Dict[str, float] = collections.OrderedDict()
+        self.peak_rss: Dict[str, float] = collections.OrderedDict()
+        self._source_key: Optional[str] = None
+
+    @contextlib.contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        t_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t_start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            self.cpu_timings[name] = (
+                self.cpu_timings.get(name, 0.0) + time.process_time() - cpu_start
+            )
+            rss = peak_rss_mb()
+            if rss is not None:
+                self.peak_rss[name] = rss
+            self.logger.debug("phase %s took %.3f s", name, elapsed)
+
+    def compile(self) -> List["AddressMap"]:
+        """ compiles, elaborates and walks the input file (only on first call) """
+
+        if self.addrmaps is not None:
+            return self.addrmaps
+
+        if self.cache is not None:
+            with self._phase("cache"):
+                self._source_key = self.cache.source_key(self.in_filename)
+                if self._source_key is not None:
+                    self.addrmaps = self.cache.load_model(self._source_key)
+            if self.addrmaps is not None:
+                print("Using cached model.")
+                return self.addrmaps
+
+        from systemrdl import RDLCompiler, RDLWalker
+        from hectare._HectareListener import HectareListener
+
+        rdlc = RDLCompiler()
+        with self._phase("compile"):
+            file_info = rdlc.compile_file(self.in_filename)
+        with self._phase("elaborate"):
+            root = rdlc.elaborate()
+        with self._phase("walk"):
+            walker = RDLWalker(unroll=False)
+            listener = HectareListener()
+            walker.walk(root, listener)
+        print("Parsing finished.")
+
+        self.addrmaps = listener.addrmaps
+
+        # older versions of systemrdl-compiler do not report included files,
+        # without them the cache can not be invalidated properly
+        if self.cache is not None and file_info is not None:
+            with self._phase("cache"):
+                self.cache.store_deps(self.in_filename, file_info.included_files)
+                self._source_key = self.cache.source_key(self.in_filename)
+                if self._source_key is not None:
+                    self.cache.store_model(self._source_key, self.addrmaps)
+
+        return self.addrmaps
+
+    def generate(self, backend: str, out_filename: str) -> Dict[str, Iterable[str]]:
+        """ runs a single backend, returns dict with output filename -> content
+        (iterable of chunks, see Backend)
+        """
+
+        addrmaps = self.compile()
+        with self._phase(backend):
+            return BACKENDS[backend].gen(
+                self._addrmaps_with_regs(addrmaps),
+                self.in_filename,
+                out_filename,
+                self.options,
+            )
+
+    @staticmethod
+    def _addrmaps_with_regs(addrmaps: List["AddressMap"]) -> List["AddressMap"]:
+        """ address maps which only contain other address maps are skipped
+        (unless there are no registers at all)
+        """
+
+        selected = [
+            addrmap for addrmap in addrmaps if addrmap.regs or addrmap.mems
+        ] or addrmaps[:1]
+
+        names = [addrmap.name for addrmap in selected]
+        duplicates = sorted(set(name for name in names if names.count(name) > 1))
+        if duplicates:
+            raise ValueError(
+                "address map names must be unique, duplicates: {0}".format(
+                    ", ".join(duplicates)
+                )
+            )
+        return selected
+
+    def write_outputs(
+        self, outputs: Dict[str, Union[str, Iterable[str]]], force: bool = False
+    ) -> List[str]:
+        with self._phase("write"):
+            return write_outputs(outputs, force=force)
+
+    def run(self, requests: Dict[str, str], force: bool = False) -> List[str]:
+        """ generates and writes the outputs for all requested backends
+
+        `requests` maps backend name (key in BACKENDS) to output filename.
+        Returns the list of files which were (re-)written, see `write_outputs`.
+        """
+
+        outputs = self.build(requests, lazy=True)
+        return self.write_outputs(outputs, force=force)
+
+    def build(
+        self, requests: Dict[str, str], lazy: bool = False
+    ) -> Dict[str, Union[str, Iterable[str]]]:
+        """ same as `run`, but only returns the outputs without writing them
+
+        With `lazy`, the outputs are iterables of chunks which are generated
+        (or read from the cache) while they are written, see write_if_changed;
+        the time spent is then accounted to the "write" phase. With a cache,
+        the generated chunks are streamed to the cache first and the time
+        spent generating them is accounted to the "cache" phase.
+        """
+
+        for backend, out_filename in requests.items():
+            if backend not in BACKENDS:
+                raise ValueError("unknown backend: {0}".format(backend))
+            ext = BACKENDS[backend].ext
+            if not out_filename.endswith(ext):
+                raise ValueError(
+                    "output filename is expected to have {0} extension".format(ext)
+                )
+
+        params = [list(requests.items()), self.options]
+
+        if self.cache is not None:
+            with self._phase("cache"):
+                outputs = None
+                self._source_key = self.cache.source_key(self.in_filename)
+                if self._source_key is not None:
+                    outputs = self.cache.load_outputs(
+                        self.cache.outputs_key(self._source_key, self.in_filename, params)
+                    )
+            if outputs is not None:
+                print("Using cached outputs.")
+                return outputs if lazy else self._join_outputs(outputs, "cache")
+
+        outputs = collections.OrderedDict()
+        for backend, out_filename in requests.items():
+            generated = self.generate(backend, out_filename)
+            if lazy or self.cache is not None:
+                outputs.update(generated)
+            else:
+                outputs.update(self._join_outputs(generated, backend))
+
+        if self.cache is not None and self._source_key is not None:
+            with self._phase("cache"):
+                outputs_key = self.cache.outputs_key(self._source_key, self.in_filename, params)
+                cached = None
+                if self.cache.store_outputs(outputs_key, outputs):
+                    cached = self.cache.load_outputs(outputs_key)
+            if cached is None:
+                # the generated chunks were consumed while they were stored
+                outputs = collections.OrderedDict()
+                for backend, out_filename in requests.items():
+                    outputs.update(self.generate(backend, out_filename))
+            else:
+                outputs = cached
+
+        if lazy or self.cache is None:
+            return outputs
+        return self._join_outputs(outputs, "cache")
+
+    def _join_outputs(self, outputs: Dict[str, Iterable[str]], phase: str) -> Dict[str, str]:
+        joined: Dict[str, str] = collections.OrderedDict()
+        with self._phase(phase):
+            for filename, chunks in outputs.items():
+                joined[filename] = "".join(chunks)
+        return joined
+
+    def format_profile(self) -> str:
+        lines = ["Profile:"]
+        lines.append(
+            "  {0:<12} {1:>10} {2:>10} {3:>10}".format(
+                "phase", "wall [s]", "CPU [s]", "RSS [MiB]"
+            )
+        )
+        for phase in self.profile_report()["phases"]:
+            rss = phase["peak_rss_mib"]
+            lines.append(
+                "  {0:<12} {1:10.3f} {2:10.3f} {3:>10}".format(
+                    phase["name"],
+                    phase["wall_s"],
+                    phase["cpu_s"],
+                    "-" if rss is None else "{0:.1f}".format(rss),
+                )
+            )
+        return "\n".join(lines)
+
+    def profile_report(self) -> Dict[str, Any]:
+        """ machine-readable version of the timings, phases are in the order
+        in which they were first entered, followed by the total
+        """
+
+        phases = [
+            {
+                "name": name,
+                "wall_s": round(elapsed, 6),
+                "cpu_s": round(self.cpu_timings.get(name, 0.0), 6),
+                "peak_rss_mib": self.peak_rss.get(name),
+            }
+            for name, elapsed in self.timings.items()
+        ]
+        phases.append(
+            {
+                "name": "total",
+                "wall_s": round(sum(self.timings.values()), 6),
+                "cpu_s": round(sum(self.cpu_timings.values()), 6),
+                "peak_rss_mib": peak_rss_mb(),
+            }
+        )
+        return {"input": self.in_filename, "phases": phases}
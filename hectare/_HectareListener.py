@@ -4,59 +4,433 @@ Copyright (c) 2020 - 2021 Deutsches Elektronen-Synchrotron DESY.
 See LICENSE.txt for license details.
 """
 
+import copy
+import itertools
 import logging
+from typing import Any, Dict, List, Tuple
 
 from systemrdl import RDLListener
-from systemrdl.node import FieldNode, RegNode
+from systemrdl.node import AddrmapNode, FieldNode, RegNode
+from systemrdl.rdltypes import AccessType
 
-from hectare._hectare_types import AddressMap, Field, Register
+from hectare._hectare_types import AddressMap, Field, Memory, Register
 
 
 class HectareListener(RDLListener):
+    """ Collects all address maps, in the order in which they are entered
+    (i.e. the top-level address map comes first)
+
+    Each register belongs to the innermost address map which contains it,
+    the register addresses are relative to that address map. The data width
+    of an address map is the largest register width (but at least 32 bits).
+
+    The design is expected to be walked without unrolling the arrays. Each
+    element of an address map array becomes a separate address map (with the
+    index appended to the name). Register arrays and registers in regfile
+    arrays are kept as a single register with `dims` and `stride` if the
+    elements are evenly spaced with a power-of-two stride, otherwise the
+    elements are unrolled (with the index appended to the name).
+
+    Memories (`mem`) are collected in `mems` of the address map, virtual
+    registers inside of memories are ignored.
+    """
+
+    SUPPORTED_DATA_W = (32, 64)
+
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.cur_addrmap = None
-        self.cur_reg = None
-        self.addrmaps = []
+        # (node, address maps): all elements of an address map array share the node
+        self.addrmap_stack: List[Tuple[AddrmapNode, List[AddressMap]]] = []
+        self.cur_reg_node = None
+        self.cur_fields: List[Field] = []
+        # (field, field node, property name, referenced field node) of the interrupt fields
+        self.cur_field_refs: List[Tuple[Field, FieldNode, str, FieldNode]] = []
+        self.addrmaps: List[AddressMap] = []
+        self.in_mem = False
+
+    @property
+    def cur_addrmaps(self) -> List[AddressMap]:
+        return self.addrmap_stack[-1][1]
+
+    @staticmethod
+    def _array_elements(dims_strides: List[Tuple[int, int]]) -> List[Tuple[str, int]]:
+        """ returns suffix ("_<i>_<j>...") and address offset of each element """
+
+        elements = []
+        for idx in itertools.product(*[range(dim) for dim, _ in dims_strides]):
+            suffix = "".join("_{0}".format(i) for i in idx)
+            offset = sum(i * stride for i, (_, stride) in zip(idx, dims_strides))
+            elements.append((suffix, offset))
+        return elements
+
+    @staticmethod
+    def _dims_strides(dims: List[int], stride: int) -> List[Tuple[int, int]]:
+        """ (dimension, stride) of each dimension of an array, `stride` is the
+        distance between consecutive elements
+        """
+
+        dims_strides = []
+        for i, dim in enumerate(dims):
+            dim_stride = stride
+            for inner_dim in dims[i + 1 :]:
+                dim_stride *= inner_dim
+            dims_strides.append((dim, dim_stride))
+        return dims_strides
+
+    @classmethod
+    def _node_dims_strides(cls, node) -> List[Tuple[int, int]]:
+        if not node.is_array:
+            return []
+        return cls._dims_strides(node.array_dimensions, node.array_stride)
 
     def enter_Addrmap(self, node):
         self.logger.debug("Entering addrmap, node = %s", node.get_path())
-        self.cur_addrmap = AddressMap(node.inst_name)
+
+        if self.addrmap_stack:
+            parent_node, parent_addrmaps = self.addrmap_stack[-1]
+            offset = node.raw_absolute_address - parent_node.raw_absolute_address
+            bases = [addrmap.base_addr + offset for addrmap in parent_addrmaps]
+        else:
+            bases = [node.raw_absolute_address]
+
+        addrmaps = []
+        for base in bases:
+            for suffix, offset in self._array_elements(self._node_dims_strides(node)):
+                addrmaps.append(AddressMap(node.inst_name + suffix, base + offset))
+
+        self.addrmap_stack.append((node, addrmaps))
+        self.addrmaps.extend(addrmaps)
 
     def exit_Addrmap(self, node):
         self.logger.debug("Exiting addrmap, node = %s", node.get_path())
-        self.addrmaps.append(self.cur_addrmap)
+        _, addrmaps = self.addrmap_stack.pop()
+        for addrmap in addrmaps:
+            self._check_alignment(addrmap)
+            addrmap.update_index()
+
+    @staticmethod
+    def _check_alignment(addrmap: AddressMap):
+        """ the data width is the widest register of the address map, with
+        mixed regwidths the narrower registers also have to be aligned to it
+        """
+
+        data_w_bytes = addrmap.data_w // 8
+        for reg in addrmap.regs:
+            if reg.addr % data_w_bytes or reg.stride % data_w_bytes:
+                raise ValueError(
+                    "{0}.{1}: register (address 0x{2:x}, stride {3}) must be aligned "
+                    "to {4} bytes, the data width of the address map is {5} bits".format(
+                        addrmap.name,
+                        reg.name,
+                        reg.addr,
+                        reg.stride,
+                        data_w_bytes,
+                        addrmap.data_w,
+                    )
+                )
+
+    def enter_Mem(self, node):
+        self.logger.debug("Entering mem, node = %s", node.get_path())
+        self.in_mem = True
+
+        memwidth = node.get_property("memwidth")
+        for addrmap in self.cur_addrmaps:
+            if memwidth > addrmap.data_w and memwidth in self.SUPPORTED_DATA_W:
+                addrmap.data_w = memwidth
+
+        addr = node.raw_absolute_address - self.addrmap_stack[-1][0].raw_absolute_address
+        mems = [
+            Memory(
+                node.inst_name + suffix,
+                addr + offset,
+                node.get_property("mementries"),
+                memwidth,
+                node.get_property("sw"),
+            )
+            for suffix, offset in self._array_elements(self._node_dims_strides(node))
+        ]
+        for addrmap in self.cur_addrmaps:
+            addrmap.mems.extend(mems)
+
+    def exit_Mem(self, node):
+        self.logger.debug("Exiting mem, node = %s", node.get_path())
+        self.in_mem = False
 
     def enter_Reg(self, node):
         self.logger.debug("Entering register, node = %s", node.get_path())
-        # has_sw_readable, has_sw_writable
-        self.cur_reg = Register(node.inst_name, node.address_offset)
+        if self.in_mem:
+            return
+
+        regwidth = node.get_property("regwidth")
+        if node.get_property("accesswidth") != regwidth:
+            raise ValueError(
+                "{0}: accesswidth different from regwidth is not supported".format(
+                    node.get_path()
+                )
+            )
+        for addrmap in self.cur_addrmaps:
+            if regwidth > addrmap.data_w:
+                if regwidth not in self.SUPPORTED_DATA_W:
+                    raise ValueError(
+                        "{0}: regwidth {1} is not supported".format(
+                            node.get_path(), regwidth
+                        )
+                    )
+                addrmap.data_w = regwidth
+
+        self.cur_reg_node = node
+        self.cur_fields = []
+        self.cur_field_refs = []
 
     def exit_Reg(self, node):
         self.logger.debug("Exiting register, node = %s", node.get_path())
-        self.cur_addrmap.regs.append(self.cur_reg)
+        if self.in_mem:
+            return
+
+        regs = self._make_regs(node)
+        elem_fields = [list(self.cur_fields) for _ in regs]
+        for field, field_node, prop_name, ref in self.cur_field_refs:
+            # the elements of an unrolled array may reference different registers
+            pos = self.cur_fields.index(field)
+            ref_names = self._ref_names(field_node, prop_name, ref)
+            for fields, ref_name in zip(elem_fields, ref_names):
+                fields[pos] = copy.copy(fields[pos])
+                setattr(fields[pos], prop_name, ref_name)
+        for reg, fields in zip(regs, elem_fields):
+            reg.fields = fields
+            reg.update_summary()
+        for addrmap in self.cur_addrmaps:
+            addrmap.regs.extend(regs)
+
+    @classmethod
+    def _reg_dims(cls, node) -> Tuple[List[Tuple[Any, int, int, int]], List[int], int]:
+        """ array dimensions from the address map down to the register
+
+        Returns the unrolled dimensions, outermost first, as (array node,
+        index of the dimension in the node, dimension, stride), and the
+        dimensions and stride which are kept as a register array.
+        """
+
+        chain = []
+        parent = node
+        while not isinstance(parent, AddrmapNode):
+            chain.append(parent)
+            parent = parent.parent
+
+        all_dims = []
+        for array_node in reversed(chain):
+            for i, (dim, stride) in enumerate(cls._node_dims_strides(array_node)):
+                all_dims.append((array_node, i, dim, stride))
+
+        # group dimensions in which the elements are contiguous,
+        # each group is (dims, stride of the innermost dimension)
+        groups: List[Tuple[List[int], int]] = []
+        for _, _, dim, stride in all_dims:
+            if groups and groups[-1][1] == dim * stride:
+                groups[-1] = (groups[-1][0] + [dim], stride)
+            else:
+                groups.append(([dim], stride))
+
+        native_dims, native_stride = [], 0
+        if groups and groups[-1][1] & (groups[-1][1] - 1) == 0:
+            native_dims, native_stride = groups.pop()
+
+        return all_dims[: len(all_dims) - len(native_dims)], native_dims, native_stride
+
+    def _make_regs(self, node) -> List[Register]:
+        """ registers (or register arrays) for the (possibly unrolled) elements """
+
+        unrolled, native_dims, native_stride = self._reg_dims(node)
+        addr = node.raw_absolute_address - self.addrmap_stack[-1][0].raw_absolute_address
+        return [
+            Register(
+                node.inst_name + suffix,
+                addr + offset,
+                native_dims,
+                native_stride,
+                external=node.external,
+            )
+            for suffix, offset in self._array_elements(
+                [(dim, stride) for _, _, dim, stride in unrolled]
+            )
+        ]
+
+    def _ref_names(self, node: FieldNode, prop_name: str, ref: FieldNode) -> List[str]:
+        """ the field `ref` as "REG.FIELD" (with the name of the unrolled
+        element) for each element of the register of `node`
+
+        The arrays which contain the referenced register either have to be
+        indexed in the reference, or `node` has to be in the same array, then
+        each element references the field in its own array element.
+        """
+
+        ref_unrolled, ref_native_dims, _ = self._reg_dims(ref.parent)
+        if ref_native_dims:
+            raise ValueError(
+                "{0}: {1} references {2}, fields of register arrays are not "
+                "supported".format(node.get_path(), prop_name, ref.get_path())
+            )
+
+        unrolled, _, _ = self._reg_dims(node.parent)
+        names = []
+        for idx in itertools.product(*[range(dim) for _, _, dim, _ in unrolled]):
+            ref_idx = []
+            for array_node, i, _, _ in ref_unrolled:
+                if array_node.current_idx is not None:
+                    ref_idx.append(array_node.current_idx[i])
+                    continue
+                shared = [
+                    pos
+                    for pos, (node_array, node_i, _, _) in enumerate(unrolled)
+                    if node_array == array_node and node_i == i
+                ]
+                if not shared:
+                    raise ValueError(
+                        "{0}: {1} references {2}, which is in a different array".format(
+                            node.get_path(), prop_name, ref.get_path()
+                        )
+                    )
+                ref_idx.append(idx[shared[0]])
+            names.append(
+                "{0}{1}.{2}".format(
+                    ref.parent.inst_name,
+                    "".join("_{0}".format(i) for i in ref_idx),
+                    ref.inst_name,
+                )
+            )
+        return names
 
     def enter_Field(self, node):
         self.logger.debug("Entering field, node = %s", node.get_path())
+        if self.in_mem:
+            return
 
         assert isinstance(
             node, FieldNode
         ), "This program expects that registers only contain fields"
 
-        self.cur_reg.fields.append(
-            Field(
-                node.inst_name,
-                node.lsb,
-                node.msb,
-                sw_acc_type=node.get_property("sw"),
-                hw_acc_type=node.get_property("hw"),
-                swmod=node.get_property("swmod"),
-                woclr=node.get_property("woclr"),
-                encode=node.get_property("encode"),
-                reset=node.get_property("reset"),
-                singlepulse=node.get_property("singlepulse")
-            )
+        field = Field(
+            node.inst_name,
+            node.lsb,
+            node.msb,
+            sw_acc_type=node.get_property("sw"),
+            hw_acc_type=node.get_property("hw"),
+            swmod=node.get_property("swmod"),
+            woclr=node.get_property("woclr"),
+            encode=node.get_property("encode"),
+            reset=node.get_property("reset"),
+            singlepulse=node.get_property("singlepulse"),
+            rclr=node.get_property("rclr"),
+            rset=node.get_property("rset"),
+            swacc=node.get_property("swacc"),
+            hw_pipeline=self._udp(node, "hectare_pipeline"),
+            **self._counter_props(node),
+            **self._intr_props(node)
+        )
+        for prop_name, ref in self._intr_refs(node).items():
+            self.cur_field_refs.append((field, node, prop_name, ref))
+
+        # HW inputs are sampled every clock cycle, a clear (set) on read would
+        # be overwritten right away; counters and interrupts handle the read
+        # in the write process
+        hw_driven = field.hw_acc_type in (AccessType.w, AccessType.rw)
+        if (field.rclr or field.rset) and hw_driven:
+            if not field.counter and field.intr is None:
+                raise ValueError(
+                    "{0}: rclr/rset is not supported on fields written by HW "
+                    "(hw={1}), except for counters and interrupts".format(
+                        node.get_path(), field.hw_acc_type.name
+                    )
+                )
+
+        self.cur_fields.append(field)
+
+    @staticmethod
+    def _udp(node, prop_name: str) -> Any:
+        """ user-defined property, None if it is not declared in the input """
+
+        try:
+            return node.get_property(prop_name)
+        except LookupError:
+            return None
+
+    @staticmethod
+    def _addrmap_path(node) -> str:
+        """ path of the innermost address map which contains the node """
+
+        while not isinstance(node, AddrmapNode):
+            node = node.parent
+        return node.get_path()
+
+    @staticmethod
+    def _intr_props(node) -> Dict[str, Any]:
+        """ interrupt properties of the field, the references (enable/mask)
+        are resolved per register element (see _intr_refs)
+        """
+
+        if not node.get_property("intr"):
+            return {}
+
+        return dict(
+            intr=node.get_property("intr type").name,
+            stickybit=node.get_property("stickybit"),
+            sticky=node.get_property("sticky"),
         )
 
+    @staticmethod
+    def _intr_refs(node) -> Dict[str, FieldNode]:
+        """ enable/mask/haltenable/haltmask of an interrupt field, they have to
+        reference a field of the same address map
+        """
+
+        if not node.get_property("intr"):
+            return {}
+
+        refs = {}
+        for prop_name in ["enable", "mask", "haltenable", "haltmask"]:
+            ref = node.get_property(prop_name)
+            if ref is None:
+                continue
+            if not isinstance(ref, FieldNode) or (
+                HectareListener._addrmap_path(ref) != HectareListener._addrmap_path(node)
+            ):
+                raise ValueError(
+                    "{0}: {1} has to reference a field in the same address map".format(
+                        node.get_path(), prop_name
+                    )
+                )
+            refs[prop_name] = ref
+        return refs
+
+    @staticmethod
+    def _counter_props(node) -> Dict[str, Any]:
+        """ counter properties of the field, only constant values are supported
+        (and the implicit incr input)
+        """
+
+        if not node.get_property("counter"):
+            return {}
+
+        if node.get_property("incr") is not None:
+            raise ValueError(
+                "{0}: incr has to be the implicit input".format(node.get_path())
+            )
+
+        incrvalue = node.get_property("incrvalue")
+        incrsaturate = node.get_property("incrsaturate")
+        if not isinstance(incrvalue, int) or not isinstance(incrsaturate, int):
+            raise ValueError(
+                "{0}: incrvalue and incrsaturate have to be constants".format(
+                    node.get_path()
+                )
+            )
+
+        if incrsaturate is True:
+            incrsaturate = (1 << node.width) - 1
+        elif incrsaturate is False:
+            incrsaturate = None
+
+        return dict(counter=True, incrvalue=incrvalue, incrsaturate=incrsaturate)
+
     def exit_Field(self, node):
         self.logger.debug("Exiting field, node = %s", node.get_path())
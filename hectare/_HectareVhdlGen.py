@@ -4,138 +4,550 @@ Copyright (c) 2020 - 2021 Deutsches Elektronen-Synchrotron DESY.
 See LICENSE.txt for license details.
 """
 
+import collections
 import datetime
 import getpass
 import os
 import socket
-from typing import Iterator, List, Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from systemrdl.rdltypes import AccessType
 
+import hectare._vhdl_options as _vhdl_options
 import hectare._vhdl_templates as _vhdlt
-from hectare._hectare_types import AddressMap, Field, Register
+from hectare._hectare_types import AddressMap, Field, Memory, Register
 
 
-def indent_lines(ls: List[str], ident_level: int) -> Iterator[str]:
+def indent_lines(ls: Iterable[str], ident_level: int) -> Iterator[str]:
     for l in ls:
-        yield " " * ident_level + l
+        yield " " * ident_level + l if l else l
+
+
+def join_lines(ls: Iterable[str]) -> Iterator[str]:
+    """ same as "\\n".join(ls), but piece by piece """
+
+    for i, l in enumerate(ls):
+        yield "\n" + l if i else l
+
+
+def section_lines(
+    heading: Iterable[str], ls: Iterable[str], footer: Iterable[str] = ()
+) -> Iterator[str]:
+    """ `ls` between `heading` and `footer`, nothing at all if `ls` is empty """
+
+    it = iter(ls)
+    for first in it:
+        yield from heading
+        yield first
+        yield from it
+        yield from footer
+
+
+class BusChannel(NamedTuple):
+    """ signal declarations and logic (templates) of one channel of a bus
+    front-end
+    """
+
+    sig_defs: str
+    logic: str
+
+
+class BusFrontend(NamedTuple):
+    """ bus protocol in front of the register core
+
+    The channels drive the core signals (raddr_word/rd_strobe for reads,
+    waddr_word/wr_en for writes, only while core_ready is set) from the bus
+    and return the read data (`rdata`) to the bus when rd_valid is set, a
+    write is done when wr_valid is set. `read` and `write` hold the available
+    implementations of the channels (by read_channel and write_channel),
+    `wdata` and `wstrb` are the signals with the write data and the byte
+    enables.
+    """
+
+    entity_suffix: str
+    generics: str
+    ports: str
+    read: Dict[str, BusChannel]
+    write: Dict[str, BusChannel]
+    wdata: str
+    wstrb: str
+
+
+FRONTENDS = collections.OrderedDict(
+    [
+        (
+            "axi4lite",
+            BusFrontend(
+                "axi",
+                "    G_ADDR_W: integer := 8\n",
+                _vhdlt.VHDL_PORTS_AXI,
+                {
+                    "fsm": BusChannel(_vhdlt.VHDL_INTERNAL_SIG_DEFS_READ, _vhdlt.VHDL_FSM_READ),
+                    "pipelined": BusChannel(
+                        _vhdlt.VHDL_INTERNAL_SIG_DEFS_READ_PIPELINED, _vhdlt.VHDL_READ_PIPELINED
+                    ),
+                },
+                {
+                    "fsm": BusChannel(_vhdlt.VHDL_INTERNAL_SIG_DEFS_WRITE, _vhdlt.VHDL_FSM_WRITE),
+                    "pipelined": BusChannel(
+                        _vhdlt.VHDL_INTERNAL_SIG_DEFS_WRITE_PIPELINED, _vhdlt.VHDL_WRITE_PIPELINED
+                    ),
+                },
+                "wdata_wire",
+                "wstrb_wire",
+            ),
+        ),
+        (
+            "axi4",
+            BusFrontend(
+                "axi4",
+                "    G_ADDR_W: integer := 8;\n    G_ID_W: integer := 1\n",
+                _vhdlt.VHDL_PORTS_AXI4,
+                {
+                    "fsm": BusChannel(
+                        _vhdlt.VHDL_INTERNAL_SIG_DEFS_READ_AXI4, _vhdlt.VHDL_FSM_READ_AXI4
+                    )
+                },
+                {
+                    "fsm": BusChannel(
+                        _vhdlt.VHDL_INTERNAL_SIG_DEFS_WRITE_AXI4, _vhdlt.VHDL_FSM_WRITE_AXI4
+                    )
+                },
+                "S_AXI_WDATA",
+                "S_AXI_WSTRB",
+            ),
+        ),
+        (
+            "avalon",
+            BusFrontend(
+                "avmm",
+                "    G_ADDR_W: integer := 8\n",
+                _vhdlt.VHDL_PORTS_AVALON,
+                {"fsm": BusChannel("", _vhdlt.VHDL_FRONTEND_AVALON_READ)},
+                {"fsm": BusChannel("", _vhdlt.VHDL_FRONTEND_AVALON_WRITE)},
+                "avs_writedata",
+                "avs_byteenable",
+            ),
+        ),
+        (
+            "wishbone",
+            BusFrontend(
+                "wb",
+                "    G_ADDR_W: integer := 8\n",
+                _vhdlt.VHDL_PORTS_WISHBONE,
+                {"fsm": BusChannel("", _vhdlt.VHDL_FRONTEND_WISHBONE_READ)},
+                {"fsm": BusChannel("", _vhdlt.VHDL_FRONTEND_WISHBONE_WRITE)},
+                "wb_dat_i",
+                "wb_sel_i",
+            ),
+        ),
+    ]
+)
 
 
 class HectareVhdlGen:
-    def __init__(self, addrmap, input_filename=""):
+    """ Generates AXI4-Lite slave for an address map
+
+    The register core (address decoder, read data register, write logic,
+    memories and external registers) is driven through raddr_word/rd_strobe
+    and waddr_word/wr_en and answers with rd_valid/wr_valid, the bus protocol
+    is implemented by a front-end (see FRONTENDS) selected with `bus`:
+
+    - "axi4lite": AXI4-Lite
+    - "axi4": AXI4 (full), INCR, FIXED and WRAP bursts with one beat per
+      clock cycle, the beats have to use the full width of the bus (narrower
+      AxSIZE is answered with SLVERR)
+    - "avalon": Avalon-MM, word addresses, pipelined reads with variable
+      latency (one clock cycle for registers and memories)
+    - "wishbone": Wishbone B4 pipelined
+
+    `read_channel` selects the implementation of the AXI4-Lite read channel:
+
+    - "fsm": simple state machine, one read every two clock cycles
+    - "pipelined": skid buffer, one read per clock cycle
+
+    `write_channel` selects the implementation of the AXI4-Lite write
+    channels:
+
+    - "fsm": simple state machine, one write every two clock cycles
+    - "pipelined": new write accepted while the previous response is
+      accepted, one write per clock cycle
+
+    The other buses only have the "fsm" channels (their own logic).
+
+    If `use_wstrb` is set, only the bytes enabled with the byte enables of the
+    bus (e.g. S_AXI_WSTRB) are written.
+
+    Memories are mapped to block RAM (one write and up to two registered read
+    ports): SW writable memories are written over the bus and read by the HW,
+    SW read-only memories are written by the HW.
+
+    External registers are forwarded to the user logic over a
+    request/acknowledge interface, the core is busy (core_ready is low) until
+    the access is acknowledged.
+
+    `read_decoder` selects the read address decoder:
+
+    - "flat": single case statement over the word address
+    - "two_level": the address is split into block and offset, the register
+      inside of each block and the block are selected in two registered
+      stages (one additional clock cycle of read latency, during which the
+      core is busy)
+
+    The resulting read latency (clock cycles from the accepted read request
+    to the read data, for registers and memories) is available in
+    `read_latency` and is noted in the generated VHDL.
+
+    With `hw_clk`, the HW ports are in a separate clock domain (`hw_clk`
+    port). Register values are transferred with a req/ack toggle handshake
+    per register (outputs whenever the register changes, inputs sampled
+    continuously), swmod/swacc pulses with toggle synchronizers. Ports which
+    need a pulse per event in the other direction (counters, interrupts,
+    woclr, singlepulse) and HW ports of register arrays and memories are not
+    supported in this mode, irq_o and the external register interface stay
+    in the `clk` domain.
+
+    `hw_pipeline` adds register stages on all HW ports of the fields (in the
+    clock domain of the ports), `Field.hw_pipeline` overrides it per field.
+    The outputs of a field (value, swmod, woclr, ...) are delayed by the same
+    number of clock cycles, so that they stay aligned. The stages are marked
+    with `shreg_extract = "no"` (they should not be packed into shift
+    registers), with `max_fanout` the registers and the last stages also get
+    the `max_fanout` attribute.
+    """
+
+    BUSES = tuple(FRONTENDS)
+    READ_CHANNELS = _vhdl_options.READ_CHANNELS
+    WRITE_CHANNELS = _vhdl_options.WRITE_CHANNELS
+    READ_DECODERS = _vhdl_options.READ_DECODERS
+
+    def __init__(
+        self,
+        addrmap,
+        input_filename="",
+        read_channel="fsm",
+        write_channel="fsm",
+        use_wstrb=False,
+        read_decoder="flat",
+        hw_clk=False,
+        hw_pipeline=0,
+        max_fanout=None,
+        bus="axi4lite",
+    ):
+        if bus not in self.BUSES:
+            raise ValueError("unsupported bus: {0}".format(bus))
+        if read_channel not in self.READ_CHANNELS:
+            raise ValueError("unsupported read channel: {0}".format(read_channel))
+        if write_channel not in self.WRITE_CHANNELS:
+            raise ValueError("unsupported write channel: {0}".format(write_channel))
+        for channel, channels, kind in [
+            (read_channel, FRONTENDS[bus].read, "read"),
+            (write_channel, FRONTENDS[bus].write, "write"),
+        ]:
+            if channel not in channels:
+                raise ValueError(
+                    "{0} slave has its own {1} logic, {1}_channel {2} is not "
+                    "supported".format(bus, kind, channel)
+                )
+        if read_decoder not in self.READ_DECODERS:
+            raise ValueError("unsupported read decoder: {0}".format(read_decoder))
+        if hw_pipeline < 0 or any(
+            field.hw_pipeline is not None and field.hw_pipeline < 0
+            for reg in addrmap.regs
+            for field in reg.fields
+        ):
+            raise ValueError("number of pipeline stages has to be positive")
+        if max_fanout is not None and max_fanout < 1:
+            raise ValueError("max_fanout has to be at least 1")
+        for mem in addrmap.mems:
+            if mem.width != addrmap.data_w:
+                raise ValueError(
+                    "{0}: memwidth ({1}) has to be equal to the data width ({2})".format(
+                        mem.name, mem.width, addrmap.data_w
+                    )
+                )
+
         self.addrmap = addrmap
+        # storage of the external registers is in the user logic, the slave
+        # only forwards the accesses (see `_gen_ext_ports`)
+        self.regs = [reg for reg in addrmap.regs if not reg.external]
+        self.ext_regs = [reg for reg in addrmap.regs if reg.external]
         self.cur_indent = 0
-        self.data_w_bytes = 4  # 32 / 8  # TODO check regwidth
+        self.data_w_bytes = addrmap.data_w // 8
         self.input_filename = input_filename
-
-    def generate_package(self) -> Optional[str]:
-        """ generates package with VHDL enums if the register description
-        contains enums
-        """
-
-        print("generate_package")
-
-        # first check if any fields are enum, otherwise package is not generated
-        lines = []
-        generated_enums = set()
-
-        for reg in self.addrmap.regs:
+        self.read_channel = read_channel
+        self.write_channel = write_channel
+        self.use_wstrb = use_wstrb
+        self.read_decoder = read_decoder
+        self.hw_clk = hw_clk
+        self.hw_pipeline = hw_pipeline
+        self.max_fanout = max_fanout
+        self.bus = bus
+
+        if hw_clk:
+            self._check_cdc()
+
+        for reg in self.regs:
             for field in reg.fields:
-                if field.encode is not None and field.encode not in generated_enums:
-                    lines.extend(self._gen_single_enum_type(field))
-                    lines.append("")
-                    generated_enums.add(field.encode)
-
-        if lines:
-            # at least one enum was found, generated package string
+                if field.intr is None:
+                    continue
+                if reg.is_array:
+                    raise ValueError(
+                        "{0}: interrupts in register arrays are not supported".format(
+                            reg.name
+                        )
+                    )
+                for ref in self._intr_refs(field).values():
+                    _, ref_field = self._resolve_field_ref(ref)
+                    if ref_field.msb - ref_field.lsb != field.msb - field.lsb:
+                        raise ValueError(
+                            "{0}.{1}: width of {2} does not match".format(
+                                reg.name, field.name, ref
+                            )
+                        )
 
-            s = ""
-            s += self._gen_header(self.input_filename)
-            s += _vhdlt.VHDL_LIBS
-            s += "\n"
+        self.blk_offs_bits = 0
+        if read_decoder == "two_level":
+            self.blk_offs_bits = self._split_read_addr(
+                [
+                    reg.addr // self.data_w_bytes
+                    for reg in self.regs
+                    if not reg.is_array
+                ]
+            )
 
-            s += "package {entity_name}_pkg is\n".format(entity_name=self.addrmap.name)
-            s += "\n"
-            s += "  -- attributes\n"
-            s += "  attribute enum_encoding: string;\n"
-            s += "\n"
+    @property
+    def read_latency(self) -> int:
+        return 2 if self.read_decoder == "two_level" else 1
 
-            for line in lines:
-                s += "  " + line + "\n"
+    @property
+    def frontend(self) -> BusFrontend:
+        return FRONTENDS[self.bus]
 
-            s += "\n"
-            s += "end package;\n"
+    @property
+    def entity_name(self) -> str:
+        return "{0}_{1}".format(self.addrmap.name, self.frontend.entity_suffix)
 
-            return s
+    @property
+    def has_package(self) -> bool:
+        """ the package is only needed for enums and for the port types of
+        register arrays
+        """
 
-    def generate_string(self) -> str:
-        s = ""
+        return any(reg.summary.has_enum for reg in self.regs) or any(
+            self._gen_single_array_port_type(field) is not None
+            for reg in self._arrays()
+            for field in reg.fields
+        )
 
-        s += self._gen_header(self.input_filename)
+    def generate_package(self, header: bool = True) -> Optional[str]:
+        """ generates package with VHDL enums if the register description
+        contains enums, and with the port types of register arrays
+        """
 
-        s += _vhdlt.VHDL_LIBS
-        s += "\n"
+        if not self.has_package:
+            return None
+        return "".join(self.generate_package_chunks(header=header))
 
-        # check if there is package being generated, add package to the includes
-        contains_enums = False
-        for reg in self.addrmap.regs:
-            for field in reg.fields:
-                if field.encode is not None:
-                    contains_enums = True
+    def generate_package_chunks(self, header: bool = True) -> Iterator[str]:
+        """ generates the package piece by piece (see generate_chunks), only
+        if has_package is set
+        """
 
-        if contains_enums:
-            s += "use work.{entity_name}_pkg.all;\n".format(
-                entity_name=self.addrmap.name
-            )
-            s += "\n"
+        print("generate_package")
 
-        s += "entity {entity_name}_axi is\n".format(entity_name=self.addrmap.name)
-        s += "  generic(\n"
-        s += "    G_ADDR_W: integer := 8\n"
-        s += "  );\n"
-        s += "  port (\n"
-        s += "\n".join(indent_lines(self._gen_ports(), 4))
-        s += "\n"
-        s += _vhdlt.VHDL_PORTS_AXI
-        s += "\n);\n"
-        s += "end entity;\n\n"
+        if header:
+            yield self._gen_header(self.input_filename)
+        yield _vhdlt.VHDL_LIBS
+        yield "\n"
 
-        s += "architecture arch of {entity_name}_axi is\n".format(
-            entity_name=self.addrmap.name
-        )
+        yield "package {entity_name}_pkg is\n".format(entity_name=self.addrmap.name)
+        yield "\n"
+        yield "  -- attributes\n"
+        yield "  attribute enum_encoding: string;\n"
+        yield "\n"
 
-        s += "\n\n  -- address constants\n"
-        s += "\n".join(indent_lines(self._gen_reg_addr(), 2))
+        generated_enums = set()
+        for reg in self.regs:
+            if not reg.summary.has_enum:
+                continue
+            for field in reg.fields:
+                if field.encode is not None and field.encode not in generated_enums:
+                    for line in self._gen_single_enum_type(field):
+                        yield "  " + line + "\n"
+                    yield "  \n"
+                    generated_enums.add(field.encode)
 
-        s += "\n\n  -- field ranges constants\n"
-        s += "\n".join(indent_lines(self._gen_field_ranges(), 2))
+        generated_array_types = set()
+        for reg in self._arrays():
+            for field in reg.fields:
+                array_type = self._gen_single_array_port_type(field)
+                if array_type is not None and array_type not in generated_array_types:
+                    yield "  " + array_type + "\n"
+                    generated_array_types.add(array_type)
+        if generated_array_types:
+            yield "  \n"
+
+        yield "\n"
+        yield "end package;\n"
+
+    def generate_string(self, header: bool = True) -> str:
+        return "".join(self.generate_chunks(header=header))
+
+    def generate_chunks(self, header: bool = True) -> Iterator[str]:
+        """ generates the VHDL code piece by piece, the output can be written
+        to a file without holding all of it in memory
+        """
 
-        s += "\n\n  -- registers\n"
-        s += "\n".join(indent_lines(self._gen_regs(), 2))
-        s += "\n\n"
+        if header:
+            yield self._gen_header(self.input_filename)
 
-        s += _vhdlt.VHDL_INTERNAL_SIG_DEFS
+        yield _vhdlt.VHDL_LIBS
+        yield "\n"
 
-        s += "\n\nbegin\n\n"
+        # check if there is package being generated, add package to the includes
+        contains_enums = any(reg.summary.has_enum for reg in self.regs)
 
-        s += "\n".join(indent_lines(self._gen_hw_access(), 2))
+        if contains_enums or self._arrays():
+            yield "use work.{entity_name}_pkg.all;\n".format(
+                entity_name=self.addrmap.name
+            )
+            yield "\n"
 
-        s += "\n\n\n"
-        s += _vhdlt.VHDL_FSM_READ
+        yield "-- read latency: {0} clock cycle(s) from the read request to the read data\n".format(
+            self.read_latency
+        )
+        yield "entity {entity_name} is\n".format(entity_name=self.entity_name)
+        yield "  generic(\n"
+        yield self.frontend.generics
+        yield "  );\n"
+        yield "  port (\n"
+        yield from join_lines(indent_lines(self._gen_ports(), 4))
+        yield "\n"
+        yield self._fmt_template(self.frontend.ports)
+        yield "\n);\n"
+        yield "end entity;\n\n"
+
+        yield "architecture arch of {entity_name} is\n".format(
+            entity_name=self.entity_name
+        )
 
-        s += "\n\n  -- ### read logic\n\n"
-        s += "\n".join(self._gen_read_logic())
-        s += "\n"
+        yield "\n\n  -- address constants\n"
+        yield from join_lines(indent_lines(self._gen_reg_addr(), 2))
+        if self.read_decoder == "two_level":
+            yield "\n  constant C_RD_BLK_SIZE : integer := {0};".format(
+                2 ** self.blk_offs_bits
+            )
 
-        s += _vhdlt.VHDL_FSM_WRITE
+        yield "\n\n  -- field ranges constants\n"
+        yield from join_lines(indent_lines(self._gen_field_ranges(), 2))
+
+        yield "\n\n  -- registers\n"
+        yield from join_lines(indent_lines(self._gen_regs(), 2))
+        yield "\n\n"
+
+        if self.addrmap.mems:
+            yield "  -- memories\n"
+            yield from join_lines(indent_lines(self._gen_mem_sigs(), 2))
+            yield "\n\n"
+
+        if self.hw_clk:
+            yield "  -- clock domain crossing\n"
+            yield from join_lines(indent_lines(self._gen_cdc_sigs(), 2))
+            yield "\n\n"
+
+        retiming_sigs = self._gen_retiming_sigs()
+        if retiming_sigs:
+            yield "  -- retiming\n"
+            yield from join_lines(indent_lines(retiming_sigs, 2))
+            yield "\n\n"
+
+        yield self._fmt_template(_vhdlt.VHDL_INTERNAL_SIG_DEFS_CORE)
+        yield from join_lines(indent_lines(self._gen_core_sigs(), 2))
+        yield "\n"
+        if self.ext_regs:
+            yield self._fmt_template(_vhdlt.VHDL_INTERNAL_SIG_DEFS_EXT)
+        yield self._fmt_template(self.frontend.read[self.read_channel].sig_defs)
+        yield self._fmt_template(self.frontend.write[self.write_channel].sig_defs)
+
+        yield "\n\nbegin\n\n"
+
+        yield from join_lines(indent_lines(self._gen_hw_access(), 2))
+        pipeline_logic = self._gen_pipeline_logic()
+        if pipeline_logic:
+            yield "\n\n  -- HW port pipeline\n"
+            yield from join_lines(indent_lines(pipeline_logic, 2))
+        if self.hw_clk:
+            yield "\n\n  -- clock domain crossing\n\n"
+            yield from join_lines(self._gen_cdc_logic())
+        if self._irq_terms("enable", "mask"):
+            yield "\n\n  -- interrupts\n"
+            yield from join_lines(indent_lines(self._gen_irq(), 2))
+
+        wdata = self.frontend.wdata
+        wstrb = self.frontend.wstrb if self.use_wstrb else None
+
+        yield "\n\n\n  -- ### bus front-end\n"
+        yield self._fmt_template(self.frontend.read[self.read_channel].logic)
+        yield self._fmt_template(self.frontend.write[self.write_channel].logic)
+
+        yield "  -- ### register core\n\n"
+        yield from join_lines(self._gen_core_handshake())
+        yield "\n"
+        if self.ext_regs:
+            yield "\n  -- ### external registers\n\n"
+            yield from join_lines(self._gen_ext_logic(wdata, wstrb))
+            yield "\n"
+
+        yield "\n  -- ### read logic\n\n"
+        if self.read_decoder == "two_level":
+            yield from join_lines(self._gen_read_logic_two_level())
+        else:
+            yield from join_lines(self._gen_read_logic())
+        yield "\n"
+
+        yield "\n  -- ### write logic (use waddr_word and {0})\n\n".format(wdata)
+        yield from join_lines(self._gen_write_logic(wdata, wstrb))
+        yield "\n"
+
+        if self.addrmap.mems:
+            yield "\n  -- ### memories\n\n"
+            yield from join_lines(self._gen_mem_logic(wdata, wstrb))
+            yield "\n"
+        yield _vhdlt.VHDL_END_ARCH
+
+    def _fmt_template(self, template: str, **kwargs) -> str:
+        return template.format(
+            **self._wstrb_template_args(),
+            data_w=self.data_w_bytes * 8,
+            addr_lsb=(self.data_w_bytes - 1).bit_length(),
+            rdata=self._rdata(),
+            **kwargs
+        )
 
-        s += "  -- ### write logic (use waddr_word and wdata_reg)\n\n"
-        s += "\n".join(self._gen_write_logic())
+    def _wstrb_template_args(self) -> Dict[str, str]:
+        """ the byte enables are only held by the AXI4-Lite write channels if
+        they are used, each value is appended to a line of the template
+        """
 
-        s += _vhdlt.VHDL_WRITE_OUTPUT
-        s += _vhdlt.VHDL_END_ARCH
+        if not self.use_wstrb:
+            return dict.fromkeys(
+                [
+                    "wstrb_hold_def",
+                    "wstrb_wire_def",
+                    "wstrb_wire_assign",
+                    "wstrb_hold_capture",
+                ],
+                "",
+            )
 
-        return s
+        strb_type = "std_logic_vector({0}-1 downto 0)".format(self.data_w_bytes)
+        return {
+            "wstrb_hold_def": "\n  signal wstrb_hold : {0};".format(strb_type),
+            "wstrb_wire_def": "\n  signal wstrb_wire : {0};".format(strb_type),
+            "wstrb_wire_assign": "\n  wstrb_wire <= wstrb_hold when wdata_full = '1' else S_AXI_WSTRB;",
+            "wstrb_hold_capture": "\n            wstrb_hold <= S_AXI_WSTRB;",
+        }
 
     @staticmethod
     def _gen_header(input_filename: str, verbose: bool = False) -> str:
@@ -153,150 +565,1344 @@ class HectareVhdlGen:
 
     def _gen_ports(self) -> List[str]:
         ports = []
-        for reg in self.addrmap.regs:
+        for reg in self.regs:
             for field in reg.fields:
-                ports.extend(self._gen_single_port(reg.name, field))
+                ports.extend(
+                    self._gen_single_port(
+                        reg.name, field, reg.count if reg.is_array else 0
+                    )
+                )
+        for mem in self.addrmap.mems:
+            ports.extend(self._gen_single_mem_port(mem))
+        if self.ext_regs:
+            ports.extend(self._gen_ext_ports())
+        if self.hw_clk:
+            ports.append("hw_clk : in std_logic;")
+        if self._irq_terms("enable", "mask"):
+            ports.append("irq_o : out std_logic;")
+        if self._irq_terms("haltenable", "haltmask"):
+            ports.append("halt_o : out std_logic;")
         return ports
 
+    @staticmethod
+    def _intr_refs(field: Field) -> Dict[str, str]:
+        """ enable/mask/haltenable/haltmask references of an interrupt field """
+
+        return {
+            prop_name: getattr(field, prop_name)
+            for prop_name in ["enable", "mask", "haltenable", "haltmask"]
+            if getattr(field, prop_name) is not None
+        }
+
+    def _resolve_field_ref(self, ref: str) -> Tuple[Register, Field]:
+        """ `ref` is "REG.FIELD" """
+
+        reg_name, field_name = ref.split(".")
+        reg = self.addrmap.reg_by_name(reg_name)
+        if reg is not None and not reg.external:
+            for field in reg.fields:
+                if field.name == field_name:
+                    return reg, field
+        raise ValueError("referenced field not found: {0}".format(ref))
+
+    def _irq_terms(self, enable_prop: str, mask_prop: str) -> List[str]:
+        """ one condition per interrupt field which contributes to the output,
+        with `enable_prop` and `mask_prop` ("enable" and "mask" for irq_o,
+        "haltenable" and "haltmask" for halt_o)
+
+        Without enable and mask, all interrupt fields contribute to irq_o and
+        none to halt_o.
+        """
+
+        terms = []
+        for reg in self.regs:
+            for field in reg.fields:
+                if field.intr is None:
+                    continue
+                enable = getattr(field, enable_prop)
+                mask = getattr(field, mask_prop)
+                if enable_prop == "haltenable" and enable is None and mask is None:
+                    continue
+
+                expr = "reg_{name}({reg_slice})".format(
+                    name=reg.name.lower(), reg_slice=self._reg_slice(field)
+                )
+                for ref, op in [(enable, " and "), (mask, " and not ")]:
+                    if ref is not None:
+                        ref_reg, ref_field = self._resolve_field_ref(ref)
+                        expr += op + "reg_{name}({reg_slice})".format(
+                            name=ref_reg.name.lower(),
+                            reg_slice=self._reg_slice(ref_field),
+                        )
+
+                if field.msb == field.lsb:
+                    terms.append("({0}) = '1'".format(expr))
+                else:
+                    terms.append("unsigned({0}) /= 0".format(expr))
+        return terms
+
+    def _gen_irq(self) -> List[str]:
+        """ OR-reduced interrupt (and halt) outputs """
+
+        lines = []
+        for port, props in [("irq_o", ("enable", "mask")), ("halt_o", ("haltenable", "haltmask"))]:
+            terms = self._irq_terms(*props)
+            if not terms:
+                continue
+            lines.append("{port} <= '1' when {term}".format(port=port, term=terms[0]))
+            lines.extend("  or {0}".format(term) for term in terms[1:])
+            lines[-1] += " else '0';"
+        return lines
+
+    def _gen_ext_ports(self) -> List[str]:
+        """ request/acknowledge interface to the external registers
+
+        A request (`ext_rd_req_o`, `ext_wr_req_o`) is held until the user logic
+        acknowledges it, the address is the byte address of the register. The
+        read data is taken when `ext_rd_ack_i` is asserted.
+        """
+
+        data_w = self.data_w_bytes * 8
+        return [
+            "ext_rd_req_o : out std_logic;",
+            "ext_rd_addr_o : out std_logic_vector(G_ADDR_W-1 downto 0);",
+            "ext_rd_data_i : in std_logic_vector({0}-1 downto 0);".format(data_w),
+            "ext_rd_ack_i : in std_logic;",
+            "ext_wr_req_o : out std_logic;",
+            "ext_wr_addr_o : out std_logic_vector(G_ADDR_W-1 downto 0);",
+            "ext_wr_data_o : out std_logic_vector({0}-1 downto 0);".format(data_w),
+            "ext_wr_strb_o : out std_logic_vector({0}/8-1 downto 0);".format(data_w),
+            "ext_wr_ack_i : in std_logic;",
+        ]
+
+    def _gen_ext_hit(self, hit: str, addr: str) -> List[str]:
+        """ `hit` is set if the word address `addr` belongs to an external register """
+
+        conds = []
+        for reg in self.ext_regs:
+            if reg.is_array:
+                conds.append("(" + self._gen_array_cond(reg, addr) + ")")
+            else:
+                conds.append("{addr} = C_ADDR_{name}".format(addr=addr, name=reg.name.upper()))
+
+        lines = ["{hit} <= '1' when {cond}".format(hit=hit, cond=conds[0])]
+        lines.extend("  or {0}".format(cond) for cond in conds[1:])
+        lines[-1] += " else '0';"
+        return lines
+
     def _gen_reg_addr(self) -> List[str]:
+        addrs = []
+        for reg in self.addrmap.regs:
+            addrs.append(self._gen_single_addr(reg, self.data_w_bytes))
+            addrs.extend(self._gen_single_array_consts(reg, self.data_w_bytes))
+        for mem in self.addrmap.mems:
+            addrs.extend(self._gen_single_mem_consts(mem, self.data_w_bytes))
+        return addrs
+
+    @staticmethod
+    def _mem_sw_writable(mem: Memory) -> bool:
+        return mem.sw_acc_type in (AccessType.w, AccessType.rw)
+
+    @staticmethod
+    def _mem_sw_readable(mem: Memory) -> bool:
+        return mem.sw_acc_type in (AccessType.r, AccessType.rw)
+
+    @staticmethod
+    def _gen_single_mem_consts(mem: Memory, data_w_bytes: int) -> List[str]:
         return [
-            self._gen_single_addr(reg, self.data_w_bytes) for reg in self.addrmap.regs
+            "constant C_ADDR_{name} : integer := {word_addr};".format(
+                name=mem.name.upper(), word_addr=mem.addr // data_w_bytes
+            ),
+            "constant C_ENTRIES_{name} : integer := {entries};".format(
+                name=mem.name.upper(), entries=mem.entries
+            ),
         ]
 
+    @staticmethod
+    def _gen_single_mem_port(mem: Memory) -> List[str]:
+        """ HW side of the memory: read port, with write enable and data if the
+        memory is read-only for SW
+        """
+
+        fmt_args = dict(
+            name=mem.name.lower(),
+            addr_w=max(1, (mem.entries - 1).bit_length()),
+            w=mem.width,
+        )
+        ports = ["{name}_addr_i : in std_logic_vector({addr_w}-1 downto 0);"]
+        if not HectareVhdlGen._mem_sw_writable(mem):
+            ports.append("{name}_we_i : in std_logic;")
+            ports.append("{name}_wdata_i : in std_logic_vector({w}-1 downto 0);")
+        ports.append("{name}_rdata_o : out std_logic_vector({w}-1 downto 0);")
+        return [port.format(**fmt_args) for port in ports]
+
+    def _gen_mem_sigs(self) -> List[str]:
+        sigs = []
+        for mem in self.addrmap.mems:
+            fmt_args = dict(name=mem.name.lower(), NAME=mem.name.upper(), w=mem.width)
+            sigs.append(
+                "type t_mem_{name} is array (0 to C_ENTRIES_{NAME}-1) of "
+                "std_logic_vector({w}-1 downto 0);".format(**fmt_args)
+            )
+            sigs.append("signal mem_{name} : t_mem_{name};".format(**fmt_args))
+            if self._mem_sw_readable(mem):
+                sigs.append(
+                    "signal mem_{name}_rdata : std_logic_vector({w}-1 downto 0);".format(
+                        **fmt_args
+                    )
+                )
+                sigs.append("signal mem_{name}_rd_hit : std_logic;".format(**fmt_args))
+        return sigs
+
+    def _rdata_choices(self) -> List[Tuple[str, str]]:
+        """ (data, select) of the read data which does not go through
+        rdata_reg: memories (directly from the block RAM) and external
+        registers
+        """
+
+        choices = [
+            ("mem_{0}_rdata".format(mem.name.lower()), "mem_{0}_rd_hit".format(mem.name.lower()))
+            for mem in self.addrmap.mems
+            if self._mem_sw_readable(mem)
+        ]
+        if self.ext_regs:
+            choices.append(("ext_rdata_reg", "ext_rd_sel"))
+        return choices
+
+    def _rdata(self) -> str:
+        """ read data of the core (see _gen_core_handshake) """
+
+        return "rdata_mux" if self._rdata_choices() else "rdata_reg"
+
+    def _gen_core_sigs(self) -> List[str]:
+        sigs = []
+        if self._rdata_choices():
+            sigs.append(
+                "signal rdata_mux : std_logic_vector({0}-1 downto 0);".format(
+                    self.data_w_bytes * 8
+                )
+            )
+        if self.read_decoder == "two_level":
+            sigs.extend(self._gen_read_blk_sigs())
+        return sigs
+
+    def _gen_core_handshake(self) -> List[str]:
+        """ rd_valid and wr_valid one clock cycle after the request (two for
+        the reads with the two-level decoder), after the acknowledge for the
+        external registers; the core is busy while the two-level decoder or
+        an external register access is in progress
+        """
+
+        rd_first = "rd_strobe"
+        wr_first = "wr_en"
+        rd_ack = ""
+        wr_ack = ""
+        busy = []
+        if self.ext_regs:
+            rd_first = "(rd_strobe and not ext_rd_hit)"
+            wr_first = "(wr_en and not ext_wr_hit)"
+            rd_ack = " or (ext_rd_req and ext_rd_ack_i)"
+            wr_ack = " or (ext_wr_req and ext_wr_ack_i)"
+            busy = ["ext_rd_req", "ext_wr_req"]
+        if self.read_decoder == "two_level":
+            rd_decode = rd_first
+            rd_first = "rd_decode"
+            busy.insert(0, "rd_decode")
+
+        lines = [
+            "  proc_core_valid: process (clk)",
+            "  begin",
+            "    if rising_edge(clk) then",
+            "      if reset = '1' then",
+        ]
+        if self.read_decoder == "two_level":
+            lines.append("        rd_decode <= '0';")
+        lines.append("        rd_valid <= '0';")
+        lines.append("        wr_valid <= '0';")
+        lines.append("      else")
+        if self.read_decoder == "two_level":
+            lines.append("        rd_decode <= {0};".format(rd_decode))
+        lines.append("        rd_valid <= {0}{1};".format(rd_first, rd_ack))
+        lines.append("        wr_valid <= {0}{1};".format(wr_first, wr_ack))
+        lines.append("      end if;")
+        lines.append("    end if;")
+        lines.append("  end process;")
+        lines.append("")
+        if busy:
+            lines.append("  core_ready <= not ({0});".format(" or ".join(busy)))
+        else:
+            lines.append("  core_ready <= '1';")
+
+        choices = self._rdata_choices()
+        if choices:
+            lines.append("")
+            lines.append("  -- memories and external registers are not read through rdata_reg")
+            for i, (data, sel) in enumerate(choices):
+                lines.append(
+                    "{0}{1} when {2} = '1' else".format(
+                        "  rdata_mux <= " if i == 0 else " " * 15, data, sel
+                    )
+                )
+            lines.append(" " * 15 + "rdata_reg;")
+        return lines
+
+    def _gen_ext_logic(self, wdata: str, wstrb: Optional[str]) -> List[str]:
+        """ the request to the external registers is held until it is
+        acknowledged, address and write data are held with it
+        """
+
+        addr = "std_logic_vector(shift_left(to_unsigned({0}, G_ADDR_W), {1}))"
+        addr_lsb = (self.data_w_bytes - 1).bit_length()
+
+        lines = []
+        lines.extend(indent_lines(self._gen_ext_hit("ext_rd_hit", "raddr_word"), 2))
+        lines.extend(indent_lines(self._gen_ext_hit("ext_wr_hit", "waddr_word"), 2))
+        lines.append("")
+        lines.extend(
+            [
+                "  proc_ext: process (clk)",
+                "  begin",
+                "    if rising_edge(clk) then",
+                "      if reset = '1' then",
+                "        ext_rd_req <= '0';",
+                "        ext_rd_sel <= '0';",
+                "        ext_wr_req <= '0';",
+                "      else",
+                "        if rd_strobe = '1' then",
+                "          ext_rd_req <= ext_rd_hit;",
+                "          ext_rd_sel <= ext_rd_hit;",
+                "          ext_rd_addr_reg <= raddr_word;",
+                "        elsif ext_rd_ack_i = '1' then",
+                "          ext_rd_req <= '0';",
+                "        end if;",
+                "        if wr_en = '1' then",
+                "          ext_wr_req <= ext_wr_hit;",
+                "          ext_wr_addr_reg <= waddr_word;",
+                "          ext_wr_data_reg <= {0};".format(wdata),
+                "          ext_wr_strb_reg <= {0};".format(
+                    wstrb if wstrb is not None else "(others => '1')"
+                ),
+                "        elsif ext_wr_ack_i = '1' then",
+                "          ext_wr_req <= '0';",
+                "        end if;",
+                "      end if;",
+                "      if ext_rd_req = '1' and ext_rd_ack_i = '1' then",
+                "        ext_rdata_reg <= ext_rd_data_i;",
+                "      end if;",
+                "    end if;",
+                "  end process;",
+                "",
+                "  ext_rd_req_o <= ext_rd_req;",
+                "  ext_rd_addr_o <= {0};".format(addr.format("ext_rd_addr_reg", addr_lsb)),
+                "  ext_wr_req_o <= ext_wr_req;",
+                "  ext_wr_addr_o <= {0};".format(addr.format("ext_wr_addr_reg", addr_lsb)),
+                "  ext_wr_data_o <= ext_wr_data_reg;",
+                "  ext_wr_strb_o <= ext_wr_strb_reg;",
+            ]
+        )
+        return lines
+
+    def _gen_mem_logic(self, wdata: str, wstrb: Optional[str]) -> List[str]:
+        """ SW access to the memories (written with wr_en, read in the same
+        cycle as rdata_reg) and HW access
+        """
+
+        lines = []
+        for mem in self.addrmap.mems:
+            fmt_args = dict(
+                name=mem.name.lower(),
+                NAME=mem.name.upper(),
+                wdata=wdata,
+                wstrb=wstrb,
+                n_bytes=self.data_w_bytes,
+            )
+
+            sw_lines = []
+            if self._mem_sw_writable(mem):
+                sw_lines.append(
+                    "if wr_en = '1' and waddr_word >= C_ADDR_{NAME} and "
+                    "waddr_word < C_ADDR_{NAME} + C_ENTRIES_{NAME} then"
+                )
+                if wstrb is not None:
+                    sw_lines.append("  for b in 0 to {n_bytes}-1 loop")
+                    sw_lines.append("    if {wstrb}(b) = '1' then")
+                    sw_lines.append(
+                        "      mem_{name}(waddr_word - C_ADDR_{NAME})(8*b+7 downto 8*b) "
+                        "<= {wdata}(8*b+7 downto 8*b);"
+                    )
+                    sw_lines.append("    end if;")
+                    sw_lines.append("  end loop;")
+                else:
+                    sw_lines.append("  mem_{name}(waddr_word - C_ADDR_{NAME}) <= {wdata};")
+                sw_lines.append("end if;")
+            if self._mem_sw_readable(mem):
+                sw_lines.append("if rd_strobe = '1' then")
+                sw_lines.append(
+                    "  mem_{name}_rdata <= mem_{name}((raddr_word - C_ADDR_{NAME}) mod C_ENTRIES_{NAME});"
+                )
+                sw_lines.append(
+                    "  if raddr_word >= C_ADDR_{NAME} and "
+                    "raddr_word < C_ADDR_{NAME} + C_ENTRIES_{NAME} then"
+                )
+                sw_lines.append("    mem_{name}_rd_hit <= '1';")
+                sw_lines.append("  else")
+                sw_lines.append("    mem_{name}_rd_hit <= '0';")
+                sw_lines.append("  end if;")
+                sw_lines.append("end if;")
+
+            hw_lines = []
+            if not self._mem_sw_writable(mem):
+                hw_lines.append("if {name}_we_i = '1' then")
+                hw_lines.append(
+                    "  mem_{name}(to_integer(unsigned({name}_addr_i))) <= {name}_wdata_i;"
+                )
+                hw_lines.append("end if;")
+            hw_lines.append(
+                "{name}_rdata_o <= mem_{name}(to_integer(unsigned({name}_addr_i)));"
+            )
+
+            proc_lines = []
+            for suffix, body_lines in [("sw", sw_lines), ("hw", hw_lines)]:
+                if not body_lines:
+                    continue
+                proc_lines.append("  proc_mem_{name}_" + suffix + ": process (clk)")
+                proc_lines.append("  begin")
+                proc_lines.append("    if rising_edge(clk) then")
+                proc_lines.extend(indent_lines(body_lines, 6))
+                proc_lines.append("    end if;")
+                proc_lines.append("  end process;")
+                proc_lines.append("")
+            lines.extend(line.format(**fmt_args) for line in proc_lines)
+
+        return lines
+
+    def _check_cdc(self):
+        """ raises ValueError for HW ports which can not cross to hw_clk """
+
+        if self.addrmap.mems:
+            raise ValueError("memories are not supported with hw_clk")
+        for reg in self.regs:
+            for field in reg.fields:
+                unsupported = [
+                    prop_name
+                    for prop_name in ["counter", "intr", "woclr", "singlepulse"]
+                    if getattr(field, prop_name)
+                ]
+                if reg.is_array and field.hw_acc_type != AccessType.na:
+                    unsupported.append("register array")
+                if unsupported:
+                    raise ValueError(
+                        "{0}.{1}: not supported with hw_clk: {2}".format(
+                            reg.name, field.name, ", ".join(unsupported)
+                        )
+                    )
+
+    @staticmethod
+    def _cdc_outputs(reg: Register) -> bool:
+        return any(
+            field.hw_acc_type in (AccessType.r, AccessType.rw) for field in reg.fields
+        )
+
+    @staticmethod
+    def _cdc_inputs(reg: Register) -> List[Field]:
+        return [
+            field for field in reg.fields if field.hw_acc_type in (AccessType.w, AccessType.rw)
+        ]
+
+    @staticmethod
+    def _cdc_pulses(reg: Register) -> List[str]:
+        return [
+            pulse
+            for pulse in ["swmod", "swacc"]
+            if getattr(reg.summary, "has_" + pulse)
+        ]
+
+    def _gen_cdc_sigs(self) -> List[str]:
+        sigs = []
+        sync_sigs = []
+        for reg in self.regs:
+            if reg.is_array:
+                continue
+            reg_sigs = []
+            reg_sync_sigs = []
+            if self._cdc_outputs(reg):
+                reg_sigs.append("signal hw_{name} : std_logic_vector({w}-1 downto 0) := (others => '0');")
+                reg_sigs.append("signal cdc_{name}_o_data : std_logic_vector({w}-1 downto 0) := (others => '0');")
+                reg_sigs.append("signal cdc_{name}_o_req : std_logic := '0';")
+                reg_sigs.append("signal cdc_{name}_o_ack : std_logic := '0';")
+                reg_sync_sigs += ["cdc_{name}_o_req_sync", "cdc_{name}_o_ack_sync"]
+            if self._cdc_inputs(reg):
+                reg_sigs.append("signal cdc_{name}_i_data : std_logic_vector({w}-1 downto 0) := (others => '0');")
+                reg_sigs.append("signal cdc_{name}_i_req : std_logic := '0';")
+                reg_sigs.append("signal cdc_{name}_i_ack : std_logic := '0';")
+                reg_sync_sigs += ["cdc_{name}_i_req_sync", "cdc_{name}_i_ack_sync"]
+            for sync_sig in reg_sync_sigs:
+                reg_sigs.append("signal " + sync_sig + " : std_logic_vector(1 downto 0) := \"00\";")
+            for pulse in self._cdc_pulses(reg):
+                reg_sigs.append("signal cdc_{name}_" + pulse + "_tgl : std_logic := '0';")
+                reg_sigs.append(
+                    "signal cdc_{name}_" + pulse + "_sync : std_logic_vector(2 downto 0) := \"000\";"
+                )
+                reg_sigs.append("signal hw_{name}_" + pulse + " : std_logic;")
+                reg_sync_sigs.append("cdc_{name}_" + pulse + "_sync")
+
+            fmt_args = dict(name=reg.name.lower(), w=self.data_w_bytes * 8)
+            sigs.extend(sig.format(**fmt_args) for sig in reg_sigs)
+            sync_sigs.extend(sig.format(**fmt_args) for sig in reg_sync_sigs)
+
+        if sync_sigs:
+            sigs.append("")
+            sigs.append("attribute ASYNC_REG : string;")
+            sigs.extend(
+                "attribute ASYNC_REG of {0} : signal is \"TRUE\";".format(sig)
+                for sig in sync_sigs
+            )
+        return sigs
+
+    def _gen_cdc_logic(self) -> List[str]:
+        """ req/ack toggle handshake per register: the data is held in
+        cdc_<reg>_o_data (cdc_<reg>_i_data) while a transfer is in progress,
+        the receiving side takes it over when the synchronized req toggles
+        """
+
+        lines = []
+        for reg in self.regs:
+            if reg.is_array:
+                continue
+            clk_lines = []
+            hw_lines = []
+
+            if self._cdc_outputs(reg):
+                clk_lines.append("cdc_{name}_o_ack_sync <= cdc_{name}_o_ack_sync(0) & cdc_{name}_o_ack;")
+                clk_lines.append(
+                    "if cdc_{name}_o_req = cdc_{name}_o_ack_sync(1) and cdc_{name}_o_data /= reg_{name} then"
+                )
+                clk_lines.append("  cdc_{name}_o_data <= reg_{name};")
+                clk_lines.append("  cdc_{name}_o_req <= not cdc_{name}_o_req;")
+                clk_lines.append("end if;")
+                hw_lines.append("cdc_{name}_o_req_sync <= cdc_{name}_o_req_sync(0) & cdc_{name}_o_req;")
+                hw_lines.append("if cdc_{name}_o_req_sync(1) /= cdc_{name}_o_ack then")
+                hw_lines.append("  hw_{name} <= cdc_{name}_o_data;")
+                hw_lines.append("  cdc_{name}_o_ack <= cdc_{name}_o_req_sync(1);")
+                hw_lines.append("end if;")
+
+            inputs = self._cdc_inputs(reg)
+            if inputs:
+                hw_lines.append("cdc_{name}_i_ack_sync <= cdc_{name}_i_ack_sync(0) & cdc_{name}_i_ack;")
+                hw_lines.append("if cdc_{name}_i_req = cdc_{name}_i_ack_sync(1) then")
+                for field in inputs:
+                    hw_lines.extend(
+                        "  " + line.replace("{", "{{").replace("}", "}}")
+                        for line in self._gen_single_hw_input(
+                            reg.name,
+                            field,
+                            in_reg=False,
+                            dest="cdc_{0}_i_data".format(reg.name.lower()),
+                            in_sfx=self._in_sfx(field),
+                        )
+                    )
+                hw_lines.append("  cdc_{name}_i_req <= not cdc_{name}_i_req;")
+                hw_lines.append("end if;")
+                clk_lines.append("cdc_{name}_i_req_sync <= cdc_{name}_i_req_sync(0) & cdc_{name}_i_req;")
+                clk_lines.append("if cdc_{name}_i_req_sync(1) /= cdc_{name}_i_ack then")
+                for field in inputs:
+                    clk_lines.append(
+                        "  reg_{name}(" + self._reg_slice(field) + ") <= cdc_{name}_i_data("
+                        + self._reg_slice(field) + ");"
+                    )
+                clk_lines.append("  cdc_{name}_i_ack <= cdc_{name}_i_req_sync(1);")
+                clk_lines.append("end if;")
+
+            pulses = self._cdc_pulses(reg)
+            for pulse in pulses:
+                tgl = "cdc_{name}_" + pulse + "_tgl"
+                sync = "cdc_{name}_" + pulse + "_sync"
+                clk_lines.append(tgl + " <= " + tgl + " xor reg_{name}_" + pulse + ";")
+                hw_lines.append(sync + " <= " + sync + "(1 downto 0) & " + tgl + ";")
+
+            reg_lines = []
+            for clk, proc_lines in [("clk", clk_lines), ("hw_clk", hw_lines)]:
+                if not proc_lines:
+                    continue
+                reg_lines.append("  proc_cdc_{name}_" + clk + ": process (" + clk + ")")
+                reg_lines.append("  begin")
+                reg_lines.append("    if rising_edge(" + clk + ") then")
+                reg_lines.extend(indent_lines(proc_lines, 6))
+                reg_lines.append("    end if;")
+                reg_lines.append("  end process;")
+                reg_lines.append("")
+            for pulse in pulses:
+                sync = "cdc_{name}_" + pulse + "_sync"
+                reg_lines.append(
+                    "  hw_{name}_" + pulse + " <= " + sync + "(2) xor " + sync + "(1);"
+                )
+            if pulses:
+                reg_lines.append("")
+
+            lines.extend(line.format(name=reg.name.lower()) for line in reg_lines)
+
+        return lines[:-1]
+
+    def _pipeline(self, field: Field) -> int:
+        """ number of register stages on the HW ports of the field """
+
+        if field.hw_pipeline is None:
+            return self.hw_pipeline
+        return field.hw_pipeline
+
+    def _out_sfx(self, field: Field) -> str:
+        """ outputs are assigned to stage 0 of the pipeline (not registered) """
+
+        return "_p0" if self._pipeline(field) else ""
+
+    def _in_sfx(self, field: Field) -> str:
+        """ inputs are taken from the last stage of the pipeline """
+
+        stages = self._pipeline(field)
+        return "_p{0}".format(stages) if stages else ""
+
+    def _pipelined_ports(self) -> List[Tuple[str, str, str, int]]:
+        """ (name, direction, type, stages) of the ports with a pipeline """
+
+        ports = []
+        for reg in self.regs:
+            for field in reg.fields:
+                stages = self._pipeline(field)
+                if not stages:
+                    continue
+                for port in self._gen_single_port(
+                    reg.name, field, reg.count if reg.is_array else 0
+                ):
+                    name, port_dir_type = port.rstrip(";").split(" : ")
+                    port_dir, port_type = port_dir_type.split(" ", 1)
+                    ports.append((name, port_dir, port_type, stages))
+        return ports
+
+    def _gen_retiming_sigs(self) -> List[str]:
+        """ pipeline stages of the HW ports, shreg_extract and max_fanout
+        attributes
+        """
+
+        sigs = []
+        shreg_sigs = []
+        fanout_sigs = []
+        if self.max_fanout is not None:
+            fanout_sigs.extend("reg_" + reg.name.lower() for reg in self.regs)
+
+        for name, port_dir, port_type, stages in self._pipelined_ports():
+            first = 0 if port_dir == "out" else 1
+            for stage in range(first, stages + 1):
+                sigs.append("signal {0}_p{1} : {2};".format(name, stage, port_type))
+            shreg_sigs.extend("{0}_p{1}".format(name, stage) for stage in range(1, stages + 1))
+            if self.max_fanout is not None:
+                fanout_sigs.append("{0}_p{1}".format(name, stages))
+
+        if shreg_sigs:
+            if sigs:
+                sigs.append("")
+            sigs.append("attribute shreg_extract : string;")
+            sigs.extend(
+                "attribute shreg_extract of {0} : signal is \"no\";".format(sig)
+                for sig in shreg_sigs
+            )
+        if fanout_sigs:
+            if sigs:
+                sigs.append("")
+            sigs.append("attribute max_fanout : integer;")
+            sigs.extend(
+                "attribute max_fanout of {0} : signal is {1};".format(sig, self.max_fanout)
+                for sig in fanout_sigs
+            )
+        return sigs
+
+    def _gen_pipeline_logic(self) -> List[str]:
+        """ outputs: <port>_p0 (assigned in _gen_hw_access) -> ... -> <port>,
+        inputs: <port> -> <port>_p1 -> ... (last stage used by the slave)
+        """
+
+        clk = "hw_clk" if self.hw_clk else "clk"
+        lines = []
+        for name, port_dir, _, stages in self._pipelined_ports():
+            stage_names = ["{0}_p{1}".format(name, stage) for stage in range(stages + 1)]
+            if port_dir == "out":
+                stage_names.append(name)
+            else:
+                stage_names[0] = name
+            for src, dest in zip(stage_names[:-1], stage_names[1:]):
+                if port_dir == "out" and dest == name:
+                    lines.append("{0} <= {1};".format(dest, src))
+                else:
+                    lines.append("{0} <= {1} when rising_edge({2});".format(dest, src, clk))
+        return lines
+
     def _gen_field_ranges(self) -> List[str]:
         field_ranges = []
-        for reg in self.addrmap.regs:
+        for reg in self.regs:
             for field in reg.fields:
                 field_ranges.extend(self._gen_single_field_range(reg.name, field))
 
         return field_ranges
 
     def _gen_regs(self) -> List[str]:
-        ls = [self._gen_single_reg(reg, self.data_w_bytes) for reg in self.addrmap.regs]
-        for reg in self.addrmap.regs:
+        ls = []
+        if self._arrays():
+            ls.append(
+                "type t_reg_array is array (natural range <>) of "
+                "std_logic_vector({w}-1 downto 0);".format(w=self.data_w_bytes * 8)
+            )
+        ls.extend(
+            self._gen_single_reg(reg, self.data_w_bytes) for reg in self.regs
+        )
+        for reg in self.regs:
             swmod_reg = self._gen_single_reg_swmod(reg, self.data_w_bytes)
             if swmod_reg is not None:
                 ls.append(swmod_reg)
-        for reg in self.addrmap.regs:
+        for reg in self.regs:
             woclr_reg = self._gen_single_reg_woclr(reg, self.data_w_bytes)
             if woclr_reg is not None:
                 ls.append(woclr_reg)
+        for reg in self.regs:
+            swacc_reg = self._gen_single_reg_swacc(reg)
+            if swacc_reg is not None:
+                ls.append(swacc_reg)
+        for reg in self.regs:
+            ls.extend(self._gen_single_reg_overflow(reg))
+        for reg in self.regs:
+            ls.extend(self._gen_single_reg_intr_prev(reg))
         return ls
 
     def _gen_hw_access(self) -> List[str]:
         hw_access_exprs = []
-        for reg in self.addrmap.regs:
+        for reg in self.regs:
+            if reg.is_array:
+                continue
             for field in reg.fields:
-                hw_access_exprs.extend(self._gen_single_hw_access(reg.name, field))
+                sfx_args = dict(out_sfx=self._out_sfx(field), in_sfx=self._in_sfx(field))
+                if self.hw_clk:
+                    # inputs are written by the handshake (see _gen_cdc_logic)
+                    hw_access_exprs.extend(
+                        self._gen_single_hw_access(
+                            reg.name, field, inputs=False, src="hw", **sfx_args
+                        )
+                    )
+                else:
+                    hw_access_exprs.extend(
+                        self._gen_single_hw_access(reg.name, field, **sfx_args)
+                    )
+
+        # inputs of register arrays are registered in the write process, as the
+        # process drives all elements of the array
+        for reg in self._arrays():
+            elem_exprs = []
+            for field in reg.fields:
+                elem_exprs.extend(
+                    self._gen_single_hw_access(
+                        reg.name, field, idx="i", inputs=False, out_sfx=self._out_sfx(field)
+                    )
+                )
+            if elem_exprs:
+                hw_access_exprs.append(
+                    "gen_{name}: for i in 0 to C_COUNT_{NAME}-1 generate".format(
+                        name=reg.name.lower(), NAME=reg.name.upper()
+                    )
+                )
+                hw_access_exprs.extend(indent_lines(elem_exprs, 2))
+                hw_access_exprs.append("end generate;")
 
         return hw_access_exprs
 
-    def _gen_read_logic(self) -> List[str]:
+    def _arrays(self) -> List[Register]:
+        return [reg for reg in self.regs if reg.is_array]
+
+    @staticmethod
+    def _gen_array_loop(reg: Register, lines: List[str]) -> List[str]:
+        """ executes `lines` (which use index "i") for all elements of the array """
+
+        if not lines:
+            return []
+
+        loop = ["for i in 0 to C_COUNT_{name}-1 loop".format(name=reg.name.upper())]
+        loop.extend(indent_lines(lines, 2))
+        loop.append("end loop;")
+        return loop
+
+    def _gen_array_cond(self, reg: Register, addr: str) -> str:
+        """ true if the word address `addr` is an element of the register array """
+
+        cond = "{addr} >= C_ADDR_{name} and {addr} < C_ADDR_{name} + C_COUNT_{name} * C_STRIDE_{name}".format(
+            addr=addr, name=reg.name.upper()
+        )
+        if reg.stride > self.data_w_bytes:
+            # other registers can be placed in between the elements
+            cond += " and ({addr} - C_ADDR_{name}) mod C_STRIDE_{name} = 0".format(
+                addr=addr, name=reg.name.upper()
+            )
+        return cond
+
+    @staticmethod
+    def _gen_array_idx(reg: Register, addr: str) -> str:
+        """ index of the element of the register array at word address `addr` """
+
+        return "({addr} - C_ADDR_{name}) / C_STRIDE_{name}".format(
+            addr=addr, name=reg.name.upper()
+        )
+
+    def _gen_read_logic(self) -> Iterator[str]:
+        # the data is only sampled on a read strobe, it is held until the
+        # next read
+        yield "  proc_rdata_reg: process (clk)"
+        yield "  begin"
+        yield "    if rising_edge(clk) then"
+        yield "      if rd_strobe = '1' then"
+        yield from indent_lines(self._gen_read_case("rdata_reg"), 8)
+        yield "      end if;"
+        yield "    end if;"
+        yield "  end process;"
+
+    @staticmethod
+    def _split_read_addr(word_addrs: List[int]) -> int:
+        """ returns the number of word address bits used as offset inside of
+        a block for the two-level read decoder
+
+        The split is chosen such that the larger of the two multiplexers
+        (registers in the fullest block, number of non-empty blocks) is as
+        small as possible.
+        """
+
+        addr_bits = max([1] + [addr.bit_length() for addr in word_addrs])
+        best_cost, best_offs_bits = None, 1
+        for offs_bits in range(1, addr_bits + 1):
+            blocks = collections.Counter(addr >> offs_bits for addr in word_addrs)
+            cost = max([len(blocks)] + list(blocks.values()))
+            if best_cost is None or cost < best_cost:
+                best_cost, best_offs_bits = cost, offs_bits
+        return best_offs_bits
+
+    def _read_blocks(self) -> Dict[int, List[Register]]:
+        """ registers grouped by block index (two-level read decoder), register
+        arrays are decoded separately
+        """
+
+        blocks: Dict[int, List[Register]] = collections.OrderedDict()
+        for reg in self.regs:
+            if reg.is_array:
+                continue
+            blk = (reg.addr // self.data_w_bytes) >> self.blk_offs_bits
+            blocks.setdefault(blk, []).append(reg)
+        return blocks
+
+    def _gen_read_blk_sigs(self) -> List[str]:
+        sigs = [
+            "signal raddr_blk : integer;",
+            "signal raddr_offs : integer;",
+            "signal raddr_blk_reg : integer;",
+            "signal rd_decode : std_logic;",
+        ]
+        sigs.extend(
+            "signal rdata_blk_{0} : std_logic_vector({1}-1 downto 0);".format(
+                blk, self.data_w_bytes * 8
+            )
+            for blk in self._read_blocks()
+        )
+        if self._arrays():
+            sigs.append(
+                "signal rdata_arr : std_logic_vector({0}-1 downto 0);".format(
+                    self.data_w_bytes * 8
+                )
+            )
+            sigs.append("signal rd_arr_hit : std_logic;")
+        return sigs
+
+    def _gen_read_logic_two_level(self) -> Iterator[str]:
+        """ the first stage selects the register inside of each block (with
+        rd_strobe), the second stage selects the block (with rd_decode)
+        """
+
+        yield "  raddr_blk <= raddr_word / C_RD_BLK_SIZE;"
+        yield "  raddr_offs <= raddr_word mod C_RD_BLK_SIZE;"
+        yield ""
+        yield "  proc_rdata_blk: process (clk)"
+        yield "  begin"
+        yield "    if rising_edge(clk) then"
+        yield "      if rd_strobe = '1' then"
+        yield "        raddr_blk_reg <= raddr_blk;"
+        if self._arrays():
+            # register arrays are decoded on the full address
+            yield "        rd_arr_hit <= '0';"
+            yield "        rdata_arr <= (others => '0');"
+            yield from indent_lines(
+                self._gen_read_arrays("rdata_arr", "raddr_word", "rd_arr_hit"), 8
+            )
+            yield "        end if;"
+        for blk, regs in self._read_blocks().items():
+            yield from indent_lines(
+                self._gen_read_case(
+                    "rdata_blk_{0}".format(blk), regs, "raddr_offs", " mod C_RD_BLK_SIZE",
+                ),
+                8,
+            )
+        yield "      end if;"
+        yield "    end if;"
+        yield "  end process;"
+        yield ""
+        yield "  proc_rdata_reg: process (clk)"
+        yield "  begin"
+        yield "    if rising_edge(clk) then"
+        yield "      if rd_decode = '1' then"
+        blk_mux = []
+        blk_mux.append("case raddr_blk_reg is")
+        for blk in self._read_blocks():
+            blk_mux.append("  when {0} =>".format(blk))
+            blk_mux.append("    rdata_reg <= rdata_blk_{0};".format(blk))
+        blk_mux.append("  when others =>")
+        blk_mux.append("    -- decode error")
+        blk_mux.append("    rdata_reg <= x\"{0}\";".format(self._decode_err_pattern()))
+        blk_mux.append("end case;")
+        if self._arrays():
+            yield "        if rd_arr_hit = '1' then"
+            yield "          rdata_reg <= rdata_arr;"
+            yield "        else"
+            yield from indent_lines(blk_mux, 10)
+            yield "        end if;"
+        else:
+            yield from indent_lines(blk_mux, 8)
+        yield "      end if;"
+        yield "    end if;"
+        yield "  end process;"
+
+    def _decode_err_pattern(self) -> str:
+        return "badc0fee" * (self.data_w_bytes // 4)
+
+    def _gen_read_arrays(
+        self, rdata: str, raddr: str, hit: Optional[str] = None
+    ) -> List[str]:
+        """ if/elsif chain which assigns the addressed element of the register
+        arrays to `rdata` (and sets `hit` if given), without "end if"
+        """
+
         lines = []
+        for reg in self._arrays():
+            lines.append(
+                "{0} {1} then".format(
+                    "elsif" if lines else "if", self._gen_array_cond(reg, raddr)
+                )
+            )
+            if hit is not None:
+                lines.append("  {hit} <= '1';".format(hit=hit))
+            reg_has_assign = hit is not None
+            for field in reg.fields:
+                line = self._gen_single_sw_rd_access(
+                    reg.name, field, rdata, self._gen_array_idx(reg, raddr)
+                )
+                if line is not None:
+                    lines.append("  " + line)
+                    reg_has_assign = True
 
-        lines.append("  proc_rdata_reg: process (clk)")
-        lines.append("  begin")
-        lines.append("    if rising_edge(clk) then")
-        lines.append("      rdata_reg <= (others => '0');")
-        lines.append("      case raddr_word is")
-        for reg in self.addrmap.regs:
-            lines.append("        when C_ADDR_{0} =>".format(reg.name.upper()))
+            if not reg_has_assign:
+                lines.append("  null;")
+        return lines
+
+    def _gen_read_case(
+        self,
+        rdata: str,
+        regs: Optional[Iterable[Register]] = None,
+        raddr: str = "raddr_word",
+        choice_suffix: str = "",
+    ) -> Iterator[str]:
+        """ case statement which assigns the registers in `regs` (default: all
+        registers, register arrays are decoded in the "others" choice) to
+        `rdata`, the choices are the address constants followed by
+        `choice_suffix`
+        """
+
+        arrays = []
+        if regs is None:
+            regs = (reg for reg in self.regs if not reg.is_array)
+            arrays = self._gen_read_arrays(rdata, raddr)
+
+        decode_err = [
+            "-- decode error",
+            "{rdata} <= x\"{pattern}\";".format(
+                rdata=rdata, pattern=self._decode_err_pattern()
+            ),
+        ]
+
+        yield "{rdata} <= (others => '0');".format(rdata=rdata)
+        yield "case {raddr} is".format(raddr=raddr)
+        for reg in regs:
+            yield "  when C_ADDR_{0}{1} =>".format(reg.name.upper(), choice_suffix)
             reg_has_assign = False
             for field in reg.fields:
-                line = self._gen_single_sw_rd_access(reg.name, field)
+                line = self._gen_single_sw_rd_access(reg.name, field, rdata)
                 if line is not None:
-                    lines.append("          " + line)
+                    yield "    " + line
                     reg_has_assign = True
 
             if not reg_has_assign:
-                lines.append("          null;")
+                yield "    null;"
+
+        yield "  when others  =>"
+        if arrays:
+            yield from indent_lines(arrays, 4)
+            yield "    else"
+            yield from indent_lines(decode_err, 6)
+            yield "    end if;"
+        else:
+            yield from indent_lines(decode_err, 4)
+        yield "end case;"
 
-        lines.append("        when others  =>")
-        lines.append("          -- decode error")
-        lines.append("          rdata_reg <= x\"badc0fee\";")
-        lines.append("      end case;")
-        lines.append("    end if;")
-        lines.append("  end process;")
-        return lines
+    def _gen_write_logic(self, wdata: str, wstrb: Optional[str] = None) -> Iterator[str]:
+        """ registers are written when wr_en is set, with data from `wdata`
 
-    def _gen_write_logic(self) -> List[str]:
-        lines = []
-        lines.append("proc_write: process (clk) begin")
-        lines.append("  if rising_edge(clk) then")
-        lines.append("    if reset = '1' then")
+        If `wstrb` is given, each byte is only written if its strobe is set.
+        """
+
+        yield "proc_write: process (clk) begin"
+        yield "  if rising_edge(clk) then"
+
+        # inputs of register arrays (see _gen_hw_access)
+        hw_inputs = (
+            line
+            for reg in self._arrays()
+            for line in self._gen_array_loop(
+                reg,
+                [
+                    line
+                    for field in reg.fields
+                    for line in self._gen_single_hw_input(
+                        reg.name, field, in_reg=False, idx="i", in_sfx=self._in_sfx(field)
+                    )
+                ],
+            )
+        )
+        yield from section_lines(["    -- HW write (arrays)"], indent_lines(hw_inputs, 4), [""])
+
+        yield "    if reset = '1' then"
 
         # generate reset assignments
-        for reg in self.addrmap.regs:
+        yield from indent_lines(
+            self._gen_field_assignments(self._gen_single_reset_assignment), 6
+        )
+
+        yield "    else"
+        yield ""
+        yield "      -- default (pulse)"
+        yield from indent_lines(
+            self._gen_field_assignments(self._gen_single_singlepulse_assignment), 6
+        )
+        yield ""
+        yield "      -- default (swmod)"
+        for reg in self.regs:
+            if reg.summary.has_swmod:
+                yield "      reg_{name}_swmod <= {val};".format(
+                    name=reg.name.lower(), val="(others => '0')" if reg.is_array else "'0'",
+                )
+        swacc_defaults = (
+            "      reg_{name}_swacc <= {val};".format(
+                name=reg.name.lower(), val="(others => '0')" if reg.is_array else "'0'"
+            )
+            for reg in self.regs
+            if reg.summary.has_swacc
+        )
+        yield from section_lines(["", "      -- default (swacc)"], swacc_defaults)
+        yield ""
+        yield "      -- default (woclr)"
+        yield from indent_lines(
+            self._gen_field_assignments(self._gen_single_woclr_assignment), 6
+        )
+
+        yield from section_lines(
+            ["", "      -- counters (SW write has priority)"],
+            indent_lines(self._gen_field_blocks(self._gen_single_counter), 6),
+        )
+        yield from section_lines(
+            ["", "      -- interrupts (HW set has priority over woclr)"],
+            indent_lines(self._gen_field_blocks(self._gen_single_intr), 6),
+        )
+        yield from section_lines(
+            ["", "      -- read side effects (SW write has priority)"],
+            indent_lines(self._gen_rd_side_effects(), 6),
+        )
+
+        yield ""
+
+        yield "      if wr_en = '1' then"
+        yield "        case waddr_word is"
+
+        for reg in self.regs:
+            if reg.is_array:
+                continue
+            yield "          when C_ADDR_{0} =>".format(reg.name.upper())
+            reg_lines = self._gen_sw_wr_reg(reg, wdata, wstrb)
+            yield from indent_lines(reg_lines or ["null;"], 12)
+
+        yield "          when others  =>"
+        arrays = []
+        for reg in self._arrays():
+            arrays.append(
+                "{0} {1} then".format(
+                    "elsif" if arrays else "if",
+                    self._gen_array_cond(reg, "waddr_word"),
+                )
+            )
+            reg_lines = self._gen_sw_wr_reg(
+                reg, wdata, wstrb, self._gen_array_idx(reg, "waddr_word")
+            )
+            arrays.extend(indent_lines(reg_lines or ["null;"], 2))
+        if arrays:
+            arrays.append("end if;")
+        yield from indent_lines(arrays or ["null;"], 12)
+        yield "        end case;"
+        yield "      end if;"
+        yield "    end if;"
+        yield "  end if;"
+        yield "end process;"
+
+    def _gen_field_assignments(self, gen_assignment) -> Iterator[str]:
+        """ `gen_assignment(reg_name, field, idx)` for all fields, in a loop
+        over all elements for register arrays
+        """
+
+        def gen_lines(reg: Register, field: Field, idx: str) -> List[str]:
+            line = gen_assignment(reg.name, field, idx)
+            return [] if line is None else [line]
+
+        return self._gen_field_blocks(gen_lines)
+
+    def _gen_field_blocks(self, gen_lines) -> Iterator[str]:
+        """ same as _gen_field_assignments, but `gen_lines(reg, field, idx)`
+        returns a list of lines
+        """
+
+        for reg in self.regs:
+            idx = "i" if reg.is_array else ""
+            reg_lines = []
             for field in reg.fields:
-                line = self._gen_single_reset_assignment(reg.name, field)
-                if line is not None:
-                    lines.append("      " + line)
+                reg_lines.extend(gen_lines(reg, field, idx))
+            if reg.is_array:
+                reg_lines = self._gen_array_loop(reg, reg_lines)
+            yield from reg_lines
 
-        lines.append("    else")
-        lines.append("")
-        lines.append("      -- default (pulse)")
-        for reg in self.addrmap.regs:
+    def _has_rd_side_effects(self) -> bool:
+        return any(field.rclr or field.rset for reg in self.regs for field in reg.fields)
+
+    def _gen_rd_hit(self, reg: Register, idx: str) -> str:
+        """ true if element `idx` of the register is read in this cycle """
+
+        if reg.is_array:
+            addr = "C_ADDR_{name} + {idx} * C_STRIDE_{name}".format(
+                name=reg.name.upper(), idx=idx
+            )
+        else:
+            addr = "C_ADDR_{name}".format(name=reg.name.upper())
+        return "rd_strobe = '1' and raddr_word = {addr}".format(addr=addr)
+
+    def _gen_rd_side_effects(self) -> Iterator[str]:
+        """ rclr, rset and swacc (and swmod for fields modified by the read),
+        counters and interrupts are cleared in _gen_single_counter and
+        _gen_single_intr
+
+        The read is detected with _gen_rd_hit:
+
+        if rd_strobe = '1' and raddr_word = C_ADDR_EVENTS then
+          reg_events(7 downto 0) <= "00000000";
+        end if;
+        """
+
+        for reg in self.regs:
+            idx = "i" if reg.is_array else ""
+            fmt_args = dict(name=reg.name.lower(), idx=self._idx(idx))
+
+            body = []
+            if reg.summary.has_swacc:
+                body.append("reg_{name}_swacc{idx} <= '1';".format(**fmt_args))
             for field in reg.fields:
-                line = self._gen_single_singlepulse_assignment(reg.name, field)
-                if line is not None:
-                    lines.append("      " + line)
-        lines.append("")
-        lines.append("      -- default (swmod)")
-        for reg in self.addrmap.regs:
-            has_swmod = any(map(lambda f: f.swmod, reg.fields))
-            if has_swmod:
-                lines.append(
-                    "      reg_{name}_swmod <= '0';".format(name=reg.name.lower())
+                if not (field.rclr or field.rset):
+                    continue
+                if field.swmod and "reg_{name}_swmod{idx} <= '1';".format(**fmt_args) not in body:
+                    body.append("reg_{name}_swmod{idx} <= '1';".format(**fmt_args))
+                if field.counter or field.intr is not None:
+                    continue
+                body.append(
+                    "reg_{name}{idx}({msb} downto {lsb}) <= \"{val}\";".format(
+                        msb=field.msb,
+                        lsb=field.lsb,
+                        val=("1" if field.rset else "0") * (field.msb - field.lsb + 1),
+                        **fmt_args
+                    )
                 )
-        lines.append("")
-        lines.append("      -- default (woclr)")
-        for reg in self.addrmap.regs:
-            for field in reg.fields:
-                line = self._gen_single_woclr_assignment(reg.name, field)
-                if line is not None:
-                    lines.append("      " + line)
+            if not body:
+                continue
+
+            reg_lines = ["if " + self._gen_rd_hit(reg, idx) + " then"]
+            reg_lines.extend(indent_lines(body, 2))
+            reg_lines.append("end if;")
+            if reg.is_array:
+                reg_lines = self._gen_array_loop(reg, reg_lines)
+            yield from reg_lines
+
+    def _gen_single_counter(self, reg: Register, field: Field, idx: str = "") -> List[str]:
+        """ increments the counter on the HW strobe, saturates or wraps around
+        (with an overflow pulse); with rclr the counter is cleared on read, an
+        increment in the same cycle is kept
+
+        if cnt_evt_incr = '1' then
+          reg_cnt(15 downto 0) <= std_logic_vector(unsigned(reg_cnt(15 downto 0)) + 1);
+          ...
+        """
 
-        lines.append("")
+        if not field.counter:
+            return []
+
+        w = field.msb - field.lsb + 1
+        fmt_args = dict(
+            reg_name=reg.name.lower(),
+            field_name=field.name.lower(),
+            msb=field.msb,
+            lsb=field.lsb,
+            idx=self._idx(idx),
+            incrvalue=field.incrvalue,
+            in_sfx=self._in_sfx(field),
+        )
 
-        lines.append(
-            "      if state_write = sWriteResp and state_write_prev /= sWriteResp then"
+        def bin_literal(val: int) -> str:
+            return '"{val:0{w}b}"'.format(val=val, w=w)
+
+        incr = []
+        if field.incrsaturate is None:
+            incr.append(
+                "reg_{reg_name}{idx}({msb} downto {lsb}) <= std_logic_vector(unsigned(reg_{reg_name}{idx}({msb} downto {lsb})) + {incrvalue});"
+            )
+            incr.append(
+                "if unsigned(reg_{reg_name}{idx}({msb} downto {lsb})) > "
+                + bin_literal(max(0, (1 << w) - 1 - field.incrvalue))
+                + " then"
+            )
+            incr.append("  reg_{reg_name}_{field_name}_overflow{idx} <= '1';")
+            incr.append("end if;")
+        elif field.incrsaturate < field.incrvalue:
+            incr.append(
+                "reg_{reg_name}{idx}({msb} downto {lsb}) <= " + bin_literal(field.incrsaturate) + ";"
+            )
+        else:
+            incr.append(
+                "if unsigned(reg_{reg_name}{idx}({msb} downto {lsb})) > "
+                + bin_literal(field.incrsaturate - field.incrvalue)
+                + " then"
+            )
+            incr.append(
+                "  reg_{reg_name}{idx}({msb} downto {lsb}) <= " + bin_literal(field.incrsaturate) + ";"
+            )
+            incr.append("else")
+            incr.append(
+                "  reg_{reg_name}{idx}({msb} downto {lsb}) <= std_logic_vector(unsigned(reg_{reg_name}{idx}({msb} downto {lsb})) + {incrvalue});"
+            )
+            incr.append("end if;")
+
+        lines = []
+        if field.incrsaturate is None:
+            lines.append("reg_{reg_name}_{field_name}_overflow{idx} <= '0';")
+        if field.rclr:
+            incr_after_clr = min(field.incrvalue, (1 << w) - 1)
+            if field.incrsaturate is not None:
+                incr_after_clr = min(incr_after_clr, field.incrsaturate)
+            lines.append("if " + self._gen_rd_hit(reg, idx) + " then")
+            lines.append("  if {reg_name}_{field_name}_incr{in_sfx}{idx} = '1' then")
+            lines.append(
+                "    reg_{reg_name}{idx}({msb} downto {lsb}) <= " + bin_literal(incr_after_clr) + ";"
+            )
+            lines.append("  else")
+            lines.append("    reg_{reg_name}{idx}({msb} downto {lsb}) <= " + bin_literal(0) + ";")
+            lines.append("  end if;")
+            lines.append("elsif {reg_name}_{field_name}_incr{in_sfx}{idx} = '1' then")
+        else:
+            lines.append("if {reg_name}_{field_name}_incr{in_sfx}{idx} = '1' then")
+        lines.extend(indent_lines(incr, 2))
+        lines.append("end if;")
+
+        return [line.format(**fmt_args) for line in lines]
+
+    def _gen_single_intr(self, reg: Register, field: Field, idx: str = "") -> List[str]:
+        """ sets the interrupt field on the HW input (or on its edge); sticky
+        fields are held until they are cleared by SW (with woclr or rclr)
+
+        reg_sts(1) <= (reg_sts(1) and not reg_sts_woclr(1)) or (sts_done_i and not reg_sts_done_prev);
+        """
+
+        if field.intr is None:
+            return []
+
+        fmt_args = dict(
+            reg_name=reg.name.lower(),
+            field_name=field.name.lower(),
+            reg_slice=self._reg_slice(field),
+            in_sfx=self._in_sfx(field),
         )
-        lines.append("        case waddr_word is")
 
-        for reg in self.addrmap.regs:
-            lines.append("          when C_ADDR_{0} =>".format(reg.name.upper()))
-            reg_has_assign = False
-            for field in reg.fields:
+        lines = []
+        event = {
+            "level": "{reg_name}_{field_name}_i{in_sfx}",
+            "posedge": "({reg_name}_{field_name}_i{in_sfx} and not reg_{reg_name}_{field_name}_prev)",
+            "negedge": "(not {reg_name}_{field_name}_i{in_sfx} and reg_{reg_name}_{field_name}_prev)",
+            "bothedge": "({reg_name}_{field_name}_i{in_sfx} xor reg_{reg_name}_{field_name}_prev)",
+        }[field.intr]
+        if field.intr != "level":
+            lines.append("reg_{reg_name}_{field_name}_prev <= {reg_name}_{field_name}_i{in_sfx};")
+
+        cur = "reg_{reg_name}({reg_slice})"
+        if field.woclr:
+            cur = "(reg_{reg_name}({reg_slice}) and not reg_{reg_name}_woclr({reg_slice}))"
+
+        if field.sticky and field.msb != field.lsb:
+            # the whole field is held as soon as it is non-zero
+            lines.append("if unsigned(reg_{reg_name}({reg_slice})) = 0 then")
+            lines.append("  reg_{reg_name}({reg_slice}) <= " + event + ";")
+            if field.woclr:
+                lines.append("else")
+                lines.append("  reg_{reg_name}({reg_slice}) <= " + cur + ";")
+            lines.append("end if;")
+        elif (field.sticky or field.stickybit) and field.rclr:
+            # an event in the same cycle as the read is kept
+            lines.append("if " + self._gen_rd_hit(reg, idx) + " then")
+            lines.append("  reg_{reg_name}({reg_slice}) <= " + event + ";")
+            lines.append("else")
+            lines.append("  reg_{reg_name}({reg_slice}) <= " + cur + " or " + event + ";")
+            lines.append("end if;")
+        elif field.sticky or field.stickybit:
+            lines.append("reg_{reg_name}({reg_slice}) <= " + cur + " or " + event + ";")
+        else:
+            lines.append("reg_{reg_name}({reg_slice}) <= " + event + ";")
+
+        return [line.format(**fmt_args) for line in lines]
+
+    def _gen_sw_wr_reg(
+        self, reg: Register, wdata: str, wstrb: Optional[str], idx: str = ""
+    ) -> List[str]:
+        """ SW write to a single register (or element `idx` of an array) """
+
+        lines = []
+        for field in reg.fields:
+            if wstrb is not None:
+                lines.extend(
+                    self._gen_single_sw_wr_access_strb(reg.name, field, wdata, wstrb, idx)
+                )
+                lines.extend(
+                    self._gen_single_sw_woclr_strb(reg.name, field, wdata, wstrb, idx)
+                )
+            else:
                 # normal write
-                line = self._gen_single_sw_wr_access(reg.name, field)
+                line = self._gen_single_sw_wr_access(reg.name, field, wdata, idx)
                 if line is not None:
-                    lines.append("            " + line)
-                    reg_has_assign = True
+                    lines.append(line)
                 # woclr
-                line = self._gen_single_sw_woclr(reg.name, field)
+                line = self._gen_single_sw_woclr(reg.name, field, wdata, idx)
                 if line is not None:
-                    lines.append("            " + line)
-                    reg_has_assign = True
-                # swmod
-                has_swmod = any(map(lambda f: f.swmod, reg.fields))
-                if has_swmod:
-                    lines.append(
-                        "            reg_{name}_swmod <= '1';".format(
-                            name=reg.name.lower()
-                        )
-                    )
-
-            if not reg_has_assign:
-                lines.append("            null;")
-
-        lines.append("          when others  =>")
-        lines.append("            null;")
-        lines.append("        end case;")
-        lines.append("      end if;")
-        lines.append("    end if;")
-        lines.append("  end if;")
-        lines.append("end process;")
-
+                    lines.append(line)
+        # swmod
+        if reg.summary.has_swmod:
+            lines.append(
+                "reg_{name}_swmod{idx} <= '1';".format(name=reg.name.lower(), idx=self._idx(idx))
+            )
         return lines
 
     @staticmethod
@@ -357,10 +1963,37 @@ class HectareVhdlGen:
             ),
         ]
 
+    @staticmethod
+    def _idx(idx: str) -> str:
+        """ index suffix for elements of register arrays, e.g. "(i)" """
+
+        return "({0})".format(idx) if idx else ""
+
+    @staticmethod
+    def _gen_single_array_consts(reg: Register, data_w_bytes: int) -> List[str]:
+        """ stride (in words) and number of elements of a register array """
+
+        if not reg.is_array:
+            return []
+
+        return [
+            "constant C_STRIDE_{name} : integer := {stride};".format(
+                name=reg.name.upper(), stride=reg.stride // data_w_bytes
+            ),
+            "constant C_COUNT_{name} : integer := {count};".format(
+                name=reg.name.upper(), count=reg.count
+            ),
+        ]
+
     @staticmethod
     def _gen_single_reg(reg: Register, data_w_bytes: int) -> str:
         """ signal reg_scratch : std_logic_vector(31 downto 0); """
 
+        if reg.is_array:
+            return "signal reg_{name} : t_reg_array(0 to {last});".format(
+                name=reg.name.lower(), last=reg.count - 1
+            )
+
         return "signal reg_{name} : std_logic_vector({w}-1 downto 0);".format(
             name=reg.name.lower(), w=data_w_bytes * 8
         )
@@ -369,8 +2002,12 @@ class HectareVhdlGen:
     def _gen_single_reg_swmod(reg: Register, data_w_bytes: int) -> Optional[str]:
         """ generates swmod reg is at least one field in the register has swmod attribute  """
 
-        has_swmod = any(map(lambda f: f.swmod, reg.fields))
-        if has_swmod:
+        has_swmod = reg.summary.has_swmod
+        if has_swmod and reg.is_array:
+            return "signal reg_{name}_swmod : std_logic_vector(0 to {last});".format(
+                name=reg.name.lower(), last=reg.count - 1
+            )
+        elif has_swmod:
             return "signal reg_{name}_swmod : std_logic;".format(name=reg.name.lower())
         else:
             return None
@@ -379,8 +2016,12 @@ class HectareVhdlGen:
     def _gen_single_reg_woclr(reg: Register, data_w_bytes: int) -> Optional[str]:
         """ generates woclr reg is at least one field in the register has woclr attribute  """
 
-        has_woclr = any(map(lambda f: f.woclr, reg.fields))
-        if has_woclr:
+        has_woclr = reg.summary.has_woclr
+        if has_woclr and reg.is_array:
+            return "signal reg_{name}_woclr : t_reg_array(0 to {last});".format(
+                name=reg.name.lower(), last=reg.count - 1
+            )
+        elif has_woclr:
             return "signal reg_{name}_woclr : std_logic_vector({w}-1 downto 0);".format(
                 name=reg.name.lower(), w=data_w_bytes * 8
             )
@@ -388,11 +2029,94 @@ class HectareVhdlGen:
             return None
 
     @staticmethod
-    def _gen_single_port(reg_name: str, field: Field) -> List[str]:
+    def _gen_single_reg_swacc(reg: Register) -> Optional[str]:
+        """ read strobe, if at least one field in the register has swacc """
+
+        if not reg.summary.has_swacc:
+            return None
+        if reg.is_array:
+            return "signal reg_{name}_swacc : std_logic_vector(0 to {last});".format(
+                name=reg.name.lower(), last=reg.count - 1
+            )
+        return "signal reg_{name}_swacc : std_logic;".format(name=reg.name.lower())
+
+    @staticmethod
+    def _gen_single_reg_overflow(reg: Register) -> List[str]:
+        """ overflow pulse of the counters which wrap around """
+
+        sig_type = "std_logic"
+        if reg.is_array:
+            sig_type = "std_logic_vector(0 to {last})".format(last=reg.count - 1)
+
+        return [
+            "signal reg_{reg_name}_{field_name}_overflow : {sig_type};".format(
+                reg_name=reg.name.lower(), field_name=field.name.lower(), sig_type=sig_type
+            )
+            for field in reg.fields
+            if field.counter and field.incrsaturate is None
+        ]
+
+    @staticmethod
+    def _gen_single_reg_intr_prev(reg: Register) -> List[str]:
+        """ previous value of the input of edge-sensitive interrupts """
+
+        sigs = []
+        for field in reg.fields:
+            if field.intr is None or field.intr == "level":
+                continue
+            if field.msb == field.lsb:
+                sig_type = "std_logic"
+            else:
+                sig_type = "std_logic_vector({msb} downto 0)".format(
+                    msb=field.msb - field.lsb
+                )
+            sigs.append(
+                "signal reg_{reg_name}_{field_name}_prev : {sig_type};".format(
+                    reg_name=reg.name.lower(), field_name=field.name.lower(), sig_type=sig_type
+                )
+            )
+        return sigs
+
+    @staticmethod
+    def _array_port_type(field: Field) -> str:
+        """ name of the (unconstrained) array type for ports of register arrays,
+        declared in the package
+        """
+
+        if field.encode is not None:
+            return "{encode_name}_array_t".format(encode_name=field.encode.__name__)
+        elif field.msb == field.lsb:
+            return "std_logic_vector"
+        else:
+            return "slv{w}_array_t".format(w=field.msb - field.lsb + 1)
+
+    @staticmethod
+    def _gen_single_array_port_type(field: Field) -> Optional[str]:
+        """ type declaration for ports of register arrays (in the package) """
+
+        if field.encode is not None:
+            elem_type = "{encode_name}_t".format(encode_name=field.encode.__name__)
+        elif field.msb == field.lsb:
+            # std_logic_vector is used directly
+            return None
+        else:
+            elem_type = "std_logic_vector({msb} downto 0)".format(
+                msb=field.msb - field.lsb
+            )
+
+        return "type {array_type} is array (natural range <>) of {elem_type};".format(
+            array_type=HectareVhdlGen._array_port_type(field), elem_type=elem_type
+        )
+
+    @staticmethod
+    def _gen_single_port(reg_name: str, field: Field, count: int = 0) -> List[str]:
         """ Generate output and input ports for a single field
 
         Several possible cases: no access, HW only read, HW only write, HW r/w.
         Also handles swmod attribute, by generating additional _swmod output
+
+        If `count` is given, the ports are arrays with one element per element
+        of the register array.
         """
 
         l = []
@@ -410,6 +2134,16 @@ class HectareVhdlGen:
                 msb=field.msb - field.lsb, lsb=0
             )
 
+        swmod_type = "std_logic"
+        if count:
+            port_type = "{array_type}(0 to {last})".format(
+                array_type=HectareVhdlGen._array_port_type(field), last=count - 1
+            )
+            swmod_type = "std_logic_vector(0 to {last})".format(last=count - 1)
+
+        # counters are only written by SW, HW increments them with a strobe
+        hw_write = field.hw_acc_type in (AccessType.w, AccessType.rw) and not field.counter
+
         if field.hw_acc_type == AccessType.r or field.hw_acc_type == AccessType.rw:
             out_str = "{reg_name}_{field_name}_o : out {port_type};".format(
                 field_name=field.name.lower(),
@@ -418,7 +2152,7 @@ class HectareVhdlGen:
             )
             l.append(out_str)
 
-        if field.hw_acc_type == AccessType.w or field.hw_acc_type == AccessType.rw:
+        if hw_write:
             in_str = "{reg_name}_{field_name}_i : in {port_type};".format(
                 field_name=field.name.lower(),
                 reg_name=reg_name.lower(),
@@ -427,8 +2161,10 @@ class HectareVhdlGen:
             l.append(in_str)
 
         if field.swmod:
-            swmod_str = "{reg_name}_{field_name}_swmod : out std_logic;".format(
-                field_name=field.name.lower(), reg_name=reg_name.lower()
+            swmod_str = "{reg_name}_{field_name}_swmod : out {swmod_type};".format(
+                field_name=field.name.lower(),
+                reg_name=reg_name.lower(),
+                swmod_type=swmod_type,
             )
             l.append(swmod_str)
 
@@ -439,15 +2175,56 @@ class HectareVhdlGen:
             )
             l.append(swmod_str)
 
+        if field.swacc:
+            l.append(
+                "{reg_name}_{field_name}_swacc : out {swmod_type};".format(
+                    field_name=field.name.lower(),
+                    reg_name=reg_name.lower(),
+                    swmod_type=swmod_type,
+                )
+            )
+
+        if field.counter:
+            l.append(
+                "{reg_name}_{field_name}_incr : in {swmod_type};".format(
+                    field_name=field.name.lower(),
+                    reg_name=reg_name.lower(),
+                    swmod_type=swmod_type,
+                )
+            )
+            if field.incrsaturate is None:
+                l.append(
+                    "{reg_name}_{field_name}_overflow : out {swmod_type};".format(
+                        field_name=field.name.lower(),
+                        reg_name=reg_name.lower(),
+                        swmod_type=swmod_type,
+                    )
+                )
+
         return l
 
     @staticmethod
-    def _gen_single_hw_access(reg_name: str, field: Field, in_reg=True) -> List[str]:
+    def _gen_single_hw_access(
+        reg_name: str,
+        field: Field,
+        in_reg=True,
+        idx: str = "",
+        inputs: bool = True,
+        src: str = "reg",
+        out_sfx: str = "",
+        in_sfx: str = "",
+    ) -> List[str]:
         """
 
         - Several possible cases: no access, HW only read, HW only write, HW r/w
         - if the field is enum, convert from slv to enum for outputs, and from
           enum to slv for inputs
+        - `idx` selects the element of a register array, the inputs can be left
+          out with `inputs` (see _gen_single_hw_input)
+        - outputs are taken from `src`_<reg_name> ("hw" for the copy in the
+          hw_clk domain)
+        - `out_sfx` and `in_sfx` are appended to the port names (pipeline
+          stages, see _gen_pipeline_logic)
 
         """
 
@@ -459,68 +2236,125 @@ class HectareVhdlGen:
             field.hw_acc_type != AccessType.rw1 or field.hw_acc_type != AccessType.w1
         ), '"rw1" and "w1" are not supported for HW access'
 
-        reg_slice = (
-            "{msb}".format(msb=field.msb)
-            if field.msb == field.lsb
-            else "{msb} downto {lsb}".format(msb=field.msb, lsb=field.lsb,)
-        )
+        reg_slice = HectareVhdlGen._reg_slice(field)
+        idx_str = HectareVhdlGen._idx(idx)
 
         if field.encode is None:
             enum_conv_out_left = ""
             enum_conv_out_right = ""
-            enum_conv_in_left = ""
-            enum_conv_in_right = ""
         else:
             enum_conv_out_left = "{encode_name}_t'val(to_integer(unsigned(".format(
                 encode_name=field.encode.__name__
             )
             enum_conv_out_right = ")))"
-            enum_conv_in_left = "std_logic_vector(to_unsigned({encode_name}_t'pos(".format(
-                encode_name=field.encode.__name__
-            )
-            enum_conv_in_right = "), {field_length}))".format(
-                field_length=field.msb - field.lsb + 1
-            )
 
         if field.hw_acc_type == AccessType.r or field.hw_acc_type == AccessType.rw:
-            out_str = "{reg_name}_{field_name}_o <= {enum_conv_out_left}reg_{reg_name}({reg_slice}){enum_conv_out_right};".format(
+            out_str = "{reg_name}_{field_name}_o{sfx}{idx} <= {enum_conv_out_left}{src}_{reg_name}{idx}({reg_slice}){enum_conv_out_right};".format(
+                src=src,
+                sfx=out_sfx,
                 field_name=field.name.lower(),
                 reg_name=reg_name.lower(),
                 reg_slice=reg_slice,
+                idx=idx_str,
                 enum_conv_out_left=enum_conv_out_left,
                 enum_conv_out_right=enum_conv_out_right,
             )
             l.append(out_str)
 
-        if field.hw_acc_type == AccessType.w or field.hw_acc_type == AccessType.rw:
-            update_cond = " when rising_edge(clk)" if in_reg else ""
-            in_str = "reg_{reg_name}({reg_slice}) <= {enum_conv_in_left}{reg_name}_{field_name}_i{enum_conv_in_right}{update_cond};".format(
-                field_name=field.name.lower(),
-                reg_name=reg_name.lower(),
-                reg_slice=reg_slice,
-                update_cond=update_cond,
-                enum_conv_in_left=enum_conv_in_left,
-                enum_conv_in_right=enum_conv_in_right,
+        if inputs:
+            l.extend(
+                HectareVhdlGen._gen_single_hw_input(
+                    reg_name, field, in_reg, idx, in_sfx=in_sfx
+                )
             )
-            l.append(in_str)
 
         if field.swmod:
-            swmod_str = "{reg_name}_{field_name}_swmod <= reg_{reg_name}_swmod;".format(
-                field_name=field.name.lower(), reg_name=reg_name.lower(),
+            swmod_str = "{reg_name}_{field_name}_swmod{sfx}{idx} <= {src}_{reg_name}_swmod{idx};".format(
+                field_name=field.name.lower(), reg_name=reg_name.lower(), idx=idx_str,
+                src=src, sfx=out_sfx,
             )
             l.append(swmod_str)
 
         if field.woclr:
-            woclr_str = "{reg_name}_{field_name}_woclr <= reg_{reg_name}_woclr({reg_slice});".format(
+            woclr_str = "{reg_name}_{field_name}_woclr{sfx}{idx} <= reg_{reg_name}_woclr{idx}({reg_slice});".format(
                 field_name=field.name.lower(), reg_name=reg_name.lower(),
-                reg_slice=reg_slice
+                reg_slice=reg_slice, idx=idx_str, sfx=out_sfx,
             )
             l.append(woclr_str)
 
+        if field.swacc:
+            l.append(
+                "{reg_name}_{field_name}_swacc{sfx}{idx} <= {src}_{reg_name}_swacc{idx};".format(
+                    field_name=field.name.lower(), reg_name=reg_name.lower(), idx=idx_str,
+                    src=src, sfx=out_sfx,
+                )
+            )
+
+        if field.counter and field.incrsaturate is None:
+            l.append(
+                "{reg_name}_{field_name}_overflow{sfx}{idx} <= reg_{reg_name}_{field_name}_overflow{idx};".format(
+                    field_name=field.name.lower(), reg_name=reg_name.lower(), idx=idx_str,
+                    sfx=out_sfx,
+                )
+            )
+
         return l
 
     @staticmethod
-    def _gen_single_sw_rd_access(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_hw_input(
+        reg_name: str,
+        field: Field,
+        in_reg=True,
+        idx: str = "",
+        dest: Optional[str] = None,
+        in_sfx: str = "",
+    ) -> List[str]:
+        """ HW write to the register (or to the signal `dest`), `in_reg` adds
+        the clock condition (not needed inside of a clocked process); the
+        input is taken from the port with `in_sfx` appended
+        """
+
+        if field.hw_acc_type != AccessType.w and field.hw_acc_type != AccessType.rw:
+            return []
+        if field.counter or field.intr is not None:
+            # assigned in the write process (see _gen_single_counter, _gen_single_intr)
+            return []
+
+        if field.encode is None:
+            enum_conv_in_left = ""
+            enum_conv_in_right = ""
+        else:
+            enum_conv_in_left = "std_logic_vector(to_unsigned({encode_name}_t'pos(".format(
+                encode_name=field.encode.__name__
+            )
+            enum_conv_in_right = "), {field_length}))".format(
+                field_length=field.msb - field.lsb + 1
+            )
+
+        update_cond = " when rising_edge(clk)" if in_reg else ""
+        in_str = "{dest}{idx}({reg_slice}) <= {enum_conv_in_left}{reg_name}_{field_name}_i{sfx}{idx}{enum_conv_in_right}{update_cond};".format(
+            sfx=in_sfx,
+            dest=dest or "reg_" + reg_name.lower(),
+            field_name=field.name.lower(),
+            reg_name=reg_name.lower(),
+            reg_slice=HectareVhdlGen._reg_slice(field),
+            idx=HectareVhdlGen._idx(idx),
+            update_cond=update_cond,
+            enum_conv_in_left=enum_conv_in_left,
+            enum_conv_in_right=enum_conv_in_right,
+        )
+        return [in_str]
+
+    @staticmethod
+    def _reg_slice(field: Field) -> str:
+        if field.msb == field.lsb:
+            return "{msb}".format(msb=field.msb)
+        return "{msb} downto {lsb}".format(msb=field.msb, lsb=field.lsb,)
+
+    @staticmethod
+    def _gen_single_sw_rd_access(
+        reg_name: str, field: Field, rdata: str = "rdata_reg", idx: str = ""
+    ) -> Optional[str]:
         """
 
         Several possible cases: no access, SW only read, SW only write, SW r/w
@@ -533,15 +2367,21 @@ class HectareVhdlGen:
         ), '"rw1" and "w1" are not supported for HW access'
 
         if field.sw_acc_type == AccessType.r or field.sw_acc_type == AccessType.rw:
-            out_str = "rdata_reg({msb} downto {lsb}) <= reg_{reg_name}({msb} downto {lsb});".format(
-                reg_name=reg_name.lower(), msb=field.msb, lsb=field.lsb,
+            out_str = "{rdata}({msb} downto {lsb}) <= reg_{reg_name}{idx}({msb} downto {lsb});".format(
+                rdata=rdata,
+                reg_name=reg_name.lower(),
+                msb=field.msb,
+                lsb=field.lsb,
+                idx=HectareVhdlGen._idx(idx),
             )
             return out_str
 
         return None
 
     @staticmethod
-    def _gen_single_sw_wr_access(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_sw_wr_access(
+        reg_name: str, field: Field, wdata: str = "wdata_reg", idx: str = ""
+    ) -> Optional[str]:
         """
 
         Several possible cases: no access, SW only read, SW only write, SW r/w
@@ -554,30 +2394,99 @@ class HectareVhdlGen:
         ), '"rw1" and "w1" are not supported for HW access'
 
         if field.sw_acc_type == AccessType.w or field.sw_acc_type == AccessType.rw and not field.woclr:
-            in_str = "reg_{reg_name}({msb} downto {lsb}) <= wdata_reg({msb} downto {lsb});".format(
-                reg_name=reg_name.lower(), msb=field.msb, lsb=field.lsb,
+            in_str = "reg_{reg_name}{idx}({msb} downto {lsb}) <= {wdata}({msb} downto {lsb});".format(
+                reg_name=reg_name.lower(),
+                msb=field.msb,
+                lsb=field.lsb,
+                wdata=wdata,
+                idx=HectareVhdlGen._idx(idx),
             )
             return in_str
 
         return None
 
     @staticmethod
-    def _gen_single_sw_woclr(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_sw_woclr(
+        reg_name: str, field: Field, wdata: str = "wdata_reg", idx: str = ""
+    ) -> Optional[str]:
         assert (
             field.sw_acc_type != AccessType.rw1 or field.sw_acc_type != AccessType.w1
         ), '"rw1" and "w1" are not supported for HW access'
 
         if field.sw_acc_type == AccessType.w or field.sw_acc_type == AccessType.rw and field.woclr:
-            in_str = "reg_{reg_name}_woclr({msb} downto {lsb}) <= wdata_reg({msb} downto {lsb});".format(
-                reg_name=reg_name.lower(), msb=field.msb, lsb=field.lsb,
+            in_str = "reg_{reg_name}_woclr{idx}({msb} downto {lsb}) <= {wdata}({msb} downto {lsb});".format(
+                reg_name=reg_name.lower(),
+                msb=field.msb,
+                lsb=field.lsb,
+                wdata=wdata,
+                idx=HectareVhdlGen._idx(idx),
             )
             return in_str
 
         return None
 
+    @staticmethod
+    def _gen_single_sw_wr_access_strb(
+        reg_name: str, field: Field, wdata: str, wstrb: str, idx: str = ""
+    ) -> List[str]:
+        """ same as _gen_single_sw_wr_access, but only writes strobed bytes """
+
+        if HectareVhdlGen._gen_single_sw_wr_access(reg_name, field, wdata) is None:
+            return []
+
+        return HectareVhdlGen._gen_strobed_assign(
+            "reg_{reg_name}{idx}".format(
+                reg_name=reg_name.lower(), idx=HectareVhdlGen._idx(idx)
+            ),
+            field,
+            wdata,
+            wstrb,
+        )
 
     @staticmethod
-    def _gen_single_reset_assignment(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_sw_woclr_strb(
+        reg_name: str, field: Field, wdata: str, wstrb: str, idx: str = ""
+    ) -> List[str]:
+        """ same as _gen_single_sw_woclr, but only writes strobed bytes """
+
+        if HectareVhdlGen._gen_single_sw_woclr(reg_name, field, wdata) is None:
+            return []
+
+        return HectareVhdlGen._gen_strobed_assign(
+            "reg_{reg_name}_woclr{idx}".format(
+                reg_name=reg_name.lower(), idx=HectareVhdlGen._idx(idx)
+            ),
+            field,
+            wdata,
+            wstrb,
+        )
+
+    @staticmethod
+    def _gen_strobed_assign(target: str, field: Field, wdata: str, wstrb: str) -> List[str]:
+        """ splits the assignment of a field into byte lanes
+
+        if wstrb(1) = '1' then
+          reg_scratch(11 downto 8) <= wdata_reg(11 downto 8);
+        end if;
+        """
+
+        lines = []
+        for lane in range(field.lsb // 8, field.msb // 8 + 1):
+            msb = min(field.msb, lane * 8 + 7)
+            lsb = max(field.lsb, lane * 8)
+            lines.append("if {wstrb}({lane}) = '1' then".format(wstrb=wstrb, lane=lane))
+            lines.append(
+                "  {target}({msb} downto {lsb}) <= {wdata}({msb} downto {lsb});".format(
+                    target=target, msb=msb, lsb=lsb, wdata=wdata
+                )
+            )
+            lines.append("end if;")
+        return lines
+
+    @staticmethod
+    def _gen_single_reset_assignment(
+        reg_name: str, field: Field, idx: str = ""
+    ) -> Optional[str]:
         """ Generate reset assignment if the field has a reset value """
 
         if field.reset is not None:
@@ -587,15 +2496,21 @@ class HectareVhdlGen:
             # we always assign to a vector, even for single-bit signals
             assign_val = '"{val:0{l}b}"'.format(val=field.reset, l=msb - lsb + 1)
 
-            assign_str = "reg_{reg_name}({msb} downto {lsb}) <= {assign_val};".format(
-                reg_name=reg_name.lower(), msb=msb, lsb=lsb, assign_val=assign_val
+            assign_str = "reg_{reg_name}{idx}({msb} downto {lsb}) <= {assign_val};".format(
+                reg_name=reg_name.lower(),
+                msb=msb,
+                lsb=lsb,
+                assign_val=assign_val,
+                idx=HectareVhdlGen._idx(idx),
             )
             return assign_str
 
         return None
 
     @staticmethod
-    def _gen_single_singlepulse_assignment(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_singlepulse_assignment(
+        reg_name: str, field: Field, idx: str = ""
+    ) -> Optional[str]:
         if field.singlepulse:
             msb = field.msb
             lsb = field.lsb
@@ -603,13 +2518,19 @@ class HectareVhdlGen:
             # we always assign to a vector, even for single-bit signals
             assign_val = '"{val:0{l}b}"'.format(val=0, l=msb - lsb + 1)
 
-            assign_str = "reg_{reg_name}({msb} downto {lsb}) <= {assign_val};".format(
-                reg_name=reg_name.lower(), msb=msb, lsb=lsb, assign_val=assign_val
+            assign_str = "reg_{reg_name}{idx}({msb} downto {lsb}) <= {assign_val};".format(
+                reg_name=reg_name.lower(),
+                msb=msb,
+                lsb=lsb,
+                assign_val=assign_val,
+                idx=HectareVhdlGen._idx(idx),
             )
             return assign_str
 
     @staticmethod
-    def _gen_single_woclr_assignment(reg_name: str, field: Field) -> Optional[str]:
+    def _gen_single_woclr_assignment(
+        reg_name: str, field: Field, idx: str = ""
+    ) -> Optional[str]:
         if field.woclr:
             msb = field.msb
             lsb = field.lsb
@@ -617,8 +2538,12 @@ class HectareVhdlGen:
             # we always assign to a vector, even for single-bit signals
             assign_val = '"{val:0{l}b}"'.format(val=0, l=msb - lsb + 1)
 
-            assign_str = "reg_{reg_name}_woclr({msb} downto {lsb}) <= {assign_val};".format(
-                reg_name=reg_name.lower(), msb=msb, lsb=lsb, assign_val=assign_val
+            assign_str = "reg_{reg_name}_woclr{idx}({msb} downto {lsb}) <= {assign_val};".format(
+                reg_name=reg_name.lower(),
+                msb=msb,
+                lsb=lsb,
+                assign_val=assign_val,
+                idx=HectareVhdlGen._idx(idx),
             )
             return assign_str
 
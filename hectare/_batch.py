@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+"""
+
+import concurrent.futures
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from hectare._HectareCache import HectareCache
+from hectare._HectareDriver import HectareDriver, format_write_summary, write_outputs
+
+
+def read_manifest(manifest_filename: str) -> List[str]:
+    """ reads a list of input files, one per line
+
+    Empty lines and lines starting with "#" are ignored, relative paths are
+    relative to the manifest file.
+    """
+
+    manifest_dir = os.path.dirname(manifest_filename)
+    in_filenames = []
+    with open(manifest_filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            in_filenames.append(os.path.join(manifest_dir, line))
+    return in_filenames
+
+
+def expand_templates(in_filename: str, templates: Dict[str, str]) -> Dict[str, str]:
+    """ fills in the output filename templates for a single input file
+
+    Supported placeholders: `{name}` (input filename without directory and
+    extension) and `{dir}` (directory of the input file).
+    """
+
+    name = os.path.splitext(os.path.basename(in_filename))[0]
+    in_dir = os.path.dirname(in_filename) or "."
+    return {
+        backend: template.format(name=name, dir=in_dir)
+        for backend, template in templates.items()
+    }
+
+
+def _run_job(
+    in_filename: str,
+    requests: Dict[str, str],
+    cache: Optional[HectareCache],
+    options: Dict[str, Any],
+) -> Tuple[Dict[str, str], float]:
+    """ executed in the worker process, outputs are written by the main process """
+
+    driver = HectareDriver(in_filename, cache=cache, options=options)
+    outputs = driver.build(requests)
+    return outputs, sum(driver.timings.values())
+
+
+def run_batch(
+    in_filenames: List[str],
+    templates: Dict[str, str],
+    cache: Optional[HectareCache] = None,
+    jobs: Optional[int] = None,
+    force: bool = False,
+    options: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """ generates the outputs for all input files in a process pool
+
+    The outputs are written as soon as a job finishes (only if changed, unless
+    `force` is set), `options` are passed to the backends. A failure of a
+    single job does not stop the batch, a list of input files which failed is
+    returned.
+    """
+
+    requests = {
+        in_filename: expand_templates(in_filename, templates)
+        for in_filename in in_filenames
+    }
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(in_filenames)))
+
+    failed = []
+    all_outputs = []
+    changed = []
+    t_start = time.perf_counter()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                _run_job, in_filename, requests[in_filename], cache, options or {}
+            ): in_filename
+            for in_filename in in_filenames
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            in_filename = futures[future]
+            try:
+                outputs, elapsed = future.result()
+                changed.extend(write_outputs(outputs, force=force))
+                all_outputs.extend(outputs.keys())
+            except Exception as err:
+                print("FAILED {0}: {1}".format(in_filename, err))
+                failed.append(in_filename)
+            else:
+                print("OK     {0} ({1:.3f} s)".format(in_filename, elapsed))
+
+    print(format_write_summary(all_outputs, changed))
+    print(
+        "Batch finished: {0} files, {1} failed, {2:.3f} s".format(
+            len(in_filenames), len(failed), time.perf_counter() - t_start
+        )
+    )
+    return failed
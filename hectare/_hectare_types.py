@@ -4,26 +4,278 @@ Copyright (c) 2020 - 2021 Deutsches Elektronen-Synchrotron DESY.
 See LICENSE.txt for license details.
 """
 
+import bisect
 import enum
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import systemrdl
 
 
 class AddressMap:
-    def __init__(self, name: str):
+    """ Register (and memory) addresses are relative to the address map,
+    `base_addr` is the absolute address of the address map itself and `data_w`
+    is the width of the data bus in bits (32 or 64)
+
+    Registers can be looked up by name (`reg_by_name`) and by address
+    (`find_reg`), the index is built by `update_index` (called by the listener
+    once the address map is complete) or on the first lookup. It has to be
+    rebuilt with `update_index` after registers were added or moved.
+    """
+
+    __slots__ = ("name", "base_addr", "data_w", "regs", "mems", "_index")
+
+    def __init__(self, name: str, base_addr: int = 0, data_w: int = 32):
         self.name = name
+        self.base_addr: int = base_addr
+        self.data_w: int = data_w
         self.regs: List[Register] = []
+        self.mems: List[Memory] = []
+        self._index: Optional[_RegisterIndex] = None
+
+    def update_index(self) -> None:
+        by_addr = sorted(self.regs, key=lambda reg: reg.addr)
+        self._index = _RegisterIndex(
+            {reg.name: reg for reg in self.regs},
+            [reg.addr for reg in by_addr],
+            by_addr,
+        )
+
+    def _get_index(self) -> "_RegisterIndex":
+        if self._index is None:
+            self.update_index()
+        return self._index
+
+    def reg_by_name(self, name: str) -> Optional["Register"]:
+        return self._get_index().by_name.get(name)
+
+    def find_reg(self, addr: int) -> Optional["Register"]:
+        """ register (or register array) which contains the byte address `addr` """
+
+        index = self._get_index()
+        pos = bisect.bisect_right(index.addrs, addr) - 1
+        if pos < 0:
+            return None
+        reg = index.regs[pos]
+        offset = addr - reg.addr
+        if not reg.is_array:
+            return reg if offset < self.data_w // 8 else None
+        if offset < reg.stride * reg.count and offset % reg.stride < self.data_w // 8:
+            return reg
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "base_addr": self.base_addr,
+            "data_w": self.data_w,
+            "regs": [reg.to_dict() for reg in self.regs],
+            "mems": [mem.to_dict() for mem in self.mems],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "AddressMap":
+        addrmap = cls(d["name"], d["base_addr"], d["data_w"])
+        enums: Dict[Tuple, enum.EnumMeta] = {}
+        addrmap.regs = [Register.from_dict(reg_d, enums) for reg_d in d["regs"]]
+        addrmap.mems = [Memory.from_dict(mem_d) for mem_d in d["mems"]]
+        addrmap.update_index()
+        return addrmap
+
+
+class _RegisterIndex(NamedTuple):
+    """ lookup tables of an address map """
+
+    by_name: Dict[str, "Register"]
+    addrs: List[int]
+    regs: List["Register"]
+
+
+class Memory:
+    """ SystemRDL `mem`: `entries` words of `width` bits, starting at `addr` """
+
+    __slots__ = ("name", "addr", "entries", "width", "sw_acc_type")
+
+    def __init__(
+        self,
+        name: str,
+        addr: int,
+        entries: int,
+        width: int,
+        sw_acc_type: systemrdl.rdltypes.AccessType = systemrdl.rdltypes.AccessType.rw,
+    ):
+        self.name: str = name
+        self.addr: int = addr
+        self.entries: int = entries
+        self.width: int = width
+        self.sw_acc_type: systemrdl.rdltypes.AccessType = sw_acc_type
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "addr": self.addr,
+            "entries": self.entries,
+            "width": self.width,
+            "sw_acc_type": self.sw_acc_type.name,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Memory":
+        kwargs = dict(d)
+        kwargs["sw_acc_type"] = systemrdl.rdltypes.AccessType[d["sw_acc_type"]]
+        return cls(**kwargs)
 
 
 class Register:
-    def __init__(self, name: str, addr: int):
+    """ A register or an array of registers
+
+    For arrays, `dims` are the array dimensions (last one iterates the most
+    frequently) and `stride` is the distance in bytes between two consecutive
+    elements, `addr` is the address of the first element.
+
+    The storage of `external` registers is implemented in the user logic.
+
+    `summary` holds the properties of the register which the generators
+    derive from its fields, it is computed by `update_summary` (called by the
+    listener once the fields are known) or on the first access. It has to be
+    recomputed with `update_summary` after the fields were changed.
+    """
+
+    __slots__ = ("name", "addr", "dims", "stride", "external", "fields", "_summary")
+
+    def __init__(
+        self,
+        name: str,
+        addr: int,
+        dims: Optional[List[int]] = None,
+        stride: int = 0,
+        external: bool = False,
+    ):
         self.name: str = name
         self.addr: int = addr
+        self.dims: List[int] = list(dims or [])
+        self.stride: int = stride
+        self.external: bool = external
         self.fields: List[Field] = []
+        self._summary: Optional[RegisterSummary] = None
+
+    def update_summary(self) -> None:
+        self._summary = RegisterSummary.from_fields(self.fields)
+
+    @property
+    def summary(self) -> "RegisterSummary":
+        if self._summary is None:
+            self.update_summary()
+        return self._summary
+
+    @property
+    def is_array(self) -> bool:
+        return bool(self.dims)
+
+    @property
+    def count(self) -> int:
+        """ number of elements (1 if not an array) """
+
+        count = 1
+        for dim in self.dims:
+            count *= dim
+        return count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "addr": self.addr,
+            "dims": self.dims,
+            "stride": self.stride,
+            "external": self.external,
+            "fields": [field.to_dict() for field in self.fields],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], enums: Dict[Tuple, enum.EnumMeta]) -> "Register":
+        reg = cls(d["name"], d["addr"], d["dims"], d["stride"], d["external"])
+        reg.fields = [Field.from_dict(field_d, enums) for field_d in d["fields"]]
+        reg.update_summary()
+        return reg
+
+
+class RegisterSummary(NamedTuple):
+    """ aggregated field properties of a register, masks have a bit set for
+    each bit of a field which SW can read (write)
+    """
+
+    has_swmod: bool
+    has_woclr: bool
+    has_swacc: bool
+    has_enum: bool
+    sw_rd_mask: int
+    sw_wr_mask: int
+
+    @classmethod
+    def from_fields(cls, fields: List["Field"]) -> "RegisterSummary":
+        AccessType = systemrdl.rdltypes.AccessType
+
+        sw_rd_mask = 0
+        sw_wr_mask = 0
+        for field in fields:
+            field_mask = ((1 << (field.msb - field.lsb + 1)) - 1) << field.lsb
+            if field.sw_acc_type in (AccessType.r, AccessType.rw):
+                sw_rd_mask |= field_mask
+            if field.sw_acc_type in (AccessType.w, AccessType.rw, AccessType.w1, AccessType.rw1):
+                sw_wr_mask |= field_mask
+
+        return cls(
+            has_swmod=any(field.swmod for field in fields),
+            has_woclr=any(field.woclr for field in fields),
+            has_swacc=any(field.swacc for field in fields),
+            has_enum=any(field.encode is not None for field in fields),
+            sw_rd_mask=sw_rd_mask,
+            sw_wr_mask=sw_wr_mask,
+        )
 
 
 class Field:
+    """ A field of a register
+
+    Counters are incremented by `incrvalue` on a HW strobe, they saturate at
+    `incrsaturate` (wrap around if None). Fields with `rclr` (`rset`) are
+    cleared (set) when they are read, `swacc` adds a read strobe output.
+
+    Interrupt fields have `intr` set to the interrupt type ("level",
+    "posedge", "negedge" or "bothedge"). `enable`, `mask`, `haltenable` and
+    `haltmask` reference another field of the address map as "REG.FIELD",
+    with the name of the element for unrolled arrays (e.g. "CTRL_1.EN").
+
+    `hw_pipeline` is the number of register stages on the HW ports of the
+    field (None: use the setting of the generator).
+    """
+
+    __slots__ = (
+        "name",
+        "lsb",
+        "msb",
+        "hw_acc_type",
+        "sw_acc_type",
+        "swmod",
+        "woclr",
+        "singlepulse",
+        "encode",
+        "reset",
+        "counter",
+        "incrvalue",
+        "incrsaturate",
+        "rclr",
+        "rset",
+        "swacc",
+        "intr",
+        "stickybit",
+        "sticky",
+        "enable",
+        "mask",
+        "haltenable",
+        "haltmask",
+        "hw_pipeline",
+    )
+
     def __init__(
         self,
         name: str,
@@ -36,6 +288,20 @@ class Field:
         singlepulse: bool = False,
         encode: Optional[enum.EnumMeta] = None,
         reset: Optional[int] = None,
+        counter: bool = False,
+        incrvalue: int = 1,
+        incrsaturate: Optional[int] = None,
+        rclr: bool = False,
+        rset: bool = False,
+        swacc: bool = False,
+        intr: Optional[str] = None,
+        stickybit: bool = False,
+        sticky: bool = False,
+        enable: Optional[str] = None,
+        mask: Optional[str] = None,
+        haltenable: Optional[str] = None,
+        haltmask: Optional[str] = None,
+        hw_pipeline: Optional[int] = None,
     ):
         self.name: str = name
         self.lsb: int = lsb
@@ -47,3 +313,70 @@ class Field:
         self.singlepulse = singlepulse
         self.encode = encode
         self.reset: Optional[int] = reset
+        self.counter: bool = counter
+        self.incrvalue: int = incrvalue
+        self.incrsaturate: Optional[int] = incrsaturate
+        self.rclr: bool = rclr
+        self.rset: bool = rset
+        self.swacc: bool = swacc
+        self.intr: Optional[str] = intr
+        self.stickybit: bool = stickybit
+        self.sticky: bool = sticky
+        self.enable: Optional[str] = enable
+        self.mask: Optional[str] = mask
+        self.haltenable: Optional[str] = haltenable
+        self.haltmask: Optional[str] = haltmask
+        self.hw_pipeline: Optional[int] = hw_pipeline
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ plain (JSON-serializable) representation, used by the cache """
+
+        d = {
+            "name": self.name,
+            "lsb": self.lsb,
+            "msb": self.msb,
+            "hw_acc_type": self.hw_acc_type.name,
+            "sw_acc_type": self.sw_acc_type.name,
+            "swmod": self.swmod,
+            "woclr": self.woclr,
+            "singlepulse": self.singlepulse,
+            "encode": None,
+            "reset": self.reset,
+            "counter": self.counter,
+            "incrvalue": self.incrvalue,
+            "incrsaturate": self.incrsaturate,
+            "rclr": self.rclr,
+            "rset": self.rset,
+            "swacc": self.swacc,
+            "intr": self.intr,
+            "stickybit": self.stickybit,
+            "sticky": self.sticky,
+            "enable": self.enable,
+            "mask": self.mask,
+            "haltenable": self.haltenable,
+            "haltmask": self.haltmask,
+            "hw_pipeline": self.hw_pipeline,
+        }
+        if self.encode is not None:
+            d["encode"] = [
+                self.encode.__name__,
+                [[item.name, item.value] for item in self.encode],
+            ]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], enums: Dict[Tuple, enum.EnumMeta]) -> "Field":
+        """ `enums` is shared between the fields of an address map, so that
+        fields which used the same enum also get the same enum class back
+        """
+
+        kwargs = dict(d)
+        kwargs["hw_acc_type"] = systemrdl.rdltypes.AccessType[d["hw_acc_type"]]
+        kwargs["sw_acc_type"] = systemrdl.rdltypes.AccessType[d["sw_acc_type"]]
+        if d["encode"] is not None:
+            enum_name, items = d["encode"]
+            enum_key = (enum_name, tuple(map(tuple, items)))
+            if enum_key not in enums:
+                enums[enum_key] = enum.Enum(enum_name, [tuple(it) for it in items])
+            kwargs["encode"] = enums[enum_key]
+        return cls(**kwargs)
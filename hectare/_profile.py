@@ -0,0 +1,108 @@
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+"""
+
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """ peak resident set size of the process in MiB, None if not available """
+
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Profiler:
+    """ Optional cProfile and tracemalloc instrumentation, used as a context
+    manager around the generation
+
+    With `pstats_filename`, the cProfile statistics are dumped to this file
+    (to be inspected with `python -m pstats` or snakeviz). With
+    `tracemalloc_top` > 0, memory allocations are traced and the lines which
+    allocated the most memory are available after the run.
+    """
+
+    def __init__(self, pstats_filename: Optional[str] = None, tracemalloc_top: int = 0):
+        self.pstats_filename = pstats_filename
+        self.tracemalloc_top = tracemalloc_top
+        self.tracemalloc_peak: Optional[int] = None
+        self._profile = None
+        self._snapshot = None
+
+    def __enter__(self) -> "Profiler":
+        # imported only when needed, most of the runs are not profiled
+        if self.tracemalloc_top > 0:
+            import tracemalloc
+
+            tracemalloc.start()
+        if self.pstats_filename is not None:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.pstats_filename)
+        if self.tracemalloc_top > 0:
+            import tracemalloc
+
+            self._snapshot = tracemalloc.take_snapshot()
+            _, self.tracemalloc_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    def tracemalloc_stats(self) -> List[Dict[str, Any]]:
+        """ top allocations (by size) which were still alive at the end """
+
+        if self._snapshot is None:
+            return []
+
+        import tracemalloc
+
+        # allocations of the instrumentation itself are not interesting
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        if self._profile is not None:
+            import cProfile
+
+            filters.append(tracemalloc.Filter(False, cProfile.__file__))
+        snapshot = self._snapshot.filter_traces(filters)
+        return [
+            {
+                "location": "{0}:{1}".format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                "size_kib": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[: self.tracemalloc_top]
+        ]
+
+    def format_tracemalloc(self) -> str:
+        lines = ["Memory (top {0}):".format(self.tracemalloc_top)]
+        for stat in self.tracemalloc_stats():
+            lines.append(
+                "  {0:10.1f} KiB {1:8} blocks  {2}".format(
+                    stat["size_kib"], stat["count"], stat["location"]
+                )
+            )
+        if self.tracemalloc_peak is not None:
+            lines.append("  peak traced: {0:.1f} MiB".format(self.tracemalloc_peak / 2 ** 20))
+        return "\n".join(lines)
+
+
+def write_report(filename: str, report: Dict[str, Any]):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
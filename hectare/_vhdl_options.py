@@ -0,0 +1,12 @@
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+
+Choices of the VHDL generator, in a separate module so that the command line
+can be set up without importing the generator (and systemrdl).
+"""
+
+READ_CHANNELS = ("fsm", "pipelined")
+WRITE_CHANNELS = ("fsm", "pipelined")
+READ_DECODERS = ("flat", "two_level")
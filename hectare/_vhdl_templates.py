@@ -2,6 +2,11 @@
 Copyright (c) 2020 Deutsches Elektronen-Synchrotron DESY.
 
 See LICENSE.txt for license details.
+
+Templates which depend on the data width are format strings, with `data_w`
+(bus width in bits) and `addr_lsb` (lowest bit of the word address). The
+front-ends of the register core additionally use `rdata` (read data of the
+core) and the `wstrb_*` lines (see HectareVhdlGen._wstrb_template_args).
 """
 
 VHDL_LIBS = """
@@ -17,8 +22,8 @@ VHDL_PORTS_AXI = """
     S_AXI_AWPROT  : in std_logic_vector(2 downto 0);
     S_AXI_AWVALID : in std_logic;
     S_AXI_AWREADY : out std_logic;
-    S_AXI_WDATA   : in std_logic_vector(32-1 downto 0);
-    S_AXI_WSTRB   : in std_logic_vector(32/8-1 downto 0);
+    S_AXI_WDATA   : in std_logic_vector({data_w}-1 downto 0);
+    S_AXI_WSTRB   : in std_logic_vector({data_w}/8-1 downto 0);
     S_AXI_WVALID  : in std_logic;
     S_AXI_WREADY  : out std_logic;
     S_AXI_BRESP   : out std_logic_vector(1 downto 0);
@@ -28,39 +33,116 @@ VHDL_PORTS_AXI = """
     S_AXI_ARPROT  : in std_logic_vector(2 downto 0);
     S_AXI_ARVALID : in std_logic;
     S_AXI_ARREADY : out std_logic;
-    S_AXI_RDATA   : out std_logic_vector(32-1 downto 0);
+    S_AXI_RDATA   : out std_logic_vector({data_w}-1 downto 0);
     S_AXI_RRESP   : out std_logic_vector(1 downto 0);
     S_AXI_RVALID  : out std_logic;
     S_AXI_RREADY  : in std_logic
 """
 
-VHDL_INTERNAL_SIG_DEFS = """
-  -- read
-  type t_state_read is (sReadIdle, sReadValid);
-  signal state_read : t_state_read;
-  
-  signal rdata_reg : std_logic_vector(31 downto 0);
+VHDL_PORTS_AXI4 = """
+    clk           : in std_logic;
+    reset         : in std_logic;
+    S_AXI_AWID    : in std_logic_vector(G_ID_W-1 downto 0);
+    S_AXI_AWADDR  : in std_logic_vector(G_ADDR_W-1 downto 0);
+    S_AXI_AWLEN   : in std_logic_vector(7 downto 0);
+    S_AXI_AWSIZE  : in std_logic_vector(2 downto 0);
+    S_AXI_AWBURST : in std_logic_vector(1 downto 0);
+    S_AXI_AWLOCK  : in std_logic;
+    S_AXI_AWCACHE : in std_logic_vector(3 downto 0);
+    S_AXI_AWPROT  : in std_logic_vector(2 downto 0);
+    S_AXI_AWVALID : in std_logic;
+    S_AXI_AWREADY : out std_logic;
+    S_AXI_WDATA   : in std_logic_vector({data_w}-1 downto 0);
+    S_AXI_WSTRB   : in std_logic_vector({data_w}/8-1 downto 0);
+    S_AXI_WLAST   : in std_logic;
+    S_AXI_WVALID  : in std_logic;
+    S_AXI_WREADY  : out std_logic;
+    S_AXI_BID     : out std_logic_vector(G_ID_W-1 downto 0);
+    S_AXI_BRESP   : out std_logic_vector(1 downto 0);
+    S_AXI_BVALID  : out std_logic;
+    S_AXI_BREADY  : in std_logic;
+    S_AXI_ARID    : in std_logic_vector(G_ID_W-1 downto 0);
+    S_AXI_ARADDR  : in std_logic_vector(G_ADDR_W-1 downto 0);
+    S_AXI_ARLEN   : in std_logic_vector(7 downto 0);
+    S_AXI_ARSIZE  : in std_logic_vector(2 downto 0);
+    S_AXI_ARBURST : in std_logic_vector(1 downto 0);
+    S_AXI_ARLOCK  : in std_logic;
+    S_AXI_ARCACHE : in std_logic_vector(3 downto 0);
+    S_AXI_ARPROT  : in std_logic_vector(2 downto 0);
+    S_AXI_ARVALID : in std_logic;
+    S_AXI_ARREADY : out std_logic;
+    S_AXI_RID     : out std_logic_vector(G_ID_W-1 downto 0);
+    S_AXI_RDATA   : out std_logic_vector({data_w}-1 downto 0);
+    S_AXI_RRESP   : out std_logic_vector(1 downto 0);
+    S_AXI_RLAST   : out std_logic;
+    S_AXI_RVALID  : out std_logic;
+    S_AXI_RREADY  : in std_logic
+"""
+
+VHDL_PORTS_AVALON = """
+    clk               : in std_logic;
+    reset             : in std_logic;
+    avs_address       : in std_logic_vector(G_ADDR_W-{addr_lsb}-1 downto 0);
+    avs_read          : in std_logic;
+    avs_readdata      : out std_logic_vector({data_w}-1 downto 0);
+    avs_readdatavalid : out std_logic;
+    avs_write         : in std_logic;
+    avs_writedata     : in std_logic_vector({data_w}-1 downto 0);
+    avs_byteenable    : in std_logic_vector({data_w}/8-1 downto 0);
+    avs_waitrequest   : out std_logic
+"""
+
+VHDL_PORTS_WISHBONE = """
+    clk        : in std_logic;
+    reset      : in std_logic;
+    wb_adr_i   : in std_logic_vector(G_ADDR_W-1 downto {addr_lsb});
+    wb_dat_i   : in std_logic_vector({data_w}-1 downto 0);
+    wb_dat_o   : out std_logic_vector({data_w}-1 downto 0);
+    wb_sel_i   : in std_logic_vector({data_w}/8-1 downto 0);
+    wb_we_i    : in std_logic;
+    wb_cyc_i   : in std_logic;
+    wb_stb_i   : in std_logic;
+    wb_ack_o   : out std_logic;
+    wb_stall_o : out std_logic
+"""
+
+VHDL_INTERNAL_SIG_DEFS_CORE = """
+  -- register core
+  signal rdata_reg : std_logic_vector({data_w}-1 downto 0);
   signal raddr_word : integer;
-  
-  signal arready_wire : std_logic;
-  signal rvalid_wire : std_logic;
-  
-  -- write
-  type t_state_write is (sWriteIdle, sWriteWaitData, sWriteWaitAddr, sWriteResp);
-  signal state_write : t_state_write;
-  signal state_write_prev : t_state_write;
-  
-  signal waddr_reg : std_logic_vector(G_ADDR_W-1 downto 0);
-  signal wdata_reg : std_logic_vector(31 downto 0);
-  
+  signal rd_strobe : std_logic;
+  signal rd_valid : std_logic;
   signal waddr_word : integer;
-  
-  signal awready_wire : std_logic;
-  signal wready_wire : std_logic;
-  signal bvalid_wire : std_logic;
+  signal wr_en : std_logic;
+  signal wr_valid : std_logic;
+  signal core_ready : std_logic;
+"""
+
+VHDL_INTERNAL_SIG_DEFS_EXT = """
+  -- external registers
+  signal ext_rd_hit : std_logic;
+  signal ext_rd_req : std_logic;
+  signal ext_rd_sel : std_logic;
+  signal ext_rd_addr_reg : integer;
+  signal ext_rdata_reg : std_logic_vector({data_w}-1 downto 0);
+
+  signal ext_wr_hit : std_logic;
+  signal ext_wr_req : std_logic;
+  signal ext_wr_addr_reg : integer;
+  signal ext_wr_data_reg : std_logic_vector({data_w}-1 downto 0);
+  signal ext_wr_strb_reg : std_logic_vector({data_w}/8-1 downto 0);
+"""
+
+VHDL_INTERNAL_SIG_DEFS_READ = """
+  -- read
+  type t_state_read is (sReadIdle, sReadWait, sReadValid);
+  signal state_read : t_state_read;
 """
 
 VHDL_FSM_READ = """
+  -- the read is requested from the core in the cycle in which the address
+  -- is accepted, the data is held until it is accepted
+
   proc_state_read: process (clk)
   begin
     if rising_edge(clk) then
@@ -69,8 +151,16 @@ VHDL_FSM_READ = """
       else
         case state_read is
           when sReadIdle =>
-            if S_AXI_ARVALID = '1' then
-              state_read <= sReadValid;
+            if rd_strobe = '1' then
+              state_read <= sReadWait;
+            end if;
+          when sReadWait =>
+            if rd_valid = '1' then
+              if S_AXI_RREADY = '1' then
+                state_read <= sReadIdle;
+              else
+                state_read <= sReadValid;
+              end if;
             end if;
           when sReadValid =>
             if S_AXI_RREADY = '1' then
@@ -81,35 +171,91 @@ VHDL_FSM_READ = """
     end if;
   end process;
 
-  raddr_word <= to_integer(unsigned(S_AXI_ARADDR(G_ADDR_W-1 downto 2)));
+  raddr_word <= to_integer(unsigned(S_AXI_ARADDR(G_ADDR_W-1 downto {addr_lsb})));
+  rd_strobe <= S_AXI_ARVALID when state_read = sReadIdle and core_ready = '1' else '0';
+
+  S_AXI_ARREADY <= '1' when state_read = sReadIdle and core_ready = '1' else '0';
+  S_AXI_RVALID <= '1' when state_read = sReadValid or (state_read = sReadWait and rd_valid = '1')
+                  else '0';
+  S_AXI_RDATA <= {rdata};
+  S_AXI_RRESP <= "00";
 """
 
-VHDL_FSM_WRITE = """
-  proc_read_output: process (state_read)
+VHDL_INTERNAL_SIG_DEFS_READ_PIPELINED = """
+  -- read (pipelined, with skid buffer)
+  signal arready_wire : std_logic;
+  signal rd_hold : std_logic;
+  signal skid_rdata : std_logic_vector({data_w}-1 downto 0);
+  signal skid_valid : std_logic;
+"""
+
+VHDL_READ_PIPELINED = """
+  -- ARREADY stays high as long as the skid buffer is empty, one read per
+  -- clock cycle is sustained while RREADY is high; the read data of the
+  -- core is held until the next read, if it was not accepted until then,
+  -- it is moved to the skid buffer
+
+  raddr_word <= to_integer(unsigned(S_AXI_ARADDR(G_ADDR_W-1 downto {addr_lsb})));
+
+  arready_wire <= not skid_valid and core_ready;
+  rd_strobe <= S_AXI_ARVALID and arready_wire;
+
+  proc_read_pipe: process (clk)
   begin
-    case state_read is
-      when sReadIdle =>
-        arready_wire <= '1';
-        rvalid_wire <= '0';
-      when sReadValid =>
-        arready_wire <= '0';
-        rvalid_wire <= '1';
-      when others =>
-        arready_wire <= '0';
-        rvalid_wire <= '0';
-    end case;
+    if rising_edge(clk) then
+      if reset = '1' then
+        rd_hold <= '0';
+        skid_valid <= '0';
+      else
+        if skid_valid = '1' then
+          if S_AXI_RREADY = '1' then
+            skid_valid <= '0';
+          end if;
+          rd_hold <= rd_valid or rd_hold;
+        elsif (rd_valid = '1' or rd_hold = '1') and S_AXI_RREADY = '0' then
+          if rd_strobe = '1' then
+            -- output is stalled, the data is replaced by the next read
+            skid_rdata <= {rdata};
+            skid_valid <= '1';
+            rd_hold <= '0';
+          else
+            rd_hold <= '1';
+          end if;
+        else
+          rd_hold <= '0';
+        end if;
+      end if;
+    end if;
   end process;
 
   S_AXI_ARREADY <= arready_wire;
-  S_AXI_RVALID <= rvalid_wire;
-  S_AXI_RDATA <= rdata_reg;
+  S_AXI_RVALID <= skid_valid or rd_valid or rd_hold;
+  S_AXI_RDATA <= skid_rdata when skid_valid = '1' else {rdata};
   S_AXI_RRESP <= "00";
+"""
 
-  proc_state_write_prev: process (clk) begin
-    if rising_edge(clk) then
-      state_write_prev <= state_write;
-    end if;
-  end process;
+VHDL_INTERNAL_SIG_DEFS_WRITE = """
+  -- write
+  type t_state_write is (sWriteIdle, sWriteWaitData, sWriteWaitAddr, sWriteBusy, sWriteWait, sWriteResp);
+  signal state_write : t_state_write;
+
+  signal waddr_hold : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal wdata_hold : std_logic_vector({data_w}-1 downto 0);{wstrb_hold_def}
+  signal waddr_full : std_logic;
+  signal wdata_full : std_logic;
+
+  signal waddr_wire : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal wdata_wire : std_logic_vector({data_w}-1 downto 0);{wstrb_wire_def}
+
+  signal awready_wire : std_logic;
+  signal wready_wire : std_logic;
+"""
+
+VHDL_FSM_WRITE = """
+  -- address and data are taken directly from the bus, or from the holding
+  -- registers if they arrived in an earlier cycle; the write is requested
+  -- from the core as soon as both are there, the response is sent when the
+  -- write is done
 
   proc_state_write: process (clk) begin
     if rising_edge (clk) then
@@ -118,26 +264,42 @@ VHDL_FSM_WRITE = """
       else
         case state_write is
           when sWriteIdle =>
-            if S_AXI_AWVALID = '1' and S_AXI_WVALID = '1' then
-              state_write <= sWriteResp;
-              waddr_reg <= S_AXI_AWADDR;
-              wdata_reg <= S_AXI_WDATA;
-            elsif S_AXI_AWVALID = '1' and S_AXI_WVALID = '0' then
+            waddr_hold <= S_AXI_AWADDR;
+            wdata_hold <= S_AXI_WDATA;{wstrb_hold_capture}
+            if wr_en = '1' then
+              state_write <= sWriteWait;
+            elsif S_AXI_AWVALID = '1' and S_AXI_WVALID = '1' then
+              state_write <= sWriteBusy;
+            elsif S_AXI_AWVALID = '1' then
               state_write <= sWriteWaitData;
-              waddr_reg <= S_AXI_AWADDR;
-            elsif S_AXI_AWVALID = '0' and S_AXI_WVALID = '1' then
+            elsif S_AXI_WVALID = '1' then
               state_write <= sWriteWaitAddr;
-              wdata_reg <= S_AXI_WDATA;
             end if;
           when sWriteWaitData =>
-            if S_AXI_WVALID = '1' then
-              state_write <= sWriteResp;
-              wdata_reg <= S_AXI_WDATA;
+            wdata_hold <= S_AXI_WDATA;{wstrb_hold_capture}
+            if wr_en = '1' then
+              state_write <= sWriteWait;
+            elsif S_AXI_WVALID = '1' then
+              state_write <= sWriteBusy;
             end if;
           when sWriteWaitAddr =>
-            if S_AXI_AWVALID = '1' then
-              state_write <= sWriteResp;
-              waddr_reg <= S_AXI_AWADDR;
+            waddr_hold <= S_AXI_AWADDR;
+            if wr_en = '1' then
+              state_write <= sWriteWait;
+            elsif S_AXI_AWVALID = '1' then
+              state_write <= sWriteBusy;
+            end if;
+          when sWriteBusy =>
+            if wr_en = '1' then
+              state_write <= sWriteWait;
+            end if;
+          when sWriteWait =>
+            if wr_valid = '1' then
+              if S_AXI_BREADY = '1' then
+                state_write <= sWriteIdle;
+              else
+                state_write <= sWriteResp;
+              end if;
             end if;
           when sWriteResp =>
             if S_AXI_BREADY = '1' then
@@ -148,40 +310,323 @@ VHDL_FSM_WRITE = """
     end if;
   end process;
 
-  waddr_word <= to_integer(unsigned(waddr_reg(G_ADDR_W-1 downto 2)));
-"""
-
-VHDL_WRITE_OUTPUT = """
-
-  proc_write_output: process (state_write) begin
-    case state_write is
-      when sWriteIdle =>
-        awready_wire <= '1';
-        wready_wire <= '1';
-        bvalid_wire <= '0';
-      when sWriteWaitData =>
-        awready_wire <= '0';
-        wready_wire <= '1';
-        bvalid_wire <= '0';
-      when sWriteWaitAddr =>
-        awready_wire <= '1';
-        wready_wire <= '0';
-        bvalid_wire <= '0';
-      when sWriteResp =>
-        awready_wire <= '0';
-        wready_wire <= '0';
-        bvalid_wire <= '1';
-      when others =>
-        awready_wire <= '0';
-        wready_wire <= '0';
-        bvalid_wire <= '0';
-    end case;
+  awready_wire <= '1' when state_write = sWriteIdle or state_write = sWriteWaitAddr else '0';
+  wready_wire <= '1' when state_write = sWriteIdle or state_write = sWriteWaitData else '0';
+  waddr_full <= '1' when state_write = sWriteWaitData or state_write = sWriteBusy else '0';
+  wdata_full <= '1' when state_write = sWriteWaitAddr or state_write = sWriteBusy else '0';
+
+  waddr_wire <= waddr_hold when waddr_full = '1' else S_AXI_AWADDR;
+  wdata_wire <= wdata_hold when wdata_full = '1' else S_AXI_WDATA;{wstrb_wire_assign}
+
+  wr_en <= core_ready and (waddr_full or (S_AXI_AWVALID and awready_wire))
+    and (wdata_full or (S_AXI_WVALID and wready_wire));
+  waddr_word <= to_integer(unsigned(waddr_wire(G_ADDR_W-1 downto {addr_lsb})));
+
+  S_AXI_AWREADY <= awready_wire;
+  S_AXI_WREADY <= wready_wire;
+  S_AXI_BRESP <= "00";
+  S_AXI_BVALID <= '1' when state_write = sWriteResp or (state_write = sWriteWait and wr_valid = '1')
+                  else '0';
+
+"""
+
+VHDL_INTERNAL_SIG_DEFS_WRITE_PIPELINED = """
+  -- write (pipelined)
+  signal waddr_hold : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal wdata_hold : std_logic_vector({data_w}-1 downto 0);{wstrb_hold_def}
+  signal waddr_full : std_logic;
+  signal wdata_full : std_logic;
+
+  signal waddr_wire : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal wdata_wire : std_logic_vector({data_w}-1 downto 0);{wstrb_wire_def}
+
+  signal awready_wire : std_logic;
+  signal wready_wire : std_logic;
+  signal bvalid_reg : std_logic;
+  signal bvalid_wire : std_logic;
+"""
+
+VHDL_WRITE_PIPELINED = """
+  -- address and data are taken directly from the bus, or from the holding
+  -- registers if they arrived in an earlier cycle; the write is requested
+  -- in the same cycle in which the previous response is accepted, which
+  -- sustains one write per clock cycle
+
+  awready_wire <= not waddr_full;
+  wready_wire <= not wdata_full;
+
+  waddr_wire <= waddr_hold when waddr_full = '1' else S_AXI_AWADDR;
+  wdata_wire <= wdata_hold when wdata_full = '1' else S_AXI_WDATA;{wstrb_wire_assign}
+
+  bvalid_wire <= bvalid_reg or wr_valid;
+  wr_en <= (waddr_full or S_AXI_AWVALID) and (wdata_full or S_AXI_WVALID) and core_ready
+    and (not bvalid_wire or S_AXI_BREADY);
+
+  proc_write_pipe: process (clk)
+  begin
+    if rising_edge(clk) then
+      if reset = '1' then
+        waddr_full <= '0';
+        wdata_full <= '0';
+        bvalid_reg <= '0';
+      else
+        if wr_en = '1' then
+          waddr_full <= '0';
+          wdata_full <= '0';
+        else
+          if S_AXI_AWVALID = '1' and waddr_full = '0' then
+            waddr_hold <= S_AXI_AWADDR;
+            waddr_full <= '1';
+          end if;
+          if S_AXI_WVALID = '1' and wdata_full = '0' then
+            wdata_hold <= S_AXI_WDATA;{wstrb_hold_capture}
+            wdata_full <= '1';
+          end if;
+        end if;
+        bvalid_reg <= bvalid_wire and not S_AXI_BREADY;
+      end if;
+    end if;
   end process;
 
+  waddr_word <= to_integer(unsigned(waddr_wire(G_ADDR_W-1 downto {addr_lsb})));
+
   S_AXI_AWREADY <= awready_wire;
   S_AXI_WREADY <= wready_wire;
   S_AXI_BRESP <= "00";
   S_AXI_BVALID <= bvalid_wire;
+
+"""
+
+VHDL_INTERNAL_SIG_DEFS_READ_AXI4 = """
+  -- read (AXI4 bursts)
+  type t_state_read is (sReadIdle, sReadAddr, sReadData);
+  signal state_read : t_state_read;
+
+  signal raddr_reg : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal raddr_next : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal raddr_cur : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal raddr_mask : unsigned(G_ADDR_W-1 downto 0);
+  signal rid_reg : std_logic_vector(G_ID_W-1 downto 0);
+  signal rlen_cnt : unsigned(7 downto 0);
+  signal rerr_reg : std_logic;
+  signal rd_hold : std_logic;
+  signal rvalid_wire : std_logic;
+  signal rd_beat : std_logic;
+"""
+
+VHDL_FSM_READ_AXI4 = """
+  -- one beat per clock cycle: the next beat is read from the core in the
+  -- same cycle in which the current beat is accepted (sReadAddr if the core
+  -- is busy); the address is incremented by the bus width in the bits set
+  -- in raddr_mask (none for FIXED, the bits below the wrap boundary for
+  -- WRAP, all for INCR bursts); bursts with beats narrower than the bus are
+  -- not read and answered with SLVERR
+
+  proc_state_read: process (clk)
+  begin
+    if rising_edge(clk) then
+      if reset = '1' then
+        state_read <= sReadIdle;
+        rd_hold <= '0';
+      else
+        rd_hold <= (rd_valid or rd_hold) and not rd_beat;
+        case state_read is
+          when sReadIdle =>
+            if S_AXI_ARVALID = '1' then
+              raddr_reg <= S_AXI_ARADDR;
+              rid_reg <= S_AXI_ARID;
+              rlen_cnt <= unsigned(S_AXI_ARLEN);
+              case S_AXI_ARBURST is
+                when "00" =>
+                  raddr_mask <= (others => '0');
+                when "10" =>
+                  raddr_mask <= resize(unsigned(S_AXI_ARLEN) &
+                                       to_unsigned(2**{addr_lsb}-1, {addr_lsb}), G_ADDR_W);
+                when others =>
+                  raddr_mask <= (others => '1');
+              end case;
+              if to_integer(unsigned(S_AXI_ARSIZE)) /= {addr_lsb} then
+                rerr_reg <= '1';
+                state_read <= sReadData;
+              elsif rd_strobe = '1' then
+                rerr_reg <= '0';
+                state_read <= sReadData;
+              else
+                rerr_reg <= '0';
+                state_read <= sReadAddr;
+              end if;
+            end if;
+          when sReadAddr =>
+            if rd_strobe = '1' then
+              state_read <= sReadData;
+            end if;
+          when sReadData =>
+            if rd_beat = '1' then
+              if rlen_cnt = 0 then
+                state_read <= sReadIdle;
+              else
+                raddr_reg <= raddr_next;
+                rlen_cnt <= rlen_cnt - 1;
+                if rd_strobe = '0' and rerr_reg = '0' then
+                  state_read <= sReadAddr;
+                end if;
+              end if;
+            end if;
+        end case;
+      end if;
+    end if;
+  end process;
+
+  raddr_next <= std_logic_vector((unsigned(raddr_reg) and not raddr_mask) or
+                                 ((unsigned(raddr_reg) + {data_w}/8) and raddr_mask));
+
+  -- address of the beat which is read in this cycle
+  raddr_cur <= S_AXI_ARADDR when state_read = sReadIdle else
+               raddr_reg when state_read = sReadAddr else
+               raddr_next;
+  raddr_word <= to_integer(unsigned(raddr_cur(G_ADDR_W-1 downto {addr_lsb})));
+
+  rvalid_wire <= '1' when state_read = sReadData and
+                          (rd_valid = '1' or rd_hold = '1' or rerr_reg = '1')
+                 else '0';
+  rd_beat <= rvalid_wire and S_AXI_RREADY;
+
+  rd_strobe <= '1' when core_ready = '1' and
+                        ((state_read = sReadIdle and S_AXI_ARVALID = '1' and
+                          to_integer(unsigned(S_AXI_ARSIZE)) = {addr_lsb}) or
+                         state_read = sReadAddr or
+                         (rd_beat = '1' and rlen_cnt /= 0 and rerr_reg = '0'))
+               else '0';
+
+  S_AXI_ARREADY <= '1' when state_read = sReadIdle else '0';
+  S_AXI_RVALID <= rvalid_wire;
+  S_AXI_RLAST <= '1' when rlen_cnt = 0 else '0';
+  S_AXI_RID <= rid_reg;
+  S_AXI_RDATA <= {rdata};
+  S_AXI_RRESP <= "10" when rerr_reg = '1' else "00";
+"""
+
+VHDL_INTERNAL_SIG_DEFS_WRITE_AXI4 = """
+  -- write (AXI4 bursts)
+  type t_state_write is (sWriteIdle, sWriteData, sWriteWait, sWriteResp);
+  signal state_write : t_state_write;
+
+  signal waddr_reg : std_logic_vector(G_ADDR_W-1 downto 0);
+  signal waddr_mask : unsigned(G_ADDR_W-1 downto 0);
+  signal wid_reg : std_logic_vector(G_ID_W-1 downto 0);
+  signal werr_reg : std_logic;
+  signal wready_wire : std_logic;
+"""
+
+VHDL_FSM_WRITE_AXI4 = """
+  -- one beat per clock cycle (while the core is ready), the address is
+  -- updated as for the reads; the response is sent when the last beat is
+  -- written; bursts with beats narrower than the bus are not written and
+  -- answered with SLVERR
+
+  proc_state_write: process (clk) begin
+    if rising_edge(clk) then
+      if reset = '1' then
+        state_write <= sWriteIdle;
+      else
+        case state_write is
+          when sWriteIdle =>
+            if S_AXI_AWVALID = '1' then
+              state_write <= sWriteData;
+              waddr_reg <= S_AXI_AWADDR;
+              wid_reg <= S_AXI_AWID;
+              case S_AXI_AWBURST is
+                when "00" =>
+                  waddr_mask <= (others => '0');
+                when "10" =>
+                  waddr_mask <= resize(unsigned(S_AXI_AWLEN) &
+                                       to_unsigned(2**{addr_lsb}-1, {addr_lsb}), G_ADDR_W);
+                when others =>
+                  waddr_mask <= (others => '1');
+              end case;
+              if to_integer(unsigned(S_AXI_AWSIZE)) = {addr_lsb} then
+                werr_reg <= '0';
+              else
+                werr_reg <= '1';
+              end if;
+            end if;
+          when sWriteData =>
+            if S_AXI_WVALID = '1' and wready_wire = '1' then
+              waddr_reg <= std_logic_vector(
+                (unsigned(waddr_reg) and not waddr_mask) or
+                ((unsigned(waddr_reg) + {data_w}/8) and waddr_mask));
+              if S_AXI_WLAST = '1' and werr_reg = '1' then
+                state_write <= sWriteResp;
+              elsif S_AXI_WLAST = '1' then
+                state_write <= sWriteWait;
+              end if;
+            end if;
+          when sWriteWait =>
+            if wr_valid = '1' then
+              if S_AXI_BREADY = '1' then
+                state_write <= sWriteIdle;
+              else
+                state_write <= sWriteResp;
+              end if;
+            end if;
+          when sWriteResp =>
+            if S_AXI_BREADY = '1' then
+              state_write <= sWriteIdle;
+            end if;
+        end case;
+      end if;
+    end if;
+  end process;
+
+  waddr_word <= to_integer(unsigned(waddr_reg(G_ADDR_W-1 downto {addr_lsb})));
+  wready_wire <= '1' when state_write = sWriteData and (core_ready = '1' or werr_reg = '1')
+                 else '0';
+  wr_en <= S_AXI_WVALID and wready_wire and not werr_reg;
+
+  S_AXI_AWREADY <= '1' when state_write = sWriteIdle else '0';
+  S_AXI_WREADY <= wready_wire;
+  S_AXI_BID <= wid_reg;
+  S_AXI_BRESP <= "10" when werr_reg = '1' else "00";
+  S_AXI_BVALID <= '1' when state_write = sWriteResp or (state_write = sWriteWait and wr_valid = '1')
+                  else '0';
+
+"""
+
+VHDL_FRONTEND_AVALON_READ = """
+  -- Avalon-MM (word addresses): pipelined reads with variable latency,
+  -- waitrequest while the core is busy
+
+  raddr_word <= to_integer(unsigned(avs_address));
+  rd_strobe <= avs_read and core_ready;
+
+  avs_waitrequest <= not core_ready;
+  avs_readdatavalid <= rd_valid;
+  avs_readdata <= {rdata};
+"""
+
+VHDL_FRONTEND_AVALON_WRITE = """
+  waddr_word <= to_integer(unsigned(avs_address));
+  wr_en <= avs_write and core_ready;
+
+"""
+
+VHDL_FRONTEND_WISHBONE_READ = """
+  -- Wishbone B4 pipelined: stalls while the core is busy, every access is
+  -- acknowledged when it is done (one access per clock cycle with registers
+  -- and memories)
+
+  raddr_word <= to_integer(unsigned(wb_adr_i));
+  rd_strobe <= wb_cyc_i and wb_stb_i and not wb_we_i and core_ready;
+
+  wb_stall_o <= not core_ready;
+  wb_ack_o <= rd_valid or wr_valid;
+  wb_dat_o <= {rdata};
+"""
+
+VHDL_FRONTEND_WISHBONE_WRITE = """
+  waddr_word <= to_integer(unsigned(wb_adr_i));
+  wr_en <= wb_cyc_i and wb_stb_i and wb_we_i and core_ready;
+
 """
 
 VHDL_BEGIN_ARCH = """
@@ -9,73 +9,54 @@ import logging
 import os
 import sys
 
-from systemrdl import RDLCompileError, RDLCompiler, RDLWalker
-
-from hectare._HectareListener import HectareListener
-from hectare._HectareVhdlGen import HectareVhdlGen
-from hectare._HectareCHeaderGen import HectareCHeaderGen
+import hectare._vhdl_options as _vhdl_options
+from hectare._batch import expand_templates, read_manifest, run_batch
+from hectare._HectareCache import DEFAULT_MAX_SIZE, HectareCache, default_cache_dir
+from hectare._HectareDriver import HectareDriver, format_write_summary
+from hectare._profile import Profiler, write_report
 from hectare.__init__ import __version__ as hectare_version
 
+# systemrdl and the generators are imported by the driver when they are
+# needed, `--help`, `--version` and cached runs start without them
+
 
 def gen_vhdl_axi(in_filename, out_filename):
+    HectareDriver(in_filename).run({"vhdl": out_filename})
 
-    if out_filename[-4:] != ".vhd":
-        raise ValueError("output filename is expected to have .vhd extension")
 
-    rdlc = RDLCompiler()
-    rdlc.compile_file(in_filename)
-    root = rdlc.elaborate()
+def gen_vhdl_axi4(in_filename, out_filename):
+    HectareDriver(in_filename).run({"vhdl_axi4": out_filename})
 
-    walker = RDLWalker(unroll=True)
-    listener = HectareListener()
-    walker.walk(root, listener)
-    print("Parsing finished.")
 
-    vhdl_gen = HectareVhdlGen(listener.addrmaps[0], input_filename=in_filename)
-    s_pkg = vhdl_gen.generate_package()
-    s_vhdl = vhdl_gen.generate_string()
+def gen_vhdl_avalon(in_filename, out_filename):
+    HectareDriver(in_filename).run({"vhdl_avalon": out_filename})
 
-    print("Generating {0} ...".format(out_filename))
-    out_file = open(out_filename, "w")
-    out_file.write(s_vhdl)
-    out_file.close()
 
-    if s_pkg is not None:
-        pkg_filename = out_filename.replace(".vhd", "_pkg.vhd")
-        print("Generating {0} ...".format(pkg_filename))
-        out_file = open(pkg_filename, "w")
-        out_file.write(s_pkg)
-        out_file.close()
+def gen_vhdl_wishbone(in_filename, out_filename):
+    HectareDriver(in_filename).run({"vhdl_wishbone": out_filename})
 
 
 def gen_c_header(in_filename, out_filename):
+    HectareDriver(in_filename).run({"c_header": out_filename})
 
-    if out_filename[-2:] != ".h":
-        raise ValueError("output filename is expected to have .h extension")
-
-    rdlc = RDLCompiler()
-    rdlc.compile_file(in_filename)
-    root = rdlc.elaborate()
-
-    walker = RDLWalker(unroll=True)
-    listener = HectareListener()
-    walker.walk(root, listener)
-    print("Parsing finished.")
-
-    c_header_gen = HectareCHeaderGen(listener.addrmaps[0], input_filename=in_filename)
-    s_header = c_header_gen.generate_string()
 
-    print("Generating {0} ...".format(out_filename))
-    out_file = open(out_filename, "w")
-    out_file.write(s_header)
-    out_file.close()
+def _positive_int(s: str) -> int:
+    value = int(s)
+    if value < 1:
+        raise argparse.ArgumentTypeError("has to be at least 1: {0}".format(s))
+    return value
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="HECTARE - Hamburg Elegant CreaTor from Accelera systemrdl to REgisters"
     )
-    parser.add_argument("filename", type=str, help=".rdl file")
+    parser.add_argument(
+        "filename",
+        type=str,
+        nargs="*",
+        help=".rdl file(s), with several files the output names are templates",
+    )
     parser.add_argument(
         "--version", action="version", version="%(prog)s " + hectare_version
     )
@@ -89,23 +70,249 @@ def main():
         type=str,
         help="generate AXI4-Lite slave",
     )
+    parser.add_argument(
+        "--axi4-vhdl",
+        nargs=1,
+        dest="axi4_vhdl_name",
+        type=str,
+        help="generate AXI4 (full) slave with burst support",
+    )
+    parser.add_argument(
+        "--avalon-vhdl",
+        nargs=1,
+        dest="avalon_vhdl_name",
+        type=str,
+        help="generate Avalon-MM slave",
+    )
+    parser.add_argument(
+        "--wishbone-vhdl",
+        nargs=1,
+        dest="wishbone_vhdl_name",
+        type=str,
+        help="generate Wishbone B4 (pipelined) slave",
+    )
+
+    parser.add_argument(
+        "--axi-read",
+        dest="read_channel",
+        choices=_vhdl_options.READ_CHANNELS,
+        default="fsm",
+        help="AXI4-Lite read channel: simple state machine or pipelined with "
+        "one read per clock cycle (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--axi-read-decoder",
+        dest="read_decoder",
+        choices=_vhdl_options.READ_DECODERS,
+        default="flat",
+        help="read address decoder: single case statement or two registered "
+        "stages (block and offset) for large maps, adds one clock cycle of "
+        "read latency (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--axi-write",
+        dest="write_channel",
+        choices=_vhdl_options.WRITE_CHANNELS,
+        default="fsm",
+        help="AXI4-Lite write channels: simple state machine or pipelined with "
+        "one write per clock cycle (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--axi-wstrb",
+        dest="use_wstrb",
+        action="store_true",
+        help="honor write strobes (S_AXI_WSTRB), only enabled bytes are written",
+    )
+    parser.add_argument(
+        "--hw-clk",
+        dest="hw_clk",
+        action="store_true",
+        help="HW ports in a separate clock domain (hw_clk), with CDC handshakes",
+    )
+    parser.add_argument(
+        "--hw-pipeline",
+        dest="hw_pipeline",
+        type=int,
+        default=0,
+        help="number of register stages on the HW ports, can be overridden per "
+        "field with the hectare_pipeline property (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-fanout",
+        dest="max_fanout",
+        type=int,
+        default=None,
+        help="add the max_fanout synthesis attribute to the registers",
+    )
 
     parser.add_argument(
         "--c-header", nargs=1, dest="c_header", type=str, help="generate C header",
     )
+    parser.add_argument(
+        "--profile",
+        "--timing",
+        action="store_true",
+        help="print wall clock time, CPU time and peak memory of each phase",
+    )
+    parser.add_argument(
+        "--profile-pstats",
+        type=str,
+        metavar="FILE",
+        help="run under cProfile and dump the statistics (pstats) to FILE",
+    )
+    parser.add_argument(
+        "--profile-tracemalloc",
+        type=int,
+        metavar="N",
+        default=0,
+        help="trace memory allocations and print the N largest (by source line)",
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=str,
+        metavar="FILE",
+        help="write the timing report (and the allocations) as JSON to FILE",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not use the generation cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=default_cache_dir(),
+        help="directory of the generation cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+        help="maximum size of the generation cache in MiB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="file with a list of .rdl files (one per line) to process in a batch",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="number of parallel jobs in a batch (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--force-write",
+        action="store_true",
+        help="always write the output files, even if the content did not change",
+    )
     args = parser.parse_args()
 
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
 
-    try:
-        if args.vhdl_name is not None:
-            gen_vhdl_axi(args.filename, args.vhdl_name[0])
-        if args.c_header is not None:
-            gen_c_header(args.filename, args.c_header[0])
-    except RDLCompileError as err:
-        print(err)
-        sys.exit(1)
+    requests = {}
+    if args.vhdl_name is not None:
+        requests["vhdl"] = args.vhdl_name[0]
+    if args.axi4_vhdl_name is not None:
+        requests["vhdl_axi4"] = args.axi4_vhdl_name[0]
+    if args.avalon_vhdl_name is not None:
+        requests["vhdl_avalon"] = args.avalon_vhdl_name[0]
+    if args.wishbone_vhdl_name is not None:
+        requests["vhdl_wishbone"] = args.wishbone_vhdl_name[0]
+    if args.c_header is not None:
+        requests["c_header"] = args.c_header[0]
+
+    cache = None
+    if not args.no_cache:
+        cache = HectareCache(args.cache_dir, max_size=args.cache_size * 1024 * 1024)
+
+    options = {
+        "read_channel": args.read_channel,
+        "write_channel": args.write_channel,
+        "use_wstrb": args.use_wstrb,
+        "read_decoder": args.read_decoder,
+        "hw_clk": args.hw_clk,
+        "hw_pipeline": args.hw_pipeline,
+        "max_fanout": args.max_fanout,
+    }
+
+    in_filenames = list(args.filename)
+    if args.manifest is not None:
+        in_filenames.extend(read_manifest(args.manifest))
+
+    if not in_filenames:
+        parser.error("no input file specified")
+
+    profiling = (
+        args.profile
+        or args.profile_pstats is not None
+        or args.profile_tracemalloc > 0
+        or args.profile_json is not None
+    )
+
+    if len(in_filenames) > 1:
+        if profiling:
+            parser.error("profiling is only supported with a single input file")
+
+        # output names are templates, check that they produce distinct names
+        try:
+            out_filenames = [
+                out_filename
+                for in_filename in in_filenames
+                for out_filename in expand_templates(in_filename, requests).values()
+            ]
+        except (KeyError, IndexError) as err:
+            parser.error("invalid placeholder in output name: {0}".format(err))
+        if len(set(out_filenames)) != len(out_filenames):
+            parser.error(
+                "output names must contain {name} or {dir} when processing several files"
+            )
+
+        failed = run_batch(
+            in_filenames,
+            requests,
+            cache=cache,
+            jobs=args.jobs,
+            force=args.force_write,
+            options=options,
+        )
+        if failed:
+            sys.exit(1)
+        print("Done.")
+        return
+
+    requests = expand_templates(in_filenames[0], requests)
+    driver = HectareDriver(in_filenames[0], cache=cache, options=options)
+    profiler = Profiler(args.profile_pstats, args.profile_tracemalloc)
+    with profiler:
+        try:
+            outputs = driver.build(requests, lazy=True)
+        except Exception as err:
+            # already imported if the compiler raised it
+            from systemrdl import RDLCompileError
+
+            if not isinstance(err, RDLCompileError):
+                raise
+            print(err)
+            sys.exit(1)
+
+        changed = driver.write_outputs(outputs, force=args.force_write)
+    print(format_write_summary(list(outputs), changed))
+
+    if args.profile:
+        print(driver.format_profile())
+    if args.profile_tracemalloc > 0:
+        print(profiler.format_tracemalloc())
+    if args.profile_pstats is not None:
+        print("cProfile statistics written to {0}".format(args.profile_pstats))
+    if args.profile_json is not None:
+        report = driver.profile_report()
+        report["hectare_version"] = hectare_version
+        report["tracemalloc"] = profiler.tracemalloc_stats()
+        write_report(args.profile_json, report)
 
     print("Done.")
 
@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY
+
+See LICENSE.txt for license details.
+"""
+
+import enum
+import os
+import tempfile
+import unittest
+
+from systemrdl.rdltypes import AccessType
+
+from hectare._hectare_types import AddressMap, Field, Memory, Register
+from hectare._HectareCache import HectareCache
+
+
+class TestHectareCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.rdl_filename = os.path.join(self.tmp_dir.name, "mymodule.rdl")
+        with open(self.rdl_filename, "w") as f:
+            f.write("addrmap mymodule {};\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _make_addrmap():
+        class ColorSel(enum.Enum):
+            RED = 0
+            GREEN = 1
+
+        addrmap = AddressMap("mymodule")
+        for i in range(2):
+            reg = Register("myreg{0}".format(i), 0x10 * i, [4], 4)
+            reg.fields.append(
+                Field("myfield", 0, 1, AccessType.r, AccessType.rw, swmod=True, encode=ColorSel)
+            )
+            addrmap.regs.append(reg)
+        addrmap.mems.append(Memory("mymem", 0x400, 256, 32, AccessType.r))
+        return addrmap
+
+    def test_model_roundtrip(self):
+        addrmap = AddressMap.from_dict(self._make_addrmap().to_dict())
+        self.assertEqual(addrmap.name, "mymodule")
+        self.assertEqual([reg.addr for reg in addrmap.regs], [0, 0x10])
+        self.assertEqual(addrmap.regs[1].dims, [4])
+        self.assertEqual(addrmap.regs[1].stride, 4)
+        self.assertEqual(addrmap.mems[0].entries, 256)
+        self.assertEqual(addrmap.mems[0].sw_acc_type, AccessType.r)
+
+        field0 = addrmap.regs[0].fields[0]
+        field1 = addrmap.regs[1].fields[0]
+        self.assertEqual(field0.sw_acc_type, AccessType.rw)
+        self.assertTrue(field0.swmod)
+        self.assertEqual(field0.encode.__name__, "ColorSel")
+        self.assertEqual([it.name for it in field0.encode], ["RED", "GREEN"])
+        self.assertIs(field0.encode, field1.encode, "enums must be shared between fields")
+
+    def test_source_key_unknown_before_deps(self):
+        cache = HectareCache(self.cache_dir)
+        self.assertIsNone(cache.source_key(self.rdl_filename))
+
+    def test_source_key_changes_with_content(self):
+        cache = HectareCache(self.cache_dir)
+        cache.store_deps(self.rdl_filename, [])
+        key1 = cache.source_key(self.rdl_filename)
+        self.assertIsNotNone(key1)
+        self.assertEqual(key1, cache.source_key(self.rdl_filename))
+
+        with open(self.rdl_filename, "a") as f:
+            f.write("// modified\n")
+        self.assertNotEqual(key1, cache.source_key(self.rdl_filename))
+
+    def test_model_and_outputs(self):
+        cache = HectareCache(self.cache_dir)
+        cache.store_deps(self.rdl_filename, [])
+        key = cache.source_key(self.rdl_filename)
+        cache.store_model(key, [self._make_addrmap()])
+        self.assertEqual(cache.load_model(key)[0].name, "mymodule")
+
+        out_key = cache.outputs_key(key, self.rdl_filename, [["vhdl", "a.vhd"]])
+        self.assertIsNone(cache.load_outputs(out_key))
+        self.assertTrue(cache.store_outputs(out_key, {"a.vhd": iter(["-- ", "vhdl"]), "a.h": ""}))
+        outputs = cache.load_outputs(out_key)
+        self.assertEqual({k: "".join(v) for k, v in outputs.items()}, {"a.vhd": "-- vhdl", "a.h": ""})
+
+    def test_invalid_entries(self):
+        cache = HectareCache(self.cache_dir)
+        os.makedirs(self.cache_dir)
+        entries = [
+            '{"foo": 1}',
+            '{"outputs": 3}',
+            '{"outputs": [["a.vhd", 1]]}',
+            '{"outputs": [["a.vhd", "../a.vhd"]]}',
+            '{"outputs": [["a.vhd", "missing.out"]]}',
+        ]
+        for i, content in enumerate(entries):
+            with open(os.path.join(self.cache_dir, "outputs-{0}.json".format(i)), "w") as f:
+                f.write(content)
+            self.assertIsNone(cache.load_outputs(str(i)), content)
+
+    def test_evict_lru(self):
+        cache = HectareCache(self.cache_dir, max_size=1800)
+        for i in range(3):
+            cache.store_outputs(str(i), {"a.vhd": "x" * 500})
+            # make sure mtimes are distinct and ordered
+            for filename in ["outputs-{0}.json", "outputs-{0}-0.out"]:
+                path = os.path.join(self.cache_dir, filename.format(i))
+                os.utime(path, (1000 + i, 1000 + i))
+
+        # touch the oldest entry, then add one more which triggers eviction
+        self.assertIsNotNone(cache.load_outputs("0"))
+        cache.store_outputs("3", {"a.vhd": "x" * 500})
+
+        self.assertIsNotNone(cache.load_outputs("0"), "recently used entry is kept")
+        self.assertIsNone(cache.load_outputs("1"), "least recently used entry is evicted")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,393 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY
+
+See LICENSE.txt for license details.
+"""
+
+import os
+import tempfile
+import unittest
+
+from systemrdl.rdltypes import AccessType
+
+from hectare._HectareDriver import HectareDriver, write_if_changed, write_outputs
+from hectare._profile import Profiler
+
+RDL_NESTED = """
+addrmap blk_a {
+    reg { field { sw=rw; hw=r; } EN[0:0]; } CTRL @ 0x0;
+    regfile { reg { field { sw=r; hw=w; } CNT[15:0]; } STAT @ 0x4; } rf @ 0x10;
+};
+addrmap soc {
+    reg { field { sw=r; hw=na; } ID[31:0] = 0x1234; } IDENT @ 0x0;
+    blk_a a @ 0x1000;
+    blk_a a_arr[2] @ 0x2000;
+};
+"""
+
+RDL_WIDE = """
+addrmap wide {
+    default regwidth = 64;
+    reg { field { sw=rw; hw=r; } V[63:0] = 0; } CTRL @ 0x0;
+    reg { field { sw=r; hw=w; } X[7:0]; } STAT @ 0x8;
+};
+"""
+
+RDL_MIXED_W = """
+addrmap mixed {
+    reg { regwidth = 64; field { sw=rw; hw=r; } V[63:0] = 0; } CTRL @ 0x0;
+    reg { regwidth = 32; field { sw=r; hw=w; } X[7:0]; } STAT @ 0xC;
+};
+"""
+
+RDL_ARRAYS = """
+addrmap arr {
+    reg { field { sw=rw; hw=r; } GAIN[7:0] = 0; } CH_CFG[256] @ 0x100 += 4;
+    reg { field { sw=r; hw=w; } CNT[15:0]; } CH_STAT[2][4] @ 0x800 += 4;
+    regfile {
+        reg { field { sw=rw; hw=r; } LO[15:0] = 0; } A @ 0;
+        reg { field { sw=r; hw=w; } HI[7:0]; } B @ 4;
+    } rf[4] @ 0x1000;
+    regfile {
+        reg { field { sw=rw; hw=r; } X[3:0] = 0; } P @ 0;
+        reg { field { sw=rw; hw=r; } Y[3:0] = 0; } Q @ 4;
+        reg { field { sw=rw; hw=r; } Z[3:0] = 0; } R @ 8;
+    } odd[2] @ 0x2000 += 12;
+};
+"""
+
+RDL_MEMS = """
+addrmap memtest {
+    reg { field { sw=rw; hw=r; } EN[0:0] = 0; } CTRL @ 0x0;
+    external mem { mementries = 256; memwidth = 32; sw = rw; } buf @ 0x400;
+    external mem { mementries = 16; memwidth = 32; sw = r; } cap[2] @ 0x800;
+};
+"""
+
+RDL_EXTERNAL = """
+addrmap exttest {
+    reg { field { sw=rw; hw=r; } EN[0:0] = 0; } CTRL @ 0x0;
+    external reg { field { sw=rw; hw=r; } V[15:0] = 0; } REMOTE @ 0x4;
+    external regfile { reg { field { sw=r; hw=w; } S[7:0]; } STAT @ 0; } blk @ 0x100;
+};
+"""
+
+RDL_COUNTERS = """
+addrmap cnttest {
+    reg {
+        field { sw=r; hw=r; counter; } EVT[15:0] = 0;
+        field { sw=r; hw=na; counter; incrsaturate; incrvalue=2; rclr; } ERR[23:16] = 0;
+        field { sw=rw; hw=na; counter; incrsaturate=100; } LIM[31:24] = 0;
+    } CNT @ 0x0;
+    reg { field { sw=r; hw=na; rset; swacc; } FLAGS[3:0] = 0; } STAT @ 0x4;
+};
+"""
+
+RDL_INTERRUPTS = """
+addrmap irqtest {
+    reg { field { sw=rw; hw=na; } ERR_EN[0:0] = 0; } IRQ_EN @ 0x4;
+    reg {
+        field { sw=rw; hw=w; woclr; intr; } ERR[0:0] = 0;
+        field { sw=r; hw=w; negedge intr; stickybit=false; } LOST[1:1] = 0;
+    } IRQ_STS @ 0x0;
+    IRQ_STS.ERR->enable = IRQ_EN.ERR_EN;
+};
+"""
+
+RDL_INTERRUPT_ARRAYS = """
+addrmap irqarr {
+    regfile rf_t {
+        reg { field { sw=rw; hw=r; } EN = 0; } CTRL;
+        reg { field { sw=rw; hw=w; woclr; intr; } ST = 0; } STAT;
+        STAT.ST->enable = CTRL.EN;
+    };
+    rf_t RF[2] @ 0x0 += 0x18;
+    reg { field { sw=rw; hw=w; woclr; intr; } ST = 0; } GSTAT @ 0x40;
+    GSTAT.ST->enable = RF[1].CTRL.EN;
+};
+"""
+
+RDL_PIPELINE = """
+property hectare_pipeline { type = longint unsigned; component = field; };
+addrmap pipetest {
+    reg {
+        field { sw=rw; hw=r; hectare_pipeline = 2; } GAIN[7:0] = 0;
+        field { sw=r; hw=w; } LEVEL[15:8];
+    } CTRL @ 0x0;
+};
+"""
+
+
+class TestHectareDriver(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_if_changed(self):
+        filename = os.path.join(self.tmp_dir.name, "a.vhd")
+        self.assertTrue(write_if_changed(filename, "abc"), "new file is written")
+
+        os.utime(filename, (1000, 1000))
+        self.assertFalse(write_if_changed(filename, "abc"), "same content")
+        self.assertEqual(os.stat(filename).st_mtime, 1000, "mtime is preserved")
+
+        self.assertTrue(write_if_changed(filename, "abcd"), "content changed")
+        with open(filename) as f:
+            self.assertEqual(f.read(), "abcd")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["a.vhd"], "no temp files left")
+
+    def test_write_if_changed_chunks(self):
+        filename = os.path.join(self.tmp_dir.name, "a.vhd")
+        write_if_changed(filename, "abcd")
+
+        self.assertFalse(write_if_changed(filename, iter(["ab", "", "cd"])), "same content")
+        self.assertTrue(write_if_changed(filename, iter(["ab", "c"])), "shorter")
+        self.assertTrue(write_if_changed(filename, iter(["ab", "cd", "e"])), "longer")
+        with open(filename) as f:
+            self.assertEqual(f.read(), "abcde")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["a.vhd"], "no temp files left")
+
+    def test_build_lazy(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "soc.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_NESTED)
+
+        requests = {
+            "vhdl": os.path.join(self.tmp_dir.name, "soc.vhd"),
+            "c_header": os.path.join(self.tmp_dir.name, "soc.h"),
+        }
+        outputs = HectareDriver(rdl_filename).build(requests)
+        lazy_outputs = HectareDriver(rdl_filename).build(requests, lazy=True)
+        self.assertEqual(
+            {filename: "".join(chunks) for filename, chunks in lazy_outputs.items()},
+            outputs,
+        )
+
+    def test_profile_report(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "soc.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_NESTED)
+
+        driver = HectareDriver(rdl_filename)
+        with Profiler(tracemalloc_top=3) as profiler:
+            driver.run({"c_header": os.path.join(self.tmp_dir.name, "soc.h")})
+
+        report = driver.profile_report()
+        names = [phase["name"] for phase in report["phases"]]
+        self.assertEqual(names, ["compile", "elaborate", "walk", "c_header", "write", "total"])
+        for phase in report["phases"]:
+            self.assertGreaterEqual(phase["wall_s"], 0.0)
+            self.assertGreaterEqual(phase["cpu_s"], 0.0)
+        self.assertIn("total", driver.format_profile())
+        self.assertEqual(len(profiler.tracemalloc_stats()), 3)
+
+    def test_write_outputs(self):
+        filename_a = os.path.join(self.tmp_dir.name, "a.vhd")
+        filename_b = os.path.join(self.tmp_dir.name, "b.h")
+        write_outputs({filename_a: "a", filename_b: "b"})
+
+        changed = write_outputs({filename_a: "a", filename_b: "bb"})
+        self.assertEqual(changed, [filename_b])
+
+        changed = write_outputs({filename_a: "a", filename_b: "bb"}, force=True)
+        self.assertEqual(changed, [filename_a, filename_b])
+
+    def test_nested_addrmaps(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "soc.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_NESTED)
+
+        addrmaps = HectareDriver(rdl_filename).compile()
+        self.assertEqual([m.name for m in addrmaps], ["soc", "a", "a_arr_0", "a_arr_1"])
+        self.assertEqual([m.base_addr for m in addrmaps], [0, 0x1000, 0x2000, 0x2018])
+        self.assertEqual([r.name for r in addrmaps[0].regs], ["IDENT"])
+
+        for addrmap in addrmaps[1:]:
+            self.assertEqual([r.name for r in addrmap.regs], ["CTRL", "STAT"])
+            self.assertEqual(
+                [r.addr for r in addrmap.regs], [0, 0x14], "relative to the address map"
+            )
+
+    def test_axi4_backend(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "soc.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_NESTED)
+
+        vhd_filename = os.path.join(self.tmp_dir.name, "soc.vhd")
+        outputs = HectareDriver(rdl_filename).build({"vhdl_axi4": vhd_filename})
+        self.assertIn("entity a_axi4 is", outputs[vhd_filename])
+        self.assertIn("entity a_arr_1_axi4 is", outputs[vhd_filename])
+
+        outputs = HectareDriver(rdl_filename).build({"vhdl_wishbone": vhd_filename})
+        self.assertIn("entity a_wb is", outputs[vhd_filename])
+
+    def test_data_w_from_regwidth(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "wide.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_WIDE)
+
+        addrmaps = HectareDriver(rdl_filename).compile()
+        self.assertEqual(addrmaps[0].data_w, 64)
+        self.assertEqual([r.addr for r in addrmaps[0].regs], [0, 8])
+
+    def test_mixed_regwidth_alignment(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "mixed.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_MIXED_W)
+
+        with self.assertRaisesRegex(ValueError, r"mixed\.STAT.*aligned to 8 bytes"):
+            HectareDriver(rdl_filename).compile()
+
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_MIXED_W.replace("@ 0xC", "@ 0x8"))
+        addrmaps = HectareDriver(rdl_filename).compile()
+        self.assertEqual(addrmaps[0].data_w, 64)
+
+    def test_register_arrays(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "arr.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_ARRAYS)
+
+        regs = {reg.name: reg for reg in HectareDriver(rdl_filename).compile()[0].regs}
+
+        self.assertEqual((regs["CH_CFG"].dims, regs["CH_CFG"].stride), ([256], 4))
+        self.assertEqual(
+            (regs["CH_STAT"].dims, regs["CH_STAT"].stride),
+            ([2, 4], 4),
+            "contiguous dimensions are kept together",
+        )
+        self.assertEqual((regs["A"].addr, regs["A"].dims, regs["A"].stride), (0x1000, [4], 8))
+        self.assertEqual((regs["B"].addr, regs["B"].dims, regs["B"].stride), (0x1004, [4], 8))
+
+        # stride of 12 bytes is not a power of two, elements are unrolled
+        self.assertEqual([regs["R_0"].addr, regs["R_1"].addr], [0x2008, 0x2014])
+        self.assertFalse(regs["R_1"].is_array)
+
+    def test_memories(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "mem.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_MEMS)
+
+        addrmap = HectareDriver(rdl_filename).compile()[0]
+        self.assertEqual([reg.name for reg in addrmap.regs], ["CTRL"])
+        self.assertEqual(
+            [(mem.name, mem.addr, mem.entries) for mem in addrmap.mems],
+            [("buf", 0x400, 256), ("cap_0", 0x800, 16), ("cap_1", 0x840, 16)],
+        )
+        self.assertEqual(addrmap.mems[1].sw_acc_type, AccessType.r)
+
+    def test_external_registers(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "ext.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_EXTERNAL)
+
+        regs = HectareDriver(rdl_filename).compile()[0].regs
+        self.assertEqual(
+            [(reg.name, reg.external) for reg in regs],
+            [("CTRL", False), ("REMOTE", True), ("STAT", True)],
+        )
+
+    def test_counters(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "cnt.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_COUNTERS)
+
+        fields = HectareDriver(rdl_filename).compile()[0].regs[0].fields
+        self.assertEqual(
+            [(f.counter, f.incrvalue, f.incrsaturate, f.rclr) for f in fields],
+            [(True, 1, None, False), (True, 2, 255, True), (True, 1, 100, False)],
+        )
+
+        flags = HectareDriver(rdl_filename).compile()[0].regs[1].fields[0]
+        self.assertEqual((flags.rclr, flags.rset, flags.swacc), (False, True, True))
+
+    def test_rclr_hw_input(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "rclr.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(
+                "addrmap rclrtest {\n"
+                "    reg { field { sw=r; hw=w; rclr; } LEVEL[7:0] = 0; } STAT @ 0x0;\n"
+                "};\n"
+            )
+
+        with self.assertRaisesRegex(ValueError, r"LEVEL: rclr/rset is not supported.*hw=w"):
+            HectareDriver(rdl_filename).compile()
+
+    def test_interrupts(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "irq.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_INTERRUPTS)
+
+        regs = {reg.name: reg for reg in HectareDriver(rdl_filename).compile()[0].regs}
+        fields = regs["IRQ_STS"].fields
+        self.assertEqual(
+            [(f.intr, f.stickybit, f.enable) for f in fields],
+            [("level", True, "IRQ_EN.ERR_EN"), ("negedge", False, None)],
+        )
+
+        h_filename = os.path.join(self.tmp_dir.name, "irq.h")
+        outputs = HectareDriver(rdl_filename).build({"c_header": h_filename})
+        self.assertIn("#define IRQTEST_IRQ_STS_INTR_MASK (0x3)", outputs[h_filename])
+
+    def test_interrupt_refs_in_arrays(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "irqarr.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_INTERRUPT_ARRAYS)
+
+        regs = {reg.name: reg for reg in HectareDriver(rdl_filename).compile()[0].regs}
+        self.assertEqual(regs["STAT_0"].fields[0].enable, "CTRL_0.EN")
+        self.assertEqual(regs["STAT_1"].fields[0].enable, "CTRL_1.EN")
+        self.assertEqual(regs["GSTAT"].fields[0].enable, "CTRL_1.EN")
+
+        vhd_filename = os.path.join(self.tmp_dir.name, "irqarr.vhd")
+        outputs = HectareDriver(rdl_filename).build({"vhdl": vhd_filename})
+        self.assertIn("(reg_stat_1(0) and reg_ctrl_1(0)) = '1'", outputs[vhd_filename])
+
+        with open(rdl_filename, "w") as f:
+            f.write(
+                "addrmap irqarr {\n"
+                "    reg { field { sw=rw; hw=r; } EN = 0; } CTRL[4] @ 0x0 += 0x4;\n"
+                "    reg { field { sw=rw; hw=w; woclr; intr; } ST = 0; } GSTAT @ 0x40;\n"
+                "    GSTAT.ST->enable = CTRL[1].EN;\n"
+                "};\n"
+            )
+        with self.assertRaisesRegex(
+            ValueError, r"irqarr.GSTAT.ST: enable references irqarr.CTRL\[1\].EN, fields of reg"
+        ):
+            HectareDriver(rdl_filename).compile()
+
+    def test_pipeline(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "pipe.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_PIPELINE)
+
+        fields = HectareDriver(rdl_filename).compile()[0].regs[0].fields
+        self.assertEqual([f.hw_pipeline for f in fields], [2, None])
+
+        vhd_filename = os.path.join(self.tmp_dir.name, "pipe.vhd")
+        outputs = HectareDriver(rdl_filename, options={"hw_pipeline": 1}).build(
+            {"vhdl": vhd_filename}
+        )
+        self.assertIn("ctrl_gain_o <= ctrl_gain_o_p2;", outputs[vhd_filename])
+        self.assertIn(
+            "reg_ctrl(15 downto 8) <= ctrl_level_i_p1 when rising_edge(clk);",
+            outputs[vhd_filename],
+        )
+
+    def test_all_addrmaps_generated(self):
+        rdl_filename = os.path.join(self.tmp_dir.name, "soc.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(RDL_NESTED)
+
+        out_filename = os.path.join(self.tmp_dir.name, "soc.vhd")
+        outputs = HectareDriver(rdl_filename).build({"vhdl": out_filename})
+        for name in ["soc", "a", "a_arr_0", "a_arr_1"]:
+            self.assertIn("entity {0}_axi is".format(name), outputs[out_filename])
+
+
+if __name__ == "__main__":
+    unittest.main()
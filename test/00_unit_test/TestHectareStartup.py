@@ -0,0 +1,93 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY
+
+See LICENSE.txt for license details.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# number of modules loaded by the command line module, relative to the ones
+# loaded by systemrdl (so that the budget does not depend on the version of
+# Python); measured 0.4
+STARTUP_BUDGET = 0.6
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+HEAVY_MODULES = [
+    "systemrdl",
+    "hectare._HectareListener",
+    "hectare._HectareVhdlGen",
+    "hectare._HectareCHeaderGen",
+    "cProfile",
+    "tracemalloc",
+]
+
+# prints the modules which were loaded by the code in {0}
+PRINT_MODULES = """
+import sys
+_before = set(sys.modules)
+{0}
+print(" ".join(sorted(set(sys.modules) - _before)))
+"""
+
+
+def _run_python(code: str, cwd: str = None) -> str:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT_DIR] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    return subprocess.check_output([sys.executable, "-c", code], env=env, cwd=cwd).decode()
+
+
+def _loaded_modules(code: str, cwd: str = None) -> list:
+    """ modules loaded by `code` in a fresh interpreter """
+
+    return _run_python(PRINT_MODULES.format(code), cwd).splitlines()[-1].split()
+
+
+class TestHectareStartup(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        modules = _loaded_modules("import hectare.hectare")
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_cached_run(self):
+        run = "\n".join(
+            [
+                "from hectare import hectare",
+                "sys.argv = ['hectare', '--cache-dir', 'cache', 'mymodule.rdl',",
+                "            '--axi-vhdl', 'mymodule.vhd', '--c-header', 'mymodule.h']",
+                "hectare.main()",
+            ]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "mymodule.rdl"), "w") as f:
+                f.write("addrmap mymodule { reg { field {} data[8]; } myreg; };\n")
+
+            self.assertIn("systemrdl", _loaded_modules(run, tmp_dir))
+            os.remove(os.path.join(tmp_dir, "mymodule.vhd"))
+
+            # the second run is served from the cache
+            modules = _loaded_modules(run, tmp_dir)
+            for module in HEAVY_MODULES:
+                self.assertNotIn(module, modules)
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "mymodule.vhd")))
+
+    def test_startup_modules(self):
+        n_hectare = len(_loaded_modules("import hectare.hectare"))
+        n_systemrdl = len(_loaded_modules("import systemrdl"))
+        self.assertLess(
+            n_hectare,
+            STARTUP_BUDGET * n_systemrdl,
+            "hectare: {0} modules, systemrdl: {1} modules".format(n_hectare, n_systemrdl),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY
+
+See LICENSE.txt for license details.
+"""
+
+import unittest
+
+from systemrdl.rdltypes import AccessType
+
+from hectare._hectare_types import AddressMap, Field, Register
+
+
+class TestHectareTypes(unittest.TestCase):
+    @staticmethod
+    def _make_addrmap():
+        addrmap = AddressMap("mymodule")
+        for i in range(2):
+            reg = Register("myreg{0}".format(i), 0x10 * i, [4], 4)
+            reg.fields.append(Field("myfield", 0, 1, AccessType.r, AccessType.rw, swmod=True))
+            addrmap.regs.append(reg)
+        return addrmap
+
+    def test_summary(self):
+        reg = self._make_addrmap().regs[0]
+        summary = reg.summary
+        self.assertTrue(summary.has_swmod)
+        self.assertFalse(summary.has_enum)
+        self.assertFalse(summary.has_woclr)
+        self.assertEqual(summary.sw_rd_mask, 0x3)
+        self.assertEqual(summary.sw_wr_mask, 0x3)
+
+        # changes of the fields are picked up by update_summary
+        reg.fields[0].sw_acc_type = AccessType.w
+        reg.fields.append(Field("clr", 4, 4, AccessType.r, AccessType.w, swmod=False, woclr=True))
+        self.assertIs(reg.summary, summary)
+        reg.update_summary()
+        self.assertTrue(reg.summary.has_woclr)
+        self.assertEqual(reg.summary.sw_rd_mask, 0)
+        self.assertEqual(reg.summary.sw_wr_mask, 0x13)
+
+    def test_index(self):
+        addrmap = self._make_addrmap()
+        self.assertIs(addrmap.reg_by_name("myreg1"), addrmap.regs[1])
+        self.assertIsNone(addrmap.reg_by_name("nope"))
+        self.assertIs(addrmap.find_reg(0xC), addrmap.regs[0])
+        self.assertIs(addrmap.find_reg(0x14), addrmap.regs[1])
+        self.assertIsNone(addrmap.find_reg(0x20))
+
+        # changes of the registers are picked up by update_index
+        reg = Register("extra", 0x40)
+        addrmap.regs.append(reg)
+        addrmap.regs[0].addr = 0x80
+        addrmap.update_index()
+        self.assertIs(addrmap.find_reg(0x40), reg)
+        self.assertIs(addrmap.find_reg(0x80), addrmap.regs[0])
+        self.assertIsNone(addrmap.find_reg(0x0))
+
+    def test_from_dict(self):
+        addrmap = AddressMap.from_dict(self._make_addrmap().to_dict())
+        self.assertTrue(addrmap.regs[0].summary.has_swmod)
+        self.assertIs(addrmap.find_reg(0x10), addrmap.regs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,8 +12,8 @@ import unittest
 
 from systemrdl.rdltypes import AccessType
 
-from hectare._hectare_types import Field, Register
-from hectare._HectareVhdlGen import HectareVhdlGen
+from hectare._hectare_types import AddressMap, Field, Memory, Register
+from hectare._HectareVhdlGen import FRONTENDS, HectareVhdlGen
 
 
 class TestHectareVhdlGen(unittest.TestCase):
@@ -186,6 +186,507 @@ class TestHectareVhdlGen(unittest.TestCase):
         self.assertEqual(assign_val, '"{0:08b}"'.format(RESET_VAL), "reset value")
         self.assertEqual(len(assign_val), 8+2, "assign value must be of same size as the field")
 
+    def test_read_pipelined(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 4)
+        reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.r, swmod=False))
+        addrmap.regs.append(reg)
+
+        s = HectareVhdlGen(addrmap, read_channel="pipelined").generate_string()
+        self.assertIn("proc_read_pipe", s)
+        self.assertIn("  rd_strobe <= S_AXI_ARVALID and arready_wire;", s)
+        self.assertIn("            skid_rdata <= rdata_reg;", s)
+        self.assertNotIn("state_read", s)
+
+    def test_gen_write_logic_pipelined(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 4)
+        reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+        addrmap.regs.append(reg)
+
+        vhdl_gen = HectareVhdlGen(addrmap, write_channel="pipelined")
+        lines = list(vhdl_gen._gen_write_logic("wdata_wire"))
+        self.assertIn("      if wr_en = '1' then", lines)
+        self.assertIn("            reg_myreg(7 downto 0) <= wdata_wire(7 downto 0);", lines)
+
+        s = vhdl_gen.generate_string()
+        self.assertIn("proc_write_pipe", s)
+        self.assertNotIn("state_write", s)
+
+    def test_core_handshake(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 4)
+        reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+        addrmap.regs.append(reg)
+
+        # all front-ends drive the same core
+        for bus in HectareVhdlGen.BUSES:
+            s = HectareVhdlGen(addrmap, bus=bus).generate_string()
+            self.assertIn("        rd_valid <= rd_strobe;", s, bus)
+            self.assertIn("        wr_valid <= wr_en;", s, bus)
+            self.assertIn("  core_ready <= '1';", s, bus)
+            self.assertIn("      if rd_strobe = '1' then", s, bus)
+
+        lines = HectareVhdlGen(addrmap, read_decoder="two_level")._gen_core_handshake()
+        self.assertIn("        rd_decode <= rd_strobe;", lines)
+        self.assertIn("        rd_valid <= rd_decode;", lines)
+        self.assertIn("  core_ready <= not (rd_decode);", lines)
+
+    def test_gen_single_sw_wr_access_strb(self):
+        field = Field("myfield", 4, 19, AccessType.r, AccessType.rw, swmod=False)
+        l = HectareVhdlGen._gen_single_sw_wr_access_strb(
+            "myreg", field, "wdata_reg", "wstrb_reg"
+        )
+        self.assertEqual(len(l), 3 * 3, "field spans three byte lanes")
+        self.assertEqual(l[0], "if wstrb_reg(0) = '1' then")
+        self.assertEqual(l[1], "  reg_myreg(7 downto 4) <= wdata_reg(7 downto 4);")
+        self.assertEqual(l[4], "  reg_myreg(15 downto 8) <= wdata_reg(15 downto 8);")
+        self.assertEqual(l[6], "if wstrb_reg(2) = '1' then")
+        self.assertEqual(l[7], "  reg_myreg(19 downto 16) <= wdata_reg(19 downto 16);")
+
+    def test_wstrb_capture(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 4)
+        reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+        addrmap.regs.append(reg)
+
+        for write_channel in ["fsm", "pipelined"]:
+            s = HectareVhdlGen(addrmap, write_channel=write_channel).generate_string()
+            self.assertNotIn("wstrb", s, "byte enables are only captured if they are used")
+
+            s = HectareVhdlGen(
+                addrmap, write_channel=write_channel, use_wstrb=True
+            ).generate_string()
+            self.assertIn("  signal wstrb_hold : std_logic_vector(4-1 downto 0);", s)
+            self.assertIn("            wstrb_hold <= S_AXI_WSTRB;", s)
+            self.assertIn("            if wstrb_wire(0) = '1' then", s)
+
+    def test_gen_single_sw_wr_access_strb_read_only(self):
+        field = Field("myfield", 0, 7, AccessType.r, AccessType.r, swmod=False)
+        l = HectareVhdlGen._gen_single_sw_wr_access_strb(
+            "myreg", field, "wdata_reg", "wstrb_reg"
+        )
+        self.assertEqual(l, [])
+
+    def test_data_w_64(self):
+        addrmap = AddressMap("mymodule", data_w=64)
+        reg = Register("myreg", 8)
+        reg.fields.append(Field("myfield", 0, 63, AccessType.r, AccessType.rw, swmod=False))
+        addrmap.regs.append(reg)
+
+        s = HectareVhdlGen(addrmap).generate_string()
+        self.assertIn("S_AXI_WDATA   : in std_logic_vector(64-1 downto 0);", s)
+        self.assertIn("unsigned(S_AXI_ARADDR(G_ADDR_W-1 downto 3))", s)
+        self.assertIn("rdata_reg <= x\"badc0feebadc0fee\";", s)
+
+    def test_split_read_addr(self):
+        # three clusters of registers in a sparse map
+        word_addrs = [0, 1, 2, 256, 257, 259, 512]
+        offs_bits = HectareVhdlGen._split_read_addr(word_addrs)
+        self.assertEqual(offs_bits, 2)
+
+        self.assertEqual(HectareVhdlGen._split_read_addr([0]), 1)
+
+    def test_two_level_read_decoder(self):
+        addrmap = AddressMap("mymodule")
+        for i, addr in enumerate([0, 4, 0x400]):
+            reg = Register("myreg{0}".format(i), addr)
+            reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+            addrmap.regs.append(reg)
+
+        vhdl_gen = HectareVhdlGen(addrmap, read_decoder="two_level")
+        self.assertEqual(vhdl_gen.read_latency, 2)
+        self.assertEqual(list(vhdl_gen._read_blocks().keys()), [0, 128])
+
+        lines = list(vhdl_gen._gen_read_logic_two_level())
+        self.assertIn("          when C_ADDR_MYREG1 mod C_RD_BLK_SIZE =>", lines)
+        self.assertIn("            rdata_reg <= rdata_blk_128;", lines)
+
+        s = vhdl_gen.generate_string()
+        self.assertIn("-- read latency: 2 clock cycle(s)", s)
+        self.assertIn("  raddr_blk <= raddr_word / C_RD_BLK_SIZE;", s)
+        self.assertIn("      if rd_decode = '1' then", s)
+
+        # the core is busy while the block is selected, the skid buffer of
+        # the pipelined read channel is not overrun
+        s = HectareVhdlGen(
+            addrmap, read_channel="pipelined", read_decoder="two_level"
+        ).generate_string()
+        self.assertIn("  arready_wire <= not skid_valid and core_ready;", s)
+
+    def test_swmod_once_per_register(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 0x0)
+        for i in range(4):
+            reg.fields.append(
+                Field("f{0}".format(i), 8 * i, 8 * i + 7, AccessType.r, AccessType.rw, swmod=True)
+            )
+        addrmap.regs.append(reg)
+        s = HectareVhdlGen(addrmap).generate_string()
+        self.assertEqual(s.count("reg_myreg_swmod <= '1';"), 1)
+
+    def test_register_array(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("myreg", 0x100, [16], 8)
+        reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=True))
+        addrmap.regs.append(reg)
+        vhdl_gen = HectareVhdlGen(addrmap)
+
+        self.assertEqual(
+            vhdl_gen._gen_single_port("myreg", reg.fields[0], reg.count),
+            [
+                "myreg_myfield_o : out slv8_array_t(0 to 15);",
+                "myreg_myfield_swmod : out std_logic_vector(0 to 15);",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_single_array_consts(reg, self.DATA_W_BYTES),
+            [
+                "constant C_STRIDE_MYREG : integer := 2;",
+                "constant C_COUNT_MYREG : integer := 16;",
+            ],
+        )
+        self.assertIn(
+            "    if raddr_word >= C_ADDR_MYREG and raddr_word < C_ADDR_MYREG + "
+            "C_COUNT_MYREG * C_STRIDE_MYREG and (raddr_word - C_ADDR_MYREG) mod "
+            "C_STRIDE_MYREG = 0 then",
+            vhdl_gen._gen_read_case("rdata_reg"),
+        )
+
+        lines = list(vhdl_gen._gen_write_logic("wdata_reg"))
+        self.assertIn(
+            "              reg_myreg((waddr_word - C_ADDR_MYREG) / C_STRIDE_MYREG)(7 downto 0) <= wdata_reg(7 downto 0);",
+            lines,
+        )
+        self.assertIn("      reg_myreg_swmod <= (others => '0');", lines)
+
+        self.assertIn(
+            "  type slv8_array_t is array (natural range <>) of std_logic_vector(7 downto 0);",
+            vhdl_gen.generate_package(),
+        )
+
+    def test_memory(self):
+        addrmap = AddressMap("mymodule")
+        addrmap.mems.append(Memory("buf", 0x400, 256, 32))
+        addrmap.mems.append(Memory("capture", 0x800, 64, 32, AccessType.r))
+        vhdl_gen = HectareVhdlGen(addrmap)
+
+        self.assertEqual(
+            vhdl_gen._gen_single_mem_port(addrmap.mems[1]),
+            [
+                "capture_addr_i : in std_logic_vector(6-1 downto 0);",
+                "capture_we_i : in std_logic;",
+                "capture_wdata_i : in std_logic_vector(32-1 downto 0);",
+                "capture_rdata_o : out std_logic_vector(32-1 downto 0);",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_single_mem_consts(addrmap.mems[0], self.DATA_W_BYTES),
+            [
+                "constant C_ADDR_BUF : integer := 256;",
+                "constant C_ENTRIES_BUF : integer := 256;",
+            ],
+        )
+
+        lines = vhdl_gen._gen_mem_logic("wdata_reg", None)
+        self.assertIn(
+            "        mem_buf(waddr_word - C_ADDR_BUF) <= wdata_reg;", lines
+        )
+        self.assertNotIn(
+            "        mem_capture(waddr_word - C_ADDR_CAPTURE) <= wdata_reg;", lines
+        )
+
+        self.assertIn("      if rd_strobe = '1' then", lines)
+
+        for kwargs in [{}, {"read_channel": "pipelined"}, {"bus": "wishbone"}]:
+            s = HectareVhdlGen(addrmap, **kwargs).generate_string()
+            self.assertIn("  rdata_mux <= mem_buf_rdata when mem_buf_rd_hit = '1' else", s)
+            self.assertIn("rdata_mux;", s)
+
+    def test_memory_invalid(self):
+        addrmap = AddressMap("mymodule")
+        addrmap.mems.append(Memory("buf", 0x400, 256, 32))
+        addrmap.mems[0].width = 16
+        self.assertRaises(ValueError, HectareVhdlGen, addrmap)
+
+    def test_external_register(self):
+        addrmap = AddressMap("mymodule")
+        addrmap.regs.append(Register("local", 0x0))
+        addrmap.regs.append(Register("remote", 0x4, external=True))
+        addrmap.regs.append(Register("tab", 0x100, [8], 4, external=True))
+        for reg in addrmap.regs:
+            reg.fields.append(Field("myfield", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+        vhdl_gen = HectareVhdlGen(addrmap)
+
+        self.assertEqual(
+            vhdl_gen._gen_ext_hit("ext_rd_hit", "raddr_word"),
+            [
+                "ext_rd_hit <= '1' when raddr_word = C_ADDR_REMOTE",
+                "  or (raddr_word >= C_ADDR_TAB and raddr_word < C_ADDR_TAB + "
+                "C_COUNT_TAB * C_STRIDE_TAB) else '0';",
+            ],
+        )
+
+        s = vhdl_gen.generate_string()
+        self.assertIn("    local_myfield_o : out std_logic_vector(7 downto 0);", s)
+        self.assertNotIn("remote_myfield_o", s)
+        self.assertIn("    ext_wr_ack_i : in std_logic;", s)
+        self.assertIn("        rd_valid <= (rd_strobe and not ext_rd_hit) or (ext_rd_req and ext_rd_ack_i);", s)
+        self.assertIn("  core_ready <= not (ext_rd_req or ext_wr_req);", s)
+        self.assertIn("          ext_wr_strb_reg <= (others => '1');", s)
+
+        # the external registers are handled in the core, for all buses
+        for bus in HectareVhdlGen.BUSES:
+            s = HectareVhdlGen(addrmap, bus=bus, use_wstrb=True).generate_string()
+            self.assertIn("  ext_rd_req_o <= ext_rd_req;", s, bus)
+            self.assertIn(
+                "          ext_wr_strb_reg <= {0};".format(FRONTENDS[bus].wstrb), s, bus
+            )
+        s = HectareVhdlGen(
+            addrmap, read_channel="pipelined", write_channel="pipelined"
+        ).generate_string()
+        self.assertIn("  ext_wr_data_o <= ext_wr_data_reg;", s)
+
+    def test_gen_single_counter(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("cnt", 0x0)
+        reg.fields.append(
+            Field("err", 16, 23, AccessType.na, AccessType.r, swmod=False,
+                  counter=True, incrvalue=2, incrsaturate=255, rclr=True)
+        )
+        addrmap.regs.append(reg)
+        vhdl_gen = HectareVhdlGen(addrmap)
+
+        self.assertEqual(
+            vhdl_gen._gen_single_counter(reg, reg.fields[0]),
+            [
+                "if rd_strobe = '1' and raddr_word = C_ADDR_CNT then",
+                "  if cnt_err_incr = '1' then",
+                '    reg_cnt(23 downto 16) <= "00000010";',
+                "  else",
+                '    reg_cnt(23 downto 16) <= "00000000";',
+                "  end if;",
+                "elsif cnt_err_incr = '1' then",
+                '  if unsigned(reg_cnt(23 downto 16)) > "11111101" then',
+                '    reg_cnt(23 downto 16) <= "11111111";',
+                "  else",
+                "    reg_cnt(23 downto 16) <= std_logic_vector(unsigned(reg_cnt(23 downto 16)) + 2);",
+                "  end if;",
+                "end if;",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_single_port("cnt", reg.fields[0]), ["cnt_err_incr : in std_logic;"]
+        )
+
+    def test_gen_single_counter_wrap(self):
+        field = Field("evt", 0, 3, AccessType.r, AccessType.r, swmod=False, counter=True)
+        self.assertEqual(
+            HectareVhdlGen._gen_single_port("cnt", field),
+            [
+                "cnt_evt_o : out std_logic_vector(3 downto 0);",
+                "cnt_evt_incr : in std_logic;",
+                "cnt_evt_overflow : out std_logic;",
+            ],
+        )
+        self.assertIn(
+            '  if unsigned(reg_cnt(3 downto 0)) > "1110" then',
+            HectareVhdlGen(AddressMap("mymodule"))._gen_single_counter(
+                Register("cnt", 0x0), field
+            ),
+        )
+
+    def _make_intr_addrmap(self):
+        addrmap = AddressMap("mymodule")
+        sts = Register("sts", 0x0)
+        sts.fields.append(
+            Field("err", 0, 0, AccessType.w, AccessType.rw, swmod=False, woclr=True,
+                  intr="level", stickybit=True, enable="en.err_en")
+        )
+        sts.fields.append(
+            Field("done", 1, 1, AccessType.w, AccessType.rw, swmod=False, woclr=True,
+                  intr="posedge", stickybit=True)
+        )
+        en = Register("en", 0x4)
+        en.fields.append(Field("err_en", 0, 0, AccessType.na, AccessType.rw, swmod=False))
+        addrmap.regs.extend([sts, en])
+        return addrmap
+
+    def test_interrupts(self):
+        addrmap = self._make_intr_addrmap()
+        vhdl_gen = HectareVhdlGen(addrmap)
+        sts = addrmap.regs[0]
+
+        self.assertEqual(
+            vhdl_gen._gen_single_intr(sts, sts.fields[1]),
+            [
+                "reg_sts_done_prev <= sts_done_i;",
+                "reg_sts(1) <= (reg_sts(1) and not reg_sts_woclr(1)) or (sts_done_i and not reg_sts_done_prev);",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_irq(),
+            [
+                "irq_o <= '1' when (reg_sts(0) and reg_en(0)) = '1'",
+                "  or (reg_sts(1)) = '1' else '0';",
+            ],
+        )
+        self.assertIn("    irq_o : out std_logic;", vhdl_gen.generate_string())
+
+    def test_interrupts_invalid_ref(self):
+        addrmap = self._make_intr_addrmap()
+        addrmap.regs[0].fields[0].enable = "en.foo"
+        self.assertRaises(ValueError, HectareVhdlGen, addrmap)
+
+    def test_read_side_effects(self):
+        addrmap = AddressMap("mymodule")
+        reg = Register("stat", 0x8)
+        reg.fields.append(
+            Field("events", 0, 7, AccessType.na, AccessType.r, swmod=False, rclr=True, swacc=True)
+        )
+        reg.fields.append(Field("flags", 8, 11, AccessType.na, AccessType.r, swmod=False, rset=True))
+        addrmap.regs.append(reg)
+        vhdl_gen = HectareVhdlGen(addrmap, read_channel="pipelined")
+
+        self.assertEqual(
+            list(vhdl_gen._gen_rd_side_effects()),
+            [
+                "if rd_strobe = '1' and raddr_word = C_ADDR_STAT then",
+                "  reg_stat_swacc <= '1';",
+                '  reg_stat(7 downto 0) <= "00000000";',
+                '  reg_stat(11 downto 8) <= "1111";',
+                "end if;",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_single_port("stat", reg.fields[0]),
+            ["stat_events_swacc : out std_logic;"],
+        )
+
+        # the read data is only sampled once per transaction
+        self.assertIn(
+            "      if rd_strobe = '1' then", HectareVhdlGen(addrmap)._gen_read_logic()
+        )
+
+    def test_hw_clk(self):
+        addrmap = AddressMap("mymodule")
+        ctrl = Register("ctrl", 0x0)
+        ctrl.fields.append(Field("gain", 0, 15, AccessType.r, AccessType.rw, swmod=True))
+        stat = Register("stat", 0x4)
+        stat.fields.append(Field("lock", 0, 0, AccessType.w, AccessType.r, swmod=False))
+        addrmap.regs.extend([ctrl, stat])
+        vhdl_gen = HectareVhdlGen(addrmap, hw_clk=True)
+
+        self.assertEqual(
+            vhdl_gen._gen_hw_access(),
+            ["ctrl_gain_o <= hw_ctrl(15 downto 0);", "ctrl_gain_swmod <= hw_ctrl_swmod;"],
+        )
+        lines = vhdl_gen._gen_cdc_logic()
+        self.assertIn("        hw_ctrl <= cdc_ctrl_o_data;", lines)
+        self.assertIn("        cdc_stat_i_data(0) <= stat_lock_i;", lines)
+        self.assertIn("        reg_stat(0) <= cdc_stat_i_data(0);", lines)
+        self.assertIn(
+            "  hw_ctrl_swmod <= cdc_ctrl_swmod_sync(2) xor cdc_ctrl_swmod_sync(1);", lines
+        )
+        self.assertIn(
+            'attribute ASYNC_REG of cdc_ctrl_o_req_sync : signal is "TRUE";',
+            vhdl_gen._gen_cdc_sigs(),
+        )
+
+        stat.fields[0].counter = True
+        self.assertRaises(ValueError, HectareVhdlGen, addrmap, hw_clk=True)
+
+    def test_hw_pipeline(self):
+        addrmap = AddressMap("mymodule")
+        ctrl = Register("ctrl", 0x0)
+        ctrl.fields.append(Field("gain", 0, 7, AccessType.r, AccessType.rw, swmod=True))
+        ctrl.fields.append(
+            Field("lock", 8, 8, AccessType.w, AccessType.r, swmod=False, hw_pipeline=0)
+        )
+        addrmap.regs.append(ctrl)
+        vhdl_gen = HectareVhdlGen(addrmap, hw_pipeline=1, max_fanout=32)
+
+        self.assertEqual(
+            vhdl_gen._gen_hw_access(),
+            [
+                "ctrl_gain_o_p0 <= reg_ctrl(7 downto 0);",
+                "ctrl_gain_swmod_p0 <= reg_ctrl_swmod;",
+                "reg_ctrl(8) <= ctrl_lock_i when rising_edge(clk);",
+            ],
+        )
+        self.assertEqual(
+            vhdl_gen._gen_pipeline_logic(),
+            [
+                "ctrl_gain_o_p1 <= ctrl_gain_o_p0 when rising_edge(clk);",
+                "ctrl_gain_o <= ctrl_gain_o_p1;",
+                "ctrl_gain_swmod_p1 <= ctrl_gain_swmod_p0 when rising_edge(clk);",
+                "ctrl_gain_swmod <= ctrl_gain_swmod_p1;",
+            ],
+        )
+        sigs = vhdl_gen._gen_retiming_sigs()
+        self.assertIn("signal ctrl_gain_o_p1 : std_logic_vector(7 downto 0);", sigs)
+        self.assertIn('attribute shreg_extract of ctrl_gain_o_p1 : signal is "no";', sigs)
+        self.assertIn("attribute max_fanout of reg_ctrl : signal is 32;", sigs)
+
+        self.assertRaises(ValueError, HectareVhdlGen, addrmap, hw_pipeline=-1)
+
+    def test_axi4(self):
+        addrmap = AddressMap("mymodule")
+        cnt = Register("cnt", 0x0)
+        cnt.fields.append(
+            Field("val", 0, 7, AccessType.na, AccessType.r, swmod=False, rclr=True)
+        )
+        addrmap.regs.append(cnt)
+        vhdl_gen = HectareVhdlGen(addrmap, bus="axi4")
+
+        s = vhdl_gen.generate_string()
+        self.assertIn("entity mymodule_axi4 is", s)
+        self.assertIn("S_AXI_RLAST   : out std_logic;", s)
+        self.assertIn("      if wr_en = '1' then", s)
+        self.assertEqual(
+            vhdl_gen._gen_rd_hit(cnt, ""), "rd_strobe = '1' and raddr_word = C_ADDR_CNT"
+        )
+        # WRAP bursts wrap at (AxLEN + 1) beats, narrow beats are answered with SLVERR
+        self.assertIn("raddr_mask <= resize(unsigned(S_AXI_ARLEN) &", s)
+        self.assertIn("waddr_mask <= resize(unsigned(S_AXI_AWLEN) &", s)
+        self.assertIn("if to_integer(unsigned(S_AXI_ARSIZE)) /= 2 then", s)
+        self.assertIn("  wr_en <= S_AXI_WVALID and wready_wire and not werr_reg;", s)
+        self.assertIn("S_AXI_RRESP <= \"10\" when rerr_reg = '1' else \"00\";", s)
+        self.assertIn("S_AXI_BRESP <= \"10\" when werr_reg = '1' else \"00\";", s)
+
+        self.assertRaises(ValueError, HectareVhdlGen, addrmap, bus="axi3")
+        self.assertRaises(
+            ValueError, HectareVhdlGen, addrmap, bus="axi4", read_channel="pipelined"
+        )
+
+    def test_frontends(self):
+        addrmap = AddressMap("mymodule")
+        ctrl = Register("ctrl", 0x4)
+        ctrl.fields.append(Field("val", 0, 7, AccessType.r, AccessType.rw, swmod=False))
+        addrmap.regs.append(ctrl)
+
+        s = HectareVhdlGen(addrmap, bus="avalon", use_wstrb=True).generate_string()
+        self.assertIn("entity mymodule_avmm is", s)
+        self.assertIn("  rd_strobe <= avs_read and core_ready;", s)
+        self.assertIn("  avs_readdatavalid <= rd_valid;", s)
+        self.assertIn("  avs_readdata <= rdata_reg;", s)
+        self.assertIn("if avs_byteenable(0) = '1' then", s)
+
+        s = HectareVhdlGen(addrmap, bus="wishbone").generate_string()
+        self.assertIn("entity mymodule_wb is", s)
+        self.assertIn("  wr_en <= wb_cyc_i and wb_stb_i and wb_we_i and core_ready;", s)
+        self.assertIn("  wb_ack_o <= rd_valid or wr_valid;", s)
+        self.assertIn("reg_ctrl(7 downto 0) <= wb_dat_i(7 downto 0);", s)
+
+        self.assertRaises(
+            ValueError, HectareVhdlGen, addrmap, bus="wishbone", write_channel="pipelined"
+        )
+
+    def test_invalid_read_channel(self):
+        self.assertRaises(
+            ValueError, HectareVhdlGen, AddressMap("mymodule"), read_channel="foo"
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
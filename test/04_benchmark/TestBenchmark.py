@@ -0,0 +1,35 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+"""
+
+import unittest
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_size(self):
+        result = benchmark.run_size(len(benchmark.REG_KINDS))
+        self.assertEqual(sorted(result["timings"]), sorted(benchmark.PHASES))
+
+    def test_compare(self):
+        baseline = {"100": {"timings": {"compile": 1.0, "vhdl": 0.01}, "peak_rss_mb": 100.0}}
+        results = {
+            "100": {"timings": {"compile": 1.1, "vhdl": 0.03, "walk": 5.0}, "peak_rss_mb": 150.0},
+            "1000": {"timings": {"compile": 50.0}, "peak_rss_mb": 500.0},
+        }
+        regressions = benchmark.compare(results, baseline, threshold=0.25)
+        # vhdl is below the noise level, walk and size 1000 are not in the baseline
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("peak memory", regressions[0])
+
+        results["100"]["timings"]["compile"] = 1.5
+        self.assertEqual(len(benchmark.compare(results, baseline, threshold=0.25)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+#! /usr/bin/env python3
+
+"""
+Copyright (c) 2021 Deutsches Elektronen-Synchrotron DESY.
+
+See LICENSE.txt for license details.
+
+Scaling benchmark: synthesizes register maps of different sizes, measures the
+time spent in each phase of the generation and the peak memory, and compares
+the results against a stored baseline.
+
+Each size runs in a fresh process, so that the peak memory of one size does
+not hide the one of the next. The baseline is machine-specific, update it
+with `--update-baseline` after an intended change or on a new machine.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from systemrdl import RDLCompiler, RDLWalker
+
+from hectare._HectareCHeaderGen import HectareCHeaderGen
+from hectare._HectareListener import HectareListener
+from hectare._HectareVhdlGen import HectareVhdlGen
+from hectare._profile import peak_rss_mb
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+# differences below this are considered noise, small maps take a few ms only
+MIN_DELTA_S = 0.05
+MIN_DELTA_MB = 5.0
+
+PHASES = ["compile", "elaborate", "walk", "vhdl", "c_header"]
+
+# one register per kind, cycled through
+REG_KINDS = [
+    """  reg {{
+    field {{ sw=rw; hw=r; swmod; }} VALUE[15:0] = 16'h{reset16:04x};
+    field {{ sw=r; hw=w; }} STATUS[23:16];
+  }} REG_{i}_SWMOD;
+""",
+    """  reg {{
+    field {{ sw=rw; hw=w; woclr; }} FLAGS[7:0] = 0;
+  }} REG_{i}_WOCLR;
+""",
+    """  reg {{
+    field {{ sw=w; hw=r; singlepulse; }} START[0:0] = 0;
+    field {{ sw=w; hw=r; singlepulse; }} STOP[1:1] = 0;
+  }} REG_{i}_PULSE;
+""",
+    """  reg {{
+    field {{ sw=rw; hw=r; encode=Mode; }} MODE[2:0] = 0;
+  }} REG_{i}_ENUM;
+""",
+    """  reg {{
+    field {{ sw=rw; hw=r; }} CONFIG[31:0] = 32'h{reset:08x};
+  }} REG_{i}_RESET;
+""",
+]
+
+
+def gen_rdl(n_regs: int) -> str:
+    """ address map with `n_regs` registers, mixing swmod, woclr, singlepulse,
+    enum and reset fields
+    """
+
+    lines = [
+        "addrmap bench {\n",
+        "  default regwidth = 32;\n",
+        "  enum Mode { IDLE = 0; RUN; HOLD; FLUSH; };\n",
+    ]
+    for i in range(n_regs):
+        reset = (i * 0x9E3779B1) & 0xFFFFFFFF
+        lines.append(
+            REG_KINDS[i % len(REG_KINDS)].format(i=i, reset=reset, reset16=reset & 0xFFFF)
+        )
+    lines.append("};\n")
+    return "".join(lines)
+
+
+def run_size(n_regs: int) -> Dict[str, Any]:
+    """ runs all phases for a single size, returns the time of each phase (in
+    seconds) and the peak memory (in MB)
+    """
+
+    timings: Dict[str, float] = {}
+
+    def timed(name, func):
+        t_start = time.perf_counter()
+        result = func()
+        timings[name] = round(time.perf_counter() - t_start, 4)
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rdl_filename = os.path.join(tmp_dir, "bench.rdl")
+        with open(rdl_filename, "w") as f:
+            f.write(gen_rdl(n_regs))
+
+        rdlc = RDLCompiler()
+        timed("compile", lambda: rdlc.compile_file(rdl_filename))
+        root = timed("elaborate", rdlc.elaborate)
+
+        listener = HectareListener()
+        timed("walk", lambda: RDLWalker(unroll=False).walk(root, listener))
+        addrmap = listener.addrmaps[0]
+
+        timed("vhdl", lambda: HectareVhdlGen(addrmap, rdl_filename).generate_string())
+        timed("c_header", lambda: HectareCHeaderGen(addrmap, rdl_filename).generate_string())
+
+    rss = peak_rss_mb()
+    return {"timings": timings, "peak_rss_mb": None if rss is None else round(rss, 1)}
+
+
+def run_sizes(sizes: List[int]) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for n_regs in sizes:
+        print("Running {0} registers ...".format(n_regs), flush=True)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+            results[str(n_regs)] = executor.submit(run_size, n_regs).result()
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """ returns a description of each phase (or peak memory) which is more
+    than `threshold` (relative) worse than the baseline
+
+    Sizes and phases which are missing in the baseline are not compared.
+    """
+
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+
+        for phase, elapsed in result["timings"].items():
+            base_elapsed = base["timings"].get(phase)
+            if base_elapsed is None:
+                continue
+            if elapsed > base_elapsed * (1 + threshold) and elapsed - base_elapsed > MIN_DELTA_S:
+                regressions.append(
+                    "{0} regs, {1}: {2:.3f} s (baseline {3:.3f} s)".format(
+                        size, phase, elapsed, base_elapsed
+                    )
+                )
+
+        rss, base_rss = result.get("peak_rss_mb"), base.get("peak_rss_mb")
+        if rss is not None and base_rss is not None:
+            if rss > base_rss * (1 + threshold) and rss - base_rss > MIN_DELTA_MB:
+                regressions.append(
+                    "{0} regs, peak memory: {1:.1f} MB (baseline {2:.1f} MB)".format(
+                        size, rss, base_rss
+                    )
+                )
+
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [
+        "{0:>8} ".format("regs")
+        + "".join("{0:>11}".format(phase) for phase in PHASES)
+        + "{0:>11}".format("total")
+        + "{0:>11}".format("peak MB")
+    ]
+    for size, result in results.items():
+        timings = result["timings"]
+        rss = result["peak_rss_mb"]
+        lines.append(
+            "{0:>8} ".format(size)
+            + "".join("{0:>11.3f}".format(timings[phase]) for phase in PHASES)
+            + "{0:>11.3f}".format(sum(timings.values()))
+            + ("{0:>11.1f}".format(rss) if rss is not None else "{0:>11}".format("-"))
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HECTARE scaling benchmark")
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(size) for size in s.split(",")],
+        default=DEFAULT_SIZES,
+        help="comma-separated numbers of registers (default: {0})".format(
+            ",".join(map(str, DEFAULT_SIZES))
+        ),
+    )
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE, help="baseline file (JSON)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown which is reported as regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline (merged with the existing one)",
+    )
+    parser.add_argument("--output", help="write the results to a JSON file")
+    parser.add_argument(
+        "--write-rdl",
+        metavar="N_REGS",
+        type=int,
+        help="only write the synthesized RDL with N_REGS registers to stdout",
+    )
+    args = parser.parse_args()
+
+    if args.write_rdl is not None:
+        sys.stdout.write(gen_rdl(args.write_rdl))
+        return 0
+
+    results = run_sizes(args.sizes)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    try:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    except OSError:
+        baseline = {}
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline updated: {0}".format(args.baseline))
+        return 0
+
+    if not baseline:
+        print("No baseline found: {0}".format(args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    print(
+        "{0} regression(s) (threshold {1:.0%})".format(len(regressions), args.threshold)
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())